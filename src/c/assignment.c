@@ -0,0 +1,144 @@
+#include <math.h>
+#include <stdlib.h>
+#include <string.h>
+
+#include "assignment.h"
+
+/* Makes an empty assignment, with all potentials 0. */
+static Assignment *assignment_new(int num_rows, int num_cols) {
+  Assignment *a = malloc(sizeof(Assignment));
+  a->num_rows = num_rows;
+  a->num_cols = num_cols;
+  a->cost = malloc(((size_t) num_rows * num_cols + 1) * sizeof(double));
+  a->u = calloc(num_rows + 1, sizeof(double));
+  a->v = calloc(num_cols + 1, sizeof(double));
+  a->col_row = calloc(num_cols + 1, sizeof(int));
+  return a;
+}
+
+/**
+ * Assigns an unassigned row, reassigning others along the shortest
+ * augmenting path, and updates the potentials.
+ */
+static void assignment_augment(Assignment *a, int row) {
+  int m = a->num_cols;
+  double *min_slack = malloc((m + 1) * sizeof(double));
+  int *prev_col = malloc((m + 1) * sizeof(int));
+  char *visited = calloc(m + 1, sizeof(char));
+  for (int j = 0; j <= m; ++j) min_slack[j] = INFINITY;
+
+  /* Column 0 stands for the new row, until the path is flipped. */
+  a->col_row[0] = row;
+  int col = 0;
+  do {
+    visited[col] = 1;
+    int i = a->col_row[col];
+    double *cost = a->cost + (size_t) (i - 1) * m;
+    double delta = INFINITY;
+    int next_col = 0;
+    for (int j = 1; j <= m; ++j) {
+      if (visited[j]) continue;
+      double slack = cost[j - 1] - a->u[i] - a->v[j];
+      if (slack < min_slack[j]) {
+        min_slack[j] = slack;
+        prev_col[j] = col;
+      }
+      if (min_slack[j] < delta) {
+        delta = min_slack[j];
+        next_col = j;
+      }
+    }
+    for (int j = 0; j <= m; ++j) {
+      if (visited[j]) {
+        a->u[a->col_row[j]] += delta;
+        a->v[j] -= delta;
+      } else {
+        min_slack[j] -= delta;
+      }
+    }
+    col = next_col;
+  } while (a->col_row[col] != 0);
+
+  /* Flip the assignments along the path. */
+  do {
+    int prev = prev_col[col];
+    a->col_row[col] = a->col_row[prev];
+    col = prev;
+  } while (col != 0);
+
+  free(min_slack);
+  free(prev_col);
+  free(visited);
+}
+
+/**
+ * Solves the assignment problem for a num_rows x num_cols row-major cost
+ * matrix, which is copied.  Requires num_rows <= num_cols.  Use
+ * ASSIGNMENT_FORBIDDEN for pairs that must not be assigned.
+ */
+Assignment *assignment_solve(int num_rows, int num_cols, double *cost) {
+  Assignment *a = assignment_new(num_rows, num_cols);
+  memcpy(a->cost, cost, (size_t) num_rows * num_cols * sizeof(double));
+  for (int i = 1; i <= num_rows; ++i) assignment_augment(a, i);
+  return a;
+}
+
+/* Returns a copy of a solved assignment, to re-solve without changing it. */
+Assignment *assignment_copy(Assignment *a) {
+  Assignment *copy = assignment_new(a->num_rows, a->num_cols);
+  memcpy(copy->cost, a->cost,
+         (size_t) a->num_rows * a->num_cols * sizeof(double));
+  memcpy(copy->u, a->u, (a->num_rows + 1) * sizeof(double));
+  memcpy(copy->v, a->v, (a->num_cols + 1) * sizeof(double));
+  memcpy(copy->col_row, a->col_row, (a->num_cols + 1) * sizeof(int));
+  return copy;
+}
+
+/**
+ * Forbids column col (from 0) and re-solves.
+ *
+ * Raising the column's costs keeps the potentials feasible, and resetting its
+ * potential to 0 keeps them optimal for a free column, so only the row that
+ * was assigned to it needs a new augmenting path: O(num_rows * num_cols)
+ * instead of a full solve.
+ */
+void assignment_remove_column(Assignment *a, int col) {
+  int j = col + 1;
+  for (int i = 0; i < a->num_rows; ++i) {
+    a->cost[(size_t) i * a->num_cols + col] = ASSIGNMENT_FORBIDDEN;
+  }
+  int row = a->col_row[j];
+  a->col_row[j] = 0;
+  a->v[j] = 0;
+  if (row != 0) assignment_augment(a, row);
+}
+
+/* Returns the total cost of a solved assignment. */
+double assignment_cost(Assignment *a) {
+  double total = 0;
+  for (int j = 1; j <= a->num_cols; ++j) {
+    int i = a->col_row[j];
+    if (i != 0) total += a->cost[(size_t) (i - 1) * a->num_cols + j - 1];
+  }
+  return total;
+}
+
+/* Returns whether a solved assignment uses no forbidden pairs. */
+int assignment_is_feasible(Assignment *a) {
+  return assignment_cost(a) < ASSIGNMENT_FORBIDDEN / 2;
+}
+
+/* Sets columns[i] to the column (from 0) assigned to row i, for every row. */
+void assignment_get_columns(Assignment *a, int *columns) {
+  for (int j = 1; j <= a->num_cols; ++j) {
+    if (a->col_row[j] != 0) columns[a->col_row[j] - 1] = j - 1;
+  }
+}
+
+void assignment_free(Assignment *a) {
+  free(a->cost);
+  free(a->u);
+  free(a->v);
+  free(a->col_row);
+  free(a);
+}
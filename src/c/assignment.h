@@ -0,0 +1,48 @@
+/**
+ * Minimum cost assignment of rows to columns, via the Hungarian algorithm.
+ *
+ * Each of num_rows rows is assigned a distinct column, out of num_cols >=
+ * num_rows, minimizing the total cost.  Rows are added one at a time, each by
+ * one shortest augmenting path that keeps row and column potentials u and v
+ * with u[i] + v[j] <= cost[i][j], equal for assigned pairs.  A solve takes
+ * O(num_rows^2 * num_cols) time.
+ *
+ * The potentials are kept with the solution, so a solved assignment can be
+ * re-solved cheaply after a column is removed: only the row that lost its
+ * column needs a new augmenting path (see assignment_remove_column).
+ */
+#ifndef NFLPOOL_ASSIGNMENT_H_
+#define NFLPOOL_ASSIGNMENT_H_
+
+/**
+ * Cost of pairs that must not be assigned.  Any assignment using one costs
+ * more than any assignment that does not, as long as real costs are within
+ * [-1000, 1000] and there are at most a few hundred rows.  Kept small so
+ * potentials stay accurate to well below float precision.
+ */
+#define ASSIGNMENT_FORBIDDEN 1e6
+
+typedef struct Assignment {
+  int num_rows;
+  int num_cols;
+
+  /* num_rows x num_cols row-major costs. */
+  double *cost;
+
+  /* Potentials, indexed from 1; u[0] and v[0] belong to a virtual column. */
+  double *u;
+  double *v;
+
+  /* col_row[j] is the row (from 1) assigned column j (from 1), or 0. */
+  int *col_row;
+} Assignment;
+
+Assignment *assignment_solve(int, int, double *);
+Assignment *assignment_copy(Assignment *);
+void assignment_remove_column(Assignment *, int);
+double assignment_cost(Assignment *);
+int assignment_is_feasible(Assignment *);
+void assignment_get_columns(Assignment *, int *);
+void assignment_free(Assignment *);
+
+#endif  // NFLPOOL_ASSIGNMENT_H_
@@ -1,19 +1,66 @@
 /**
  * Makes picks based on game predictions
  */
+#define _POSIX_C_SOURCE 200809L
+
 #include <stdlib.h>
 #include <stdio.h>
+#include <unistd.h>
 
 #include "picks.h"
 
 int main(int argc, char *argv[]) {
-  if (argc < 2) {
-    fprintf(stderr, "Usage: %s predictions.txt [teams,to,not,pick]\n", argv[0]);
+  int first_week = 0;
+  int num_sequences = 0;
+  int profile = 0;
+  int engine;
+  int opt;
+  while ((opt = getopt(argc, argv, "w:m:e:b:k:n:p")) != -1) {
+    switch (opt) {
+      case 'w':
+        first_week = atoi(optarg);
+        break;
+      case 'm':
+        picks_set_memory_budget((size_t) atol(optarg) << 20);
+        break;
+      case 'e':
+        engine = picks_engine_from_name(optarg);
+        if (engine < 0) {
+          optind = argc + 1;
+        } else {
+          picks_set_engine(engine);
+        }
+        break;
+      case 'b':
+        picks_set_beam_width(atoi(optarg));
+        break;
+      case 'k':
+        picks_set_beam_top_k(atoi(optarg));
+        break;
+      case 'n':
+        num_sequences = atoi(optarg);
+        break;
+      case 'p':
+        profile = 1;
+        picks_set_profiling(1);
+        break;
+      default:
+        optind = argc + 1;
+    }
+  }
+  if (optind >= argc || optind + 2 < argc) {
+    fprintf(stderr, "Usage: %s [-w first_week] [-m memory_mb] "
+            "[-e dp|assignment|beam] [-b beam_width] [-k top_k] "
+            "[-n num_sequences] [-p] predictions.txt [teams,to,not,pick]\n",
+            argv[0]);
     exit(1);
   }
-  else if (argc == 2) {
-    picks_run(argv[1], "");
+  char *teams_to_avoid = optind + 1 == argc ? "" : argv[optind + 1];
+  if (num_sequences > 0) {
+    picks_run_kbest(argv[optind], teams_to_avoid, first_week, num_sequences);
   } else {
-    picks_run(argv[1], argv[2]);
+    picks_run(argv[optind], teams_to_avoid, first_week);
   }
+  /* Printed to stderr, so the picks on stdout are unchanged. */
+  if (profile) picks_print_profile(stderr);
 }
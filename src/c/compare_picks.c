@@ -1,15 +1,56 @@
 /**
  * Compares different possible picks for the current week
  */
+#define _POSIX_C_SOURCE 200809L
+
 #include <stdlib.h>
 #include <stdio.h>
+#include <unistd.h>
 
 #include "picks.h"
 
 int main(int argc, char *argv[]) {
-  if (argc < 2) {
-    fprintf(stderr, "Usage: %s predictions.txt\n", argv[0]);
+  int profile = 0;
+  int engine;
+  int opt;
+  while ((opt = getopt(argc, argv, "m:e:b:k:p")) != -1) {
+    switch (opt) {
+      case 'm':
+        picks_set_memory_budget((size_t) atol(optarg) << 20);
+        break;
+      case 'e':
+        engine = picks_engine_from_name(optarg);
+        if (engine < 0) {
+          optind = argc + 1;
+        } else {
+          picks_set_engine(engine);
+        }
+        break;
+      case 'b':
+        picks_set_beam_width(atoi(optarg));
+        break;
+      case 'k':
+        picks_set_beam_top_k(atoi(optarg));
+        break;
+      case 'p':
+        profile = 1;
+        picks_set_profiling(1);
+        break;
+      default:
+        optind = argc + 1;
+    }
+  }
+  if (optind >= argc || optind + 2 < argc) {
+    fprintf(stderr, "Usage: %s [-m memory_mb] [-e dp|assignment|beam] "
+            "[-b beam_width] [-k top_k] [-p] "
+            "predictions.txt [teams,to,not,pick]\n", argv[0]);
     exit(1);
   }
-  picks_compare(argv[1], argv[2]);
+  else if (optind + 1 == argc) {
+    picks_compare(argv[optind], "");
+  } else {
+    picks_compare(argv[optind], argv[optind + 1]);
+  }
+  /* Printed to stderr, so the picks on stdout are unchanged. */
+  if (profile) picks_print_profile(stderr);
 }
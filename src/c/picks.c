@@ -1,122 +1,642 @@
+#define _POSIX_C_SOURCE 200809L
+
 #include <math.h>
 #include <stdlib.h>
 #include <stdio.h>
 #include <string.h>
+#include <time.h>
 
+#include "assignment.h"
 #include "bitset.h"
 #include "predictions.h"
 #include "picks.h"
 
+/* Limit on the memory used by the DP tables of one solve, in bytes. */
+static size_t memory_budget = PICKS_DEFAULT_MEMORY_BUDGET;
+
+/* Whether to drop teams that cannot be picked optimally before a DP. */
+static int pruning = 1;
+
+/* Algorithm used by picks_find_opt() and picks_candidate_values(). */
+static int engine = PICKS_ENGINE_DP;
+static const char *engine_names[PICKS_NUM_ENGINES] = {
+  "dp", "assignment", "beam"
+};
+
+/* Limits of PICKS_ENGINE_BEAM.  See picks_set_beam_width(). */
+static int beam_width = PICKS_DEFAULT_BEAM_WIDTH;
+static int beam_top_k = PICKS_DEFAULT_BEAM_TOP_K;
+
+/**
+ * Profiling state, only updated while profiling is set.  See
+ * picks_set_profiling().  Counters may be updated from several threads.
+ */
+static int profiling = 0;
+static uint64_t counters[PICKS_NUM_COUNTERS];
+static const char *counter_names[PICKS_NUM_COUNTERS] = {
+  "picks.dp_layers", "picks.dp_states", "picks.pruned_teams",
+  "picks.beam_states", "picks.kbest_paths"
+};
+static int stage_calls[PICKS_NUM_STAGES];
+static double stage_seconds[PICKS_NUM_STAGES];
+static const char *stage_names[PICKS_NUM_STAGES] = {
+  "picks.read", "picks.solve", "picks.compare"
+};
+
+/**
+ * A partial pick sequence in the beam search: teams for the weeks so far,
+ * with parent the index of the sequence it extends in the previous week's
+ * beam.
+ */
+typedef struct BeamState {
+  uint32_t used_teams;
+  float value;
+  int parent;
+  int team;
+} BeamState;
+
 /* A candidate pick */
 typedef struct PickCandidate {
   char *team_name;
   float expected_wins;
 } PickCandidate;
 
-/* Fills in the DP table, given the individual game outcome predictions. */
-DpCell **picks_run_dp(int num_games, float **predictions) {
-  // Initialize memory.
-  DpCell **dp_table = calloc(NUM_TEAMS, sizeof(DpCell*));
-  for (int i = 0; i < NUM_TEAMS; ++i) {
-    dp_table[i] = calloc(1 << num_games, sizeof(DpCell));
-    for (int j = 0; j < (1 << num_games); ++j) {
-      // Use -1 as sentinel for "impossible"
-      // e.g. if only 1 team, can't use of 2 weeks.
-      dp_table[i][j].expected_wins = -1;
-    }
-  }
-  
-  // Base case: First team is obvious.
-  dp_table[0][0].expected_wins = 0;
-  for (int i = 0; i < num_games; ++i) {
-    uint32_t set = 1 << i;
-    dp_table[0][set].expected_wins = predictions[0][i];
-    // dp_table[0][set] will correctly == 0, thanks to calloc.
-  }
-
-  // Recurse.
-  for (int i = 1; i < NUM_TEAMS; ++i) {
-    for (int prev_set = 0; prev_set < (1 << num_games); ++prev_set) {
-      DpCell *prev_cell = &dp_table[i-1][prev_set];
-      if (prev_cell->expected_wins == -1) continue;
-
-      // Try not picking the current team in any week.
-      DpCell *new_cell = &dp_table[i][prev_set];
-      if (new_cell->expected_wins < prev_cell->expected_wins) {
-        new_cell->expected_wins = prev_cell->expected_wins;
-        new_cell->prev_weeks = prev_set;
-      }
-      
-      // Try picking the current team in some week.
-      for (int new_game = 0; new_game < num_games; ++new_game) {
-        if (bitset_contains(prev_set, new_game)) continue;
-        uint32_t new_set = bitset_insert(prev_set, new_game);
-        float new_expected_wins = (prev_cell->expected_wins +
-                                   predictions[i][new_game]);
-        DpCell *new_cell = &dp_table[i][new_set];
-        if (new_cell->expected_wins < new_expected_wins) {
-          new_cell->expected_wins = new_expected_wins;
-          new_cell->prev_weeks = prev_set;
-        }
+/**
+ * Adds one team to a DP layer.
+ *
+ * layer[set] holds the optimal expected wins using exactly the weeks in set,
+ * or -INFINITY if that is impossible.  next is filled in with the same for
+ * one more team, whose predictions are pred.  If choices is not NULL,
+ * choices[set] records the week the new team is picked in, or DP_NO_PICK.
+ *
+ * Sets are visited in decreasing order, and set - {week} < set, so next may
+ * be the same array as layer.  Ties go to the latest week, and then to not
+ * picking the team at all.
+ */
+static void picks_add_team(int num_games, float *layer, float *next,
+                           float *pred, uint8_t *choices) {
+  if (profiling) {
+    __sync_fetch_and_add(&counters[PICKS_COUNTER_DP_LAYERS], 1);
+    __sync_fetch_and_add(&counters[PICKS_COUNTER_DP_STATES],
+                         (uint64_t) 1 << num_games);
+  }
+  for (uint32_t set = (uint32_t) 1 << num_games; set-- > 0;) {
+    float best = -INFINITY;
+    uint8_t choice = DP_NO_PICK;
+    for (int week = num_games - 1; week >= 0; --week) {
+      if (!bitset_contains(set, week)) continue;
+      float wins = layer[bitset_remove(set, week)] + pred[week];
+      if (wins > best) {
+        best = wins;
+        choice = week;
       }
     }
+    if (layer[set] > best) {
+      best = layer[set];
+      choice = DP_NO_PICK;
+    }
+    next[set] = best;
+    if (choices) choices[set] = choice;
+  }
+}
+
+/* Makes a layer for zero teams: only the empty set of weeks is possible. */
+static float *picks_empty_layer(int num_games) {
+  float *layer = malloc(((size_t) 1 << num_games) * sizeof(float));
+  for (uint32_t set = 0; set < ((uint32_t) 1 << num_games); ++set) {
+    layer[set] = -INFINITY;
+  }
+  layer[0] = 0;
+  return layer;
+}
+
+/* Turns recording of stage times and counters on or off. */
+void picks_set_profiling(int enabled) {
+  profiling = enabled;
+}
+
+/* Returns the current time in seconds, if profiling. */
+static double picks_profile_start(void) {
+  if (!profiling) return 0;
+  struct timespec now;
+  clock_gettime(CLOCK_MONOTONIC, &now);
+  return now.tv_sec + now.tv_nsec * 1e-9;
+}
+
+/* Adds the time since start, from picks_profile_start(), to a stage. */
+static void picks_profile_end(int stage, double start) {
+  if (!profiling) return;
+  stage_calls[stage]++;
+  stage_seconds[stage] += picks_profile_start() - start;
+}
+
+/**
+ * Copies the counters into values, which must have room for
+ * PICKS_NUM_COUNTERS entries, and resets them.
+ */
+void picks_take_counters(uint64_t *values) {
+  for (int i = 0; i < PICKS_NUM_COUNTERS; ++i) {
+    values[i] = __sync_fetch_and_and(&counters[i], 0);
+  }
+}
+
+/**
+ * Prints stage times and counters as JSON, in the same form as
+ * src/py/profiling.py.
+ */
+void picks_print_profile(FILE *fp) {
+  fprintf(fp, "{\n  \"stages\": {");
+  int first = 1;
+  for (int i = 0; i < PICKS_NUM_STAGES; ++i) {
+    if (stage_calls[i] == 0) continue;
+    fprintf(fp, "%s\n    \"%s\": {\"calls\": %d, \"seconds\": %.6f}",
+            first ? "" : ",", stage_names[i], stage_calls[i],
+            stage_seconds[i]);
+    first = 0;
+  }
+  fprintf(fp, "\n  },\n  \"counters\": {");
+  for (int i = 0; i < PICKS_NUM_COUNTERS; ++i) {
+    fprintf(fp, "%s\n    \"%s\": %llu", i ? "," : "", counter_names[i],
+            (unsigned long long) counters[i]);
+  }
+  fprintf(fp, "\n  }\n}\n");
+}
+
+/* Sets the limit on the memory used by the DP tables of one solve. */
+void picks_set_memory_budget(size_t num_bytes) {
+  memory_budget = num_bytes;
+}
+
+/**
+ * Sets the algorithm used to find optimal picks and candidate values, one of
+ * PICKS_ENGINE_*.  All give the same answers, up to rounding and ties.
+ *   PICKS_ENGINE_DP: the DP over sets of weeks.  Time and memory grow as
+ *       2^weeks, and with the memory budget as in picks_set_memory_budget().
+ *   PICKS_ENGINE_ASSIGNMENT: the Hungarian algorithm, in O(weeks^2 * teams).
+ *   PICKS_ENGINE_BEAM: an approximate beam search, which may give fewer
+ *       expected wins than the others.  See picks_set_beam_width().
+ */
+void picks_set_engine(int new_engine) {
+  engine = new_engine;
+}
+
+/**
+ * Sets how many partial pick sequences PICKS_ENGINE_BEAM keeps after each
+ * week.  Time grows linearly with it.
+ */
+void picks_set_beam_width(int width) {
+  beam_width = width > 0 ? width : 1;
+}
+
+/**
+ * Sets how many of the best unused teams PICKS_ENGINE_BEAM tries in each week
+ * for each partial pick sequence.
+ */
+void picks_set_beam_top_k(int top_k) {
+  beam_top_k = top_k > 0 ? top_k : 1;
+}
+
+/* Returns the PICKS_ENGINE_* with the given name, or -1 if there is none. */
+int picks_engine_from_name(const char *name) {
+  for (int i = 0; i < PICKS_NUM_ENGINES; ++i) {
+    if (strcmp(name, engine_names[i]) == 0) return i;
   }
+  return -1;
+}
+
+/* Bytes needed by picks_run_dp_teams() for the given problem size. */
+static size_t picks_table_bytes(int num_teams, int num_games) {
+  return ((size_t) num_teams + sizeof(float)) << num_games;
+}
+
+/**
+ * Fills in the DP table for the first num_teams rows of predictions, given the
+ * individual game outcome predictions.
+ */
+DpTable *picks_run_dp_teams(int num_teams, int num_games, float **predictions) {
+  DpTable *dp_table = malloc(sizeof(DpTable));
+  dp_table->num_teams = num_teams;
+  dp_table->num_games = num_games;
+  dp_table->choices = malloc(((size_t) num_teams << num_games) *
+                             sizeof(uint8_t));
+
+  /* A single layer of values, updated in place one team at a time. */
+  float *layer = picks_empty_layer(num_games);
+  for (int i = 0; i < num_teams; ++i) {
+    picks_add_team(num_games, layer, layer, predictions[i],
+                   dp_table->choices + ((size_t) i << num_games));
+  }
+  dp_table->opt_val = layer[((uint32_t) 1 << num_games) - 1];
+  free(layer);
   return dp_table;
 }
 
+/* Fills in the DP table, given the individual game outcome predictions. */
+DpTable *picks_run_dp(int num_games, float **predictions) {
+  return picks_run_dp_teams(NUM_TEAMS, num_games, predictions);
+}
+
 /* Frees the memeory of a dp table */
-void picks_free_table(DpCell **dp_table) {
-  for (int i = 0; i < NUM_TEAMS; ++i) {
-    free(dp_table[i]);
-  }  
+void picks_free_table(DpTable *dp_table) {
+  free(dp_table->choices);
   free(dp_table);
 }
 
 /* Get the optimal sequence of picks, returns opt value. */
-float picks_get_opt(DpCell **dp_table, int num_games, int *pick_sequence) {
-  // Start from the last cell.
-  int cur_team = NUM_TEAMS - 1;
-  uint32_t cur_weeks = (1 << num_games) - 1;  // All weeks
-  float opt_val = -1;  // Sentinel: if we get -1, something went wrong.
-  for (; cur_team >= 0; --cur_team) {
-    DpCell *cur_cell = &dp_table[cur_team][cur_weeks];
-    if (cur_team == NUM_TEAMS - 1) opt_val = cur_cell->expected_wins;
-    uint32_t prev_weeks = cur_cell->prev_weeks;  // Also works if cur_team == 0.
-    if (prev_weeks != cur_weeks) {
-      uint32_t diff = bitset_difference(prev_weeks, cur_weeks);
-      int week = bitset_smallest(diff);
+float picks_get_opt(DpTable *dp_table, int *pick_sequence) {
+  // Start from the last team, with all weeks.
+  uint32_t cur_weeks = ((uint32_t) 1 << dp_table->num_games) - 1;
+  for (int cur_team = dp_table->num_teams - 1; cur_team >= 0; --cur_team) {
+    uint8_t week = dp_table->choices[((size_t) cur_team <<
+                                      dp_table->num_games) + cur_weeks];
+    if (week != DP_NO_PICK) {
       pick_sequence[week] = cur_team;
+      cur_weeks = bitset_remove(cur_weeks, week);
+    }
+  }
+  return dp_table->opt_val;
+}
+
+/**
+ * Sets whether picks_find_opt() and picks_candidate_values() drop teams that
+ * cannot be in any optimal picks before running the DP.  On by default; the
+ * answers are the same either way.
+ */
+void picks_set_pruning(int enabled) {
+  pruning = enabled;
+}
+
+/**
+ * Finds the teams that may be in the best picks for weeks
+ * first_week..num_games-1.
+ *
+ * A team is dropped if in every one of those weeks, at least min_better other
+ * teams have strictly higher win probabilities.  With min_better at least the
+ * number of weeks, whichever week the team were picked in, one of those
+ * teams would be unused and could replace it for more expected wins, so the
+ * team is never in an optimal sequence.  Larger min_better also allow
+ * that many - (number of weeks) other teams to be excluded.
+ *
+ * Sets survivors to the indices of the other teams, in increasing order, and
+ * returns how many there are.
+ */
+static int picks_prune_teams(int first_week, int num_games,
+                             float **predictions, int min_better,
+                             int *survivors) {
+  int num_survivors = 0;
+  for (int i = 0; i < NUM_TEAMS; ++i) {
+    int dominated = pruning;
+    for (int week = first_week; week < num_games && dominated; ++week) {
+      int num_better = 0;
+      for (int k = 0; k < NUM_TEAMS; ++k) {
+        if (predictions[k][week] > predictions[i][week]) ++num_better;
+      }
+      dominated = num_better >= min_better;
+    }
+    if (!dominated) survivors[num_survivors++] = i;
+  }
+  if (profiling) {
+    __sync_fetch_and_add(&counters[PICKS_COUNTER_PRUNED_TEAMS],
+                         NUM_TEAMS - num_survivors);
+  }
+  return num_survivors;
+}
+
+/**
+ * Finds the best way to assign the given weeks to teams lo..hi-1, each team
+ * picked at most once.  Sets pick_sequence[weeks[j]] for each j, and returns
+ * the expected wins.
+ *
+ * If the DP table for the subproblem is over the memory budget, splits the
+ * teams in half and finds the best split of the weeks from one forward and
+ * one backward value layer, then recurses on both halves.
+ */
+static float picks_solve_range(float **predictions, int lo, int hi,
+                               int num_weeks, int *weeks, int *pick_sequence) {
+  if (num_weeks == 0) return 0;
+  int num_teams = hi - lo;
+
+  /* The predictions of teams lo..hi-1, restricted to the given weeks. */
+  float *sub_matrix = malloc((size_t) num_teams * num_weeks * sizeof(float));
+  float **rows = malloc(num_teams * sizeof(float *));
+  for (int i = 0; i < num_teams; ++i) {
+    rows[i] = sub_matrix + (size_t) i * num_weeks;
+    for (int j = 0; j < num_weeks; ++j) {
+      rows[i][j] = predictions[lo + i][weeks[j]];
     }
-    cur_weeks = prev_weeks;
   }
+
+  float opt_val;
+  if (num_teams == 1 ||
+      picks_table_bytes(num_teams, num_weeks) <= memory_budget) {
+    DpTable *dp_table = picks_run_dp_teams(num_teams, num_weeks, rows);
+    int *sub_sequence = calloc(num_weeks, sizeof(int));
+    opt_val = picks_get_opt(dp_table, sub_sequence);
+    for (int j = 0; j < num_weeks; ++j) {
+      pick_sequence[weeks[j]] = lo + sub_sequence[j];
+    }
+    free(sub_sequence);
+    picks_free_table(dp_table);
+  } else {
+    int mid = num_teams / 2;
+    float *forward = picks_empty_layer(num_weeks);
+    for (int i = 0; i < mid; ++i) {
+      picks_add_team(num_weeks, forward, forward, rows[i], NULL);
+    }
+    float *backward = picks_empty_layer(num_weeks);
+    for (int i = num_teams - 1; i >= mid; --i) {
+      picks_add_team(num_weeks, backward, backward, rows[i], NULL);
+    }
+    uint32_t all_weeks = ((uint32_t) 1 << num_weeks) - 1;
+    uint32_t best_set = 0;
+    opt_val = -INFINITY;
+    for (uint32_t set = 0; set <= all_weeks; ++set) {
+      float wins = forward[set] + backward[bitset_difference(set, all_weeks)];
+      if (wins > opt_val) {
+        opt_val = wins;
+        best_set = set;
+      }
+    }
+    free(forward);
+    free(backward);
+
+    int *first_weeks = malloc(num_weeks * sizeof(int));
+    int *second_weeks = malloc(num_weeks * sizeof(int));
+    int num_first = 0, num_second = 0;
+    for (int j = 0; j < num_weeks; ++j) {
+      if (bitset_contains(best_set, j)) {
+        first_weeks[num_first++] = weeks[j];
+      } else {
+        second_weeks[num_second++] = weeks[j];
+      }
+    }
+    picks_solve_range(predictions, lo, lo + mid, num_first, first_weeks,
+                      pick_sequence);
+    picks_solve_range(predictions, lo + mid, hi, num_second, second_weeks,
+                      pick_sequence);
+    free(first_weeks);
+    free(second_weeks);
+  }
+  free(rows);
+  free(sub_matrix);
   return opt_val;
 }
 
-void picks_print(int num_weeks, float opt_val, int *pick_sequence, char *names) {
-  printf("Optimal expected wins: %g.\n", opt_val);
-  printf("Optimal pick sequence:\n");
+/**
+ * Builds the assignment problem of weeks first_week..num_games-1 to teams.
+ * Rows are weeks, columns are teams, and costs are minus win probabilities.
+ */
+static Assignment *picks_assignment(int first_week, int num_games,
+                                    float **predictions) {
+  int num_weeks = num_games - first_week;
+  double *cost = malloc(((size_t) num_weeks * NUM_TEAMS + 1) *
+                        sizeof(double));
+  for (int j = 0; j < num_weeks; ++j) {
+    for (int i = 0; i < NUM_TEAMS; ++i) {
+      float pred = predictions[i][first_week + j];
+      cost[j * NUM_TEAMS + i] = pred == -INFINITY ? ASSIGNMENT_FORBIDDEN :
+                                                    -pred;
+    }
+  }
+  Assignment *a = assignment_solve(num_weeks, NUM_TEAMS, cost);
+  free(cost);
+  return a;
+}
+
+/* picks_find_opt() with the assignment engine. */
+static float picks_assignment_opt(int num_games, float **predictions,
+                                  int *pick_sequence) {
+  Assignment *a = picks_assignment(0, num_games, predictions);
+  assignment_get_columns(a, pick_sequence);
+  float opt_val = -INFINITY;
+  if (assignment_is_feasible(a)) {
+    opt_val = 0;
+    for (int j = 0; j < num_games; ++j) {
+      opt_val += predictions[pick_sequence[j]][j];
+    }
+  }
+  assignment_free(a);
+  return opt_val;
+}
+
+/* Used to sort BeamStates by decreasing value, then by teams used. */
+static int compare_beam_states(const void *a, const void *b) {
+  const BeamState *x = a, *y = b;
+  if (x->value != y->value) return x->value < y->value ? 1 : -1;
+  if (x->used_teams != y->used_teams) {
+    return x->used_teams < y->used_teams ? -1 : 1;
+  }
+  return 0;
+}
+
+/* Sets order to the teams sorted by decreasing prediction for one week. */
+static void picks_sort_teams(float **predictions, int week, int *order) {
+  for (int i = 0; i < NUM_TEAMS; ++i) {
+    int k = i;
+    for (; k > 0 && predictions[order[k - 1]][week] < predictions[i][week];
+         --k) {
+      order[k] = order[k - 1];
+    }
+    order[k] = i;
+  }
+}
+
+/**
+ * Approximately finds the best picks for weeks first_week..num_games-1
+ * without the teams in used_teams, by beam search.
+ *
+ * Partial pick sequences are extended a week at a time, each with the
+ * beam_top_k best teams it has not used, and only the beam_width best
+ * sequences are kept, with one per set of teams used.  With enough of both
+ * this is the week-by-week DP, which is exact; smaller limits take
+ * O(weeks * beam_width * beam_top_k) time.
+ *
+ * Fills in pick_sequence, with the team for week first_week + j at index j,
+ * and returns its expected wins, which are at most the optimum.  Unlike the
+ * DP, any number of weeks is allowed, not just PREDICTIONS_MAX_WEEKS.
+ */
+static float picks_beam(int first_week, int num_games, float **predictions,
+                        uint32_t used_teams, int *pick_sequence) {
+  int num_weeks = num_games - first_week;
+  if (num_weeks <= 0) return 0;
+  int top_k = beam_top_k < NUM_TEAMS ? beam_top_k : NUM_TEAMS;
+
+  /* beams[j] holds the sequences kept after week j, by decreasing value. */
+  BeamState **beams = malloc(num_weeks * sizeof(BeamState *));
+  BeamState start = {used_teams, 0, -1, -1};
+  BeamState *prev = &start;
+  int prev_size = 1;
+  for (int j = 0; j < num_weeks; ++j) {
+    int week = first_week + j;
+    int order[NUM_TEAMS];
+    picks_sort_teams(predictions, week, order);
+    BeamState *candidates = malloc(((size_t) prev_size * top_k + 1) *
+                                   sizeof(BeamState));
+    size_t num_candidates = 0;
+    for (int s = 0; s < prev_size; ++s) {
+      int num_tried = 0;
+      for (int k = 0; k < NUM_TEAMS && num_tried < top_k; ++k) {
+        int team = order[k];
+        uint32_t bit = (uint32_t) 1 << team;
+        if (prev[s].used_teams & bit) continue;
+        BeamState *c = candidates + num_candidates++;
+        c->used_teams = prev[s].used_teams | bit;
+        c->value = prev[s].value + predictions[team][week];
+        c->parent = s;
+        c->team = team;
+        ++num_tried;
+      }
+    }
+    qsort(candidates, num_candidates, sizeof(BeamState), compare_beam_states);
+
+    /* Keeps the best candidate for each set of teams, via a hash set of the
+       sets kept so far, in which 0 marks an empty slot. */
+    size_t max_size = num_candidates < (size_t) beam_width ? num_candidates :
+                                                             beam_width;
+    size_t num_slots = 2;
+    while (num_slots < 2 * max_size) num_slots <<= 1;
+    uint32_t *slots = calloc(num_slots, sizeof(uint32_t));
+    BeamState *beam = malloc((max_size + 1) * sizeof(BeamState));
+    int size = 0;
+    for (size_t c = 0; c < num_candidates && (size_t) size < max_size; ++c) {
+      uint32_t key = candidates[c].used_teams;
+      size_t slot = (key * 2654435761u) & (num_slots - 1);
+      while (slots[slot] != 0 && slots[slot] != key) {
+        slot = (slot + 1) & (num_slots - 1);
+      }
+      if (slots[slot] == key) continue;  /* A better one was kept. */
+      slots[slot] = key;
+      beam[size++] = candidates[c];
+    }
+    if (profiling) {
+      __sync_fetch_and_add(&counters[PICKS_COUNTER_BEAM_STATES],
+                           num_candidates);
+    }
+    free(slots);
+    free(candidates);
+    beams[j] = beam;
+    prev = beam;
+    prev_size = size;
+  }
+
+  /* The best sequence is first in the last beam. */
+  float value = -INFINITY;
+  memset(pick_sequence, 0, num_weeks * sizeof(int));
+  if (prev_size > 0) {
+    value = prev[0].value;
+    int s = 0;
+    for (int j = num_weeks - 1; j >= 0; --j) {
+      pick_sequence[j] = beams[j][s].team;
+      s = beams[j][s].parent;
+    }
+  }
+
+  /* Clean-up */
+  for (int j = 0; j < num_weeks; ++j) free(beams[j]);
+  free(beams);
+  return value;
+}
+
+/**
+ * Returns an upper bound on the expected wins of any picks for the given
+ * predictions: the sum over weeks of the best win probability that week.
+ * The gap between it and the picks found by PICKS_ENGINE_BEAM bounds how far
+ * they are from optimal.
+ */
+float picks_upper_bound(int num_games, float **predictions) {
+  float bound = 0;
+  for (int j = 0; j < num_games; ++j) {
+    float best = -INFINITY;
+    for (int i = 0; i < NUM_TEAMS; ++i) {
+      if (predictions[i][j] > best) best = predictions[i][j];
+    }
+    bound += best;
+  }
+  return bound;
+}
+
+/**
+ * Finds the optimal sequence of picks within the memory budget.
+ *
+ * Fills in pick_sequence, which must have room for num_games entries, and
+ * returns the optimal expected wins.
+ */
+float picks_find_opt(int num_games, float **predictions, int *pick_sequence) {
+  if (engine == PICKS_ENGINE_ASSIGNMENT) {
+    return picks_assignment_opt(num_games, predictions, pick_sequence);
+  }
+  if (engine == PICKS_ENGINE_BEAM) {
+    return picks_beam(0, num_games, predictions, 0, pick_sequence);
+  }
+  int survivors[NUM_TEAMS];
+  int num_teams = picks_prune_teams(0, num_games, predictions, num_games,
+                                    survivors);
+  float *rows[NUM_TEAMS];
+  for (int k = 0; k < num_teams; ++k) rows[k] = predictions[survivors[k]];
+  int weeks[PREDICTIONS_MAX_WEEKS];
+  for (int j = 0; j < num_games; ++j) weeks[j] = j;
+  float opt_val = picks_solve_range(rows, 0, num_teams, num_games, weeks,
+                                    pick_sequence);
+  for (int j = 0; j < num_games; ++j) {
+    pick_sequence[j] = survivors[pick_sequence[j]];
+  }
+  return opt_val;
+}
+
+/* Prints a pick sequence, whose first pick is for first_week. */
+static void picks_print_sequence(int first_week, int num_weeks,
+                                 int *pick_sequence, char *names) {
   for (int i = 0; i < num_weeks; ++i) {
-    int week = 17 - num_weeks + i + 1;
+    int week = first_week + i;
     char *team_name = names + 4 * pick_sequence[i];
     printf("  Week %d: %s\n", week, team_name);
   }
 }
 
-/* Runs the pipeline to make picks based on game predictions. */
-void picks_run(char *filename, char *teams_to_avoid) { 
-  float **predictions = predictions_allocate();
-  char team_names[NUM_TEAMS * 4];
-  int num_games = predictions_read(filename, teams_to_avoid, predictions,
-                                   team_names);
-  DpCell **dp_table = picks_run_dp(num_games, predictions);
+/* Prints the optimal pick sequence, whose first pick is for first_week. */
+void picks_print(int first_week, int num_weeks, float opt_val,
+                 int *pick_sequence, char *names) {
+  printf("Optimal expected wins: %g.\n", opt_val);
+  printf("Optimal pick sequence:\n");
+  picks_print_sequence(first_week, num_weeks, pick_sequence, names);
+}
+
+/**
+ * Runs the pipeline to make picks based on game predictions.
+ *
+ * The predictions file may be in either format of predictions_load().  The
+ * predictions start at first_week.  If first_week is 0, uses the week recorded
+ * in binary files, and otherwise assumes the predictions run until the end of
+ * a season of PREDICTIONS_DEFAULT_SEASON_WEEKS weeks.
+ */
+void picks_run(char *filename, char *teams_to_avoid, int first_week) { 
+  double start = picks_profile_start();
+  Predictions *predictions = predictions_load(filename, teams_to_avoid);
+  picks_profile_end(PICKS_STAGE_READ, start);
+  int num_games = predictions->num_games;
+  if (first_week == 0) first_week = predictions->first_week;
+  if (first_week == 0) {
+    first_week = PREDICTIONS_DEFAULT_SEASON_WEEKS - num_games + 1;
+  }
   int *pick_sequence = calloc(num_games, sizeof(int));
-  float opt_val = picks_get_opt(dp_table, num_games, pick_sequence);
-  picks_print(num_games, opt_val, pick_sequence, team_names);
+  start = picks_profile_start();
+  float opt_val = picks_find_opt(num_games, predictions->rows, pick_sequence);
+  picks_profile_end(PICKS_STAGE_SOLVE, start);
+  if (engine == PICKS_ENGINE_BEAM) {
+    printf("Approximate expected wins: %g.\n", opt_val);
+    printf("Upper bound on optimal expected wins: %g.\n",
+           picks_upper_bound(num_games, predictions->rows));
+    printf("Pick sequence:\n");
+    picks_print_sequence(first_week, num_games, pick_sequence,
+                         predictions->names);
+  } else {
+    picks_print(first_week, num_games, opt_val, pick_sequence,
+                predictions->names);
+  }
 
   /* Clean-up */
-  predictions_free(predictions);
+  predictions_unload(predictions);
   free(pick_sequence);
-  picks_free_table(dp_table);
 }
 
 /* Used to sort PickCandidates by expected wins */
@@ -131,44 +651,208 @@ int compare_pick_candidates(const void *a, const void *b) {
   return 0;
 }
 
-/* Compares the options of printing all teams */
-void picks_compare(char *filename, char *teams_to_avoid) {
-  float **predictions = predictions_allocate();
-  char team_names[NUM_TEAMS * 4];
-  int num_games = predictions_read(filename, teams_to_avoid, predictions,
-                                   team_names);
-  int *pick_sequence = calloc(num_games, sizeof(int));
+/**
+ * picks_candidate_values() with the assignment engine.
+ *
+ * One assignment of the remaining weeks to all teams is solved.  Teams that
+ * are not in it can be picked now without changing the rest.  For each of the
+ * at most num_games - 1 teams in it, the solution is re-solved without that
+ * team, which only takes one augmenting path from the solution's potentials.
+ */
+static void picks_assignment_candidate_values(int num_games,
+                                              float **predictions,
+                                              float *values) {
+  Assignment *rest = picks_assignment(1, num_games, predictions);
+  for (int i = 0; i < NUM_TEAMS; ++i) {
+    values[i] = NAN;
+    if (!(predictions[i][0] >= 0)) continue;
+    Assignment *a = rest;
+    if (rest->col_row[i + 1] != 0) {
+      a = assignment_copy(rest);
+      assignment_remove_column(a, i);
+    }
+    values[i] = -INFINITY;
+    if (assignment_is_feasible(a)) {
+      values[i] = predictions[i][0] + (float) -assignment_cost(a);
+    }
+    if (a != rest) assignment_free(a);
+  }
+  assignment_free(rest);
+}
 
-  /* Create new version of predictions that ignores the current week. */
-  float *pred_skip_cur[NUM_TEAMS];
+/**
+ * picks_candidate_values() with the beam engine.
+ *
+ * As with the assignment engine, the remaining weeks are searched once with
+ * all teams, and again without each team in the picks found.  Each value is
+ * the expected wins of picks that were found, so at most the optimum.
+ */
+static void picks_beam_candidate_values(int num_games, float **predictions,
+                                        float *values) {
+  int *rest_sequence = calloc(num_games, sizeof(int));
+  int *pick_sequence = calloc(num_games, sizeof(int));
+  float rest_val = picks_beam(1, num_games, predictions, 0, rest_sequence);
+  uint32_t rest_teams = 0;
+  for (int j = 0; j < num_games - 1; ++j) {
+    rest_teams |= (uint32_t) 1 << rest_sequence[j];
+  }
   for (int i = 0; i < NUM_TEAMS; ++i) {
-    pred_skip_cur[i] = predictions[i] + 1;  /* Advance one week */
+    values[i] = NAN;
+    if (!(predictions[i][0] >= 0)) continue;
+    uint32_t bit = (uint32_t) 1 << i;
+    values[i] = predictions[i][0] +
+                (rest_teams & bit ? picks_beam(1, num_games, predictions, bit,
+                                               pick_sequence) : rest_val);
+  }
+
+  /* Clean-up */
+  free(rest_sequence);
+  free(pick_sequence);
+}
+
+/**
+ * The DP part of picks_candidate_values(), for num_teams teams.
+ *
+ * Instead of re-running the DP once per team, we compute for the remaining
+ * weeks both a prefix DP over teams 0..i-1 and a suffix DP over teams
+ * i+1..num_teams-1.  The best way to fill the remaining weeks without team i
+ * splits them between the two:
+ *    max over week subsets S of prefix[i][S] + suffix[i][all weeks - S].
+ * The prefix layer is rolled forward.  If all suffix layers fit in the memory
+ * budget, they are stored; otherwise we only store every block_size-th one
+ * on a first backward pass, and recompute the others one block at a time.
+ *
+ * Returns the optimal expected wins in the remaining weeks using any of the
+ * teams.
+ */
+static float picks_dp_candidate_values(int num_teams, int num_games,
+                                       float **predictions, float *values) {
+  int num_rest = num_games - 1;  /* Weeks after the current one. */
+  uint32_t num_sets = (uint32_t) 1 << num_rest;
+  uint32_t all_weeks = num_sets - 1;
+  size_t layer_bytes = num_sets * sizeof(float);
+
+  /* Teams are processed in blocks [start, start + block_size). */
+  int block_size = num_teams > 0 ? num_teams : 1;
+  if ((num_teams + 1) * layer_bytes > memory_budget) {
+    /* ceil(sqrt(num_teams)), without linking libm. */
+    block_size = 1;
+    while (block_size * block_size < num_teams) ++block_size;
+  }
+  int num_blocks = (num_teams + block_size - 1) / block_size;
+
+  /**
+   * checkpoints + b * num_sets is the suffix layer for the last team in block
+   * b, i.e. for teams after the block.
+   */
+  float *checkpoints = malloc(num_blocks * layer_bytes + 1);
+  float *layer = picks_empty_layer(num_rest);
+  for (int i = num_teams - 1; i >= 0; --i) {
+    if (i % block_size == block_size - 1 || i == num_teams - 1) {
+      memcpy(checkpoints + (size_t) (i / block_size) * num_sets, layer,
+             layer_bytes);
+      if (num_blocks == 1) break;
+    }
+    picks_add_team(num_rest, layer, layer, predictions[i] + 1, NULL);
+  }
+
+  /* suffix + (i - start) * num_sets is the suffix layer for team i. */
+  float *suffix = malloc(block_size * layer_bytes);
+  float *prefix = layer;
+  for (uint32_t set = 0; set < num_sets; ++set) prefix[set] = -INFINITY;
+  prefix[0] = 0;
+  for (int start = 0; start < num_teams; start += block_size) {
+    int end = start + block_size < num_teams ? start + block_size : num_teams;
+    memcpy(suffix + (size_t) (end - 1 - start) * num_sets,
+           checkpoints + (size_t) (start / block_size) * num_sets,
+           layer_bytes);
+    for (int i = end - 1; i > start; --i) {
+      picks_add_team(num_rest, suffix + (size_t) (i - start) * num_sets,
+                     suffix + (size_t) (i - 1 - start) * num_sets,
+                     predictions[i] + 1, NULL);
+    }
+    for (int i = start; i < end; ++i) {
+      values[i] = NAN;
+      if (predictions[i][0] >= 0) {
+        float *cur_suffix = suffix + (size_t) (i - start) * num_sets;
+        float best = -INFINITY;
+        for (uint32_t set = 0; set < num_sets; ++set) {
+          float wins = prefix[set] + cur_suffix[bitset_difference(set,
+                                                                  all_weeks)];
+          if (wins > best) best = wins;
+        }
+        values[i] = predictions[i][0] + best;
+      }
+      picks_add_team(num_rest, prefix, prefix, predictions[i] + 1, NULL);
+    }
   }
+  float rest_val = prefix[all_weeks];
 
-  /* Create an array of all -Inf */
-  float *all_neg_inf = calloc(num_games, sizeof(float *));
-  for (int i = 0; i < num_games; ++i) {
-    all_neg_inf[i] = -INFINITY;
+  /* Clean-up */
+  free(prefix);
+  free(suffix);
+  free(checkpoints);
+  return rest_val;
+}
+
+/**
+ * Computes the value of picking each team in the current week.
+ *
+ * values[i] is set to the optimal expected wins if team i is picked in the
+ * current week, or NAN if team i cannot be picked (e.g. it has been used).
+ *
+ * With the DP engine, teams that cannot help fill the remaining weeks even
+ * when any one other team is picked now are pruned first (see
+ * picks_prune_teams).  Picking such a team now leaves the best picks for the
+ * remaining weeks unchanged.
+ */
+void picks_candidate_values(int num_games, float **predictions, float *values) {
+  if (num_games < 1) {
+    for (int i = 0; i < NUM_TEAMS; ++i) values[i] = NAN;
+    return;
+  }
+  if (engine == PICKS_ENGINE_ASSIGNMENT) {
+    picks_assignment_candidate_values(num_games, predictions, values);
+    return;
+  }
+  if (engine == PICKS_ENGINE_BEAM) {
+    picks_beam_candidate_values(num_games, predictions, values);
+    return;
+  }
+  int survivors[NUM_TEAMS];
+  int num_teams = picks_prune_teams(1, num_games, predictions, num_games,
+                                    survivors);
+  float *rows[NUM_TEAMS];
+  float survivor_values[NUM_TEAMS];
+  for (int k = 0; k < num_teams; ++k) rows[k] = predictions[survivors[k]];
+  float rest_val = picks_dp_candidate_values(num_teams, num_games, rows,
+                                             survivor_values);
+  for (int i = 0; i < NUM_TEAMS; ++i) {
+    values[i] = predictions[i][0] >= 0 ? predictions[i][0] + rest_val : NAN;
+  }
+  for (int k = 0; k < num_teams; ++k) {
+    values[survivors[k]] = survivor_values[k];
   }
+}
+
+/* Compares the options of printing all teams */
+void picks_compare(char *filename, char *teams_to_avoid) {
+  double start = picks_profile_start();
+  Predictions *predictions = predictions_load(filename, teams_to_avoid);
+  picks_profile_end(PICKS_STAGE_READ, start);
+  char *team_names = predictions->names;
+  float values[NUM_TEAMS];
+  start = picks_profile_start();
+  picks_candidate_values(predictions->num_games, predictions->rows, values);
+  picks_profile_end(PICKS_STAGE_COMPARE, start);
 
   PickCandidate candidates[NUM_TEAMS];
   memset(candidates, 0, NUM_TEAMS * sizeof(PickCandidate));
   for (int i = 0; i < NUM_TEAMS; ++i) {
-    if (pred_skip_cur[i][0] < 0)
+    if (isnan(values[i]))
       continue;
-    /* Preclude picking this team in subsequent weeks */
-    float *save = pred_skip_cur[i];
-    pred_skip_cur[i] = all_neg_inf;
-    DpCell **dp_table = picks_run_dp(num_games, pred_skip_cur);
-    float opt_val = picks_get_opt(dp_table, num_games, pick_sequence);
     candidates[i].team_name = team_names + 4 * i;
-    candidates[i].expected_wins = predictions[i][0] + opt_val;
-
-    /* Reset */
-    pred_skip_cur[i] = save;
-
-    /* Clean-up */
-    picks_free_table(dp_table);
+    candidates[i].expected_wins = values[i];
   }
   qsort(candidates, NUM_TEAMS, sizeof(PickCandidate), compare_pick_candidates);
   printf("Comparing different picks for the current week:\n");
@@ -178,9 +862,449 @@ void picks_compare(char *filename, char *teams_to_avoid) {
             candidates[i].expected_wins);
     }
   }
+  if (engine == PICKS_ENGINE_BEAM) {
+    printf("Upper bound on optimal expected wins: %g.\n",
+           picks_upper_bound(predictions->num_games, predictions->rows));
+  }
 
   /* Clean-up */
-  free(all_neg_inf);
-  predictions_free(predictions);
+  predictions_unload(predictions);
+}
+
+/**
+ * Makes a what-if state for the given predictions, which are copied.
+ *
+ * Edit predictions with picks_what_if_edit(), then query the optimal picks
+ * and candidate values for the current week with picks_what_if_opt() and
+ * picks_what_if_candidate_values(), as often as needed.  These give the same
+ * answers as picks_find_opt() and picks_candidate_values() with the DP
+ * engine, up to rounding and ties, but each query only rebuilds the DP
+ * layers of teams edited since the state was made, and of teams after the
+ * first newly edited one the first time a team is edited.  The state takes
+ * about 2^num_games * 230 bytes, 30MB for 17 weeks; if that is over the
+ * memory budget, queries are solved from scratch instead.
+ */
+PicksWhatIf *picks_what_if_new(int num_games, float **predictions) {
+  PicksWhatIf *w = malloc(sizeof(PicksWhatIf));
+  w->num_games = num_games;
+  for (int i = 0; i < NUM_TEAMS; ++i) {
+    w->rows[i] = malloc((num_games + 1) * sizeof(float));
+    memcpy(w->rows[i], predictions[i], num_games * sizeof(float));
+    w->order[i] = i;
+    w->position[i] = i;
+    w->suffix_valid[i] = 0;
+  }
+  w->num_unedited = NUM_TEAMS;
+  w->num_valid = 0;
+  w->layers = NULL;
+  w->choices = NULL;
+  w->suffixes = NULL;
+
+  size_t num_sets = (size_t) 1 << num_games;
+  size_t bytes = num_sets * ((NUM_TEAMS + 1) * sizeof(float) +
+                             NUM_TEAMS * sizeof(uint8_t) +
+                             NUM_TEAMS * sizeof(float) / 2);
+  if (num_games >= 1 && bytes <= memory_budget) {
+    w->layers = malloc((NUM_TEAMS + 1) * num_sets * sizeof(float));
+    w->choices = malloc(NUM_TEAMS * num_sets * sizeof(uint8_t));
+    w->suffixes = malloc(NUM_TEAMS * (num_sets / 2) * sizeof(float));
+    float *empty = picks_empty_layer(num_games);
+    memcpy(w->layers, empty, num_sets * sizeof(float));
+    free(empty);
+  }
+  return w;
+}
+
+/**
+ * Sets the prediction for team in week (counted from the first week of the
+ * predictions) to prediction.  The team is moved after the unedited teams,
+ * so that later edits to it only invalidate its own layer.
+ */
+void picks_what_if_edit(PicksWhatIf *w, int team, int week,
+                        float prediction) {
+  w->rows[team][week] = prediction;
+  int pos = w->position[team];
+  if (pos < w->num_valid) w->num_valid = pos;
+  if (pos >= w->num_unedited) return;
+
+  /* Suffixes of teams before it included it. */
+  for (int k = 0; k < pos; ++k) w->suffix_valid[w->order[k]] = 0;
+  for (int k = pos; k < NUM_TEAMS - 1; ++k) {
+    w->order[k] = w->order[k + 1];
+    w->position[w->order[k]] = k;
+  }
+  w->order[NUM_TEAMS - 1] = team;
+  w->position[team] = NUM_TEAMS - 1;
+  w->suffix_valid[team] = 0;
+  --w->num_unedited;
+}
+
+/* Brings the DP layers and suffixes of a what-if state up to date. */
+static void picks_what_if_update(PicksWhatIf *w) {
+  int num_games = w->num_games;
+  size_t num_sets = (size_t) 1 << num_games;
+  for (int k = w->num_valid; k < NUM_TEAMS; ++k) {
+    picks_add_team(num_games, w->layers + k * num_sets,
+                   w->layers + (k + 1) * num_sets, w->rows[w->order[k]],
+                   w->choices + k * num_sets);
+  }
+  w->num_valid = NUM_TEAMS;
+
+  size_t num_rest_sets = num_sets / 2;
+  for (int k = w->num_unedited - 1; k >= 0; --k) {
+    int team = w->order[k];
+    if (w->suffix_valid[team]) continue;
+    float *suffix = w->suffixes + team * num_rest_sets;
+    if (k == w->num_unedited - 1) {
+      float *empty = picks_empty_layer(num_games - 1);
+      memcpy(suffix, empty, num_rest_sets * sizeof(float));
+      free(empty);
+    } else {
+      int next = w->order[k + 1];
+      picks_add_team(num_games - 1, w->suffixes + next * num_rest_sets,
+                     suffix, w->rows[next] + 1, NULL);
+    }
+    w->suffix_valid[team] = 1;
+  }
+}
+
+/**
+ * Follows the choices of the first num_teams teams of a what-if state back
+ * from the weeks in set, filling in pick_sequence for those weeks.
+ *
+ * Returns the set of teams picked.
+ */
+static uint32_t picks_what_if_sequence(PicksWhatIf *w, int num_teams,
+                                       uint32_t set, int *pick_sequence) {
+  uint32_t teams = 0;
+  for (int k = num_teams - 1; k >= 0; --k) {
+    uint8_t week = w->choices[((size_t) k << w->num_games) + set];
+    if (week != DP_NO_PICK) {
+      pick_sequence[week] = w->order[k];
+      teams |= (uint32_t) 1 << w->order[k];
+      set = bitset_remove(set, week);
+    }
+  }
+  return teams;
+}
+
+/**
+ * Like picks_find_opt(), for the edited predictions of a what-if state.
+ */
+float picks_what_if_opt(PicksWhatIf *w, int *pick_sequence) {
+  if (!w->layers) return picks_find_opt(w->num_games, w->rows, pick_sequence);
+  picks_what_if_update(w);
+  uint32_t all_weeks = ((uint32_t) 1 << w->num_games) - 1;
+  picks_what_if_sequence(w, NUM_TEAMS, all_weeks, pick_sequence);
+  return w->layers[((size_t) NUM_TEAMS << w->num_games) + all_weeks];
+}
+
+/**
+ * Like picks_candidate_values(), for the edited predictions of a what-if
+ * state.
+ *
+ * The sets of weeks without the first are the DP over the remaining weeks,
+ * whose optimal picks are followed back from the last layer.  Teams that are
+ * not in them can be picked now without changing them.  For each of the
+ * others, the best picks without it join the layer before it, with the
+ * edited teams added, to the unedited teams after it (its suffix).
+ */
+void picks_what_if_candidate_values(PicksWhatIf *w, float *values) {
+  int num_games = w->num_games;
+  if (!w->layers) {
+    picks_candidate_values(num_games, w->rows, values);
+    return;
+  }
+  picks_what_if_update(w);
+  size_t num_sets = (size_t) 1 << num_games;
+  size_t num_rest_sets = num_sets / 2;
+  uint32_t all_rest = (uint32_t) num_rest_sets - 1;
+
+  /* Sets of the remaining weeks are the even sets of all weeks. */
+  int rest_sequence[PREDICTIONS_MAX_WEEKS + 1];
+  uint32_t rest_teams = picks_what_if_sequence(w, NUM_TEAMS, all_rest << 1,
+                                               rest_sequence);
+  float rest_val = w->layers[NUM_TEAMS * num_sets + (all_rest << 1)];
+
+  float *layer = malloc(num_rest_sets * sizeof(float));
+  for (int i = 0; i < NUM_TEAMS; ++i) {
+    values[i] = NAN;
+    if (!(w->rows[i][0] >= 0)) continue;
+    if (!(rest_teams & ((uint32_t) 1 << i))) {
+      values[i] = w->rows[i][0] + rest_val;
+      continue;
+    }
+    int pos = w->position[i];
+    int start = pos < w->num_unedited ? pos : w->num_unedited;
+    float *prefix = w->layers + start * num_sets;
+    for (uint32_t set = 0; set <= all_rest; ++set) {
+      layer[set] = prefix[set << 1];
+    }
+    for (int k = w->num_unedited; k < NUM_TEAMS; ++k) {
+      if (k == pos) continue;
+      picks_add_team(num_games - 1, layer, layer, w->rows[w->order[k]] + 1,
+                     NULL);
+    }
+    float best = layer[all_rest];
+    if (pos < w->num_unedited) {
+      float *suffix = w->suffixes + i * num_rest_sets;
+      best = -INFINITY;
+      for (uint32_t set = 0; set <= all_rest; ++set) {
+        float wins = layer[set] + suffix[bitset_difference(set, all_rest)];
+        if (wins > best) best = wins;
+      }
+    }
+    values[i] = w->rows[i][0] + best;
+  }
+  free(layer);
+}
+
+void picks_what_if_free(PicksWhatIf *w) {
+  for (int i = 0; i < NUM_TEAMS; ++i) free(w->rows[i]);
+  free(w->layers);
+  free(w->choices);
+  free(w->suffixes);
+  free(w);
+}
+
+/* The best possible expected wins of pick sequences extending a path. */
+static float picks_kbest_bound(PicksKBest *kb, KBestPath *path) {
+  return path->wins +
+         kb->layers[((size_t) path->num_teams << kb->num_games) + path->set];
+}
+
+/* Whether the path at heap index a should be expanded before b. */
+static int picks_kbest_before(PicksKBest *kb, int a, int b) {
+  return picks_kbest_bound(kb, kb->paths + kb->heap[a]) >
+         picks_kbest_bound(kb, kb->paths + kb->heap[b]);
+}
+
+/* Queues a path, unless no pick sequence extends it. */
+static void picks_kbest_push(PicksKBest *kb, int num_teams, uint32_t set,
+                             float wins, int parent, int week) {
+  KBestPath path = {num_teams, set, wins, parent, week};
+  if (picks_kbest_bound(kb, &path) == -INFINITY) return;
+  if (kb->num_paths == kb->capacity) {
+    kb->capacity *= 2;
+    kb->paths = realloc(kb->paths, kb->capacity * sizeof(KBestPath));
+    kb->heap = realloc(kb->heap, kb->capacity * sizeof(int));
+  }
+  kb->paths[kb->num_paths] = path;
+  int i = kb->heap_size++;
+  kb->heap[i] = kb->num_paths++;
+  while (i > 0 && picks_kbest_before(kb, i, (i - 1) / 2)) {
+    int tmp = kb->heap[i];
+    kb->heap[i] = kb->heap[(i - 1) / 2];
+    kb->heap[(i - 1) / 2] = tmp;
+    i = (i - 1) / 2;
+  }
+  if (profiling) {
+    __sync_fetch_and_add(&counters[PICKS_COUNTER_KBEST_PATHS], 1);
+  }
+}
+
+/* Removes and returns the queued path with the best bound. */
+static int picks_kbest_pop(PicksKBest *kb) {
+  int top = kb->heap[0];
+  kb->heap[0] = kb->heap[--kb->heap_size];
+  int i = 0;
+  while (1) {
+    int best = i;
+    for (int child = 2 * i + 1; child <= 2 * i + 2; ++child) {
+      if (child < kb->heap_size && picks_kbest_before(kb, child, best)) {
+        best = child;
+      }
+    }
+    if (best == i) break;
+    int tmp = kb->heap[i];
+    kb->heap[i] = kb->heap[best];
+    kb->heap[best] = tmp;
+    i = best;
+  }
+  return top;
+}
+
+/**
+ * Starts enumerating the max_k best pick sequences for the predictions, in
+ * decreasing order of expected wins.  Call picks_kbest_next() for each.
+ *
+ * Paths run back through the DP table from its last state, one team at a
+ * time, either skipping the team or picking it in one of the weeks left.
+ * The DP values give the best expected wins of any sequence extending a
+ * path, so expanding the path with the best bound first finds complete
+ * sequences in order, after expanding at most num_teams paths per sequence
+ * (more with ties).
+ *
+ * A team can only be in one of the max_k best sequences if, in some week,
+ * fewer than num_games + max_k - 1 other teams are better: otherwise each
+ * sequence using it has max_k better ones, each replacing it with a
+ * different unused better team.  Other teams are pruned, as in
+ * picks_prune_teams().
+ *
+ * Unlike picks_find_opt(), the whole table of DP values is kept, which takes
+ * (teams + 1) * 2^num_games floats.  Returns NULL if that is over the memory
+ * budget.
+ */
+PicksKBest *picks_kbest_new(int num_games, float **predictions, int max_k) {
+  int survivors[NUM_TEAMS];
+  int min_better = max_k < NUM_TEAMS ? num_games + max_k - 1 : NUM_TEAMS;
+  int num_teams = picks_prune_teams(0, num_games, predictions, min_better,
+                                    survivors);
+  size_t num_sets = (size_t) 1 << num_games;
+  if ((num_teams + 1) * num_sets * sizeof(float) > memory_budget) return NULL;
+  PicksKBest *kb = malloc(sizeof(PicksKBest));
+  kb->num_games = num_games;
+  kb->max_k = max_k;
+  kb->num_returned = 0;
+  kb->num_teams = num_teams;
+  kb->layers = malloc((kb->num_teams + 1) * num_sets * sizeof(float));
+  float *empty = picks_empty_layer(num_games);
+  memcpy(kb->layers, empty, num_sets * sizeof(float));
+  free(empty);
+  for (int k = 0; k < kb->num_teams; ++k) {
+    kb->teams[k] = survivors[k];
+    kb->rows[k] = malloc((num_games + 1) * sizeof(float));
+    memcpy(kb->rows[k], predictions[survivors[k]], num_games * sizeof(float));
+    picks_add_team(num_games, kb->layers + k * num_sets,
+                   kb->layers + (k + 1) * num_sets, kb->rows[k], NULL);
+  }
+
+  kb->capacity = 64;
+  kb->paths = malloc(kb->capacity * sizeof(KBestPath));
+  kb->heap = malloc(kb->capacity * sizeof(int));
+  kb->num_paths = 0;
+  kb->heap_size = 0;
+  picks_kbest_push(kb, kb->num_teams, (uint32_t) num_sets - 1, 0, -1, -1);
+  return kb;
+}
+
+/**
+ * Finds the next best pick sequence, filling in expected_wins and
+ * pick_sequence.
+ *
+ * Returns 0 instead if max_k sequences have been found already, or there are
+ * no more, e.g. because there are fewer teams left than weeks.
+ */
+int picks_kbest_next(PicksKBest *kb, float *expected_wins,
+                     int *pick_sequence) {
+  if (kb->num_returned >= kb->max_k) return 0;
+  while (kb->heap_size > 0) {
+    int index = picks_kbest_pop(kb);
+    KBestPath path = kb->paths[index];
+    if (path.num_teams == 0) {
+      for (int i = index; kb->paths[i].parent >= 0; i = kb->paths[i].parent) {
+        if (kb->paths[i].week >= 0) {
+          pick_sequence[kb->paths[i].week] =
+              kb->teams[kb->paths[i].num_teams];
+        }
+      }
+      *expected_wins = path.wins;
+      ++kb->num_returned;
+      return 1;
+    }
+    int team = path.num_teams - 1;
+    picks_kbest_push(kb, team, path.set, path.wins, index, -1);
+    for (int week = 0; week < kb->num_games; ++week) {
+      if (!bitset_contains(path.set, week)) continue;
+      picks_kbest_push(kb, team, bitset_remove(path.set, week),
+                       path.wins + kb->rows[team][week], index, week);
+    }
+  }
+  return 0;
+}
+
+void picks_kbest_free(PicksKBest *kb) {
+  for (int k = 0; k < kb->num_teams; ++k) free(kb->rows[k]);
+  free(kb->layers);
+  free(kb->paths);
+  free(kb->heap);
+  free(kb);
+}
+
+/**
+ * Like picks_run(), but prints the k best pick sequences, each as soon as it
+ * is found.
+ */
+void picks_run_kbest(char *filename, char *teams_to_avoid, int first_week,
+                     int k) {
+  double start = picks_profile_start();
+  Predictions *predictions = predictions_load(filename, teams_to_avoid);
+  picks_profile_end(PICKS_STAGE_READ, start);
+  int num_games = predictions->num_games;
+  if (first_week == 0) first_week = predictions->first_week;
+  if (first_week == 0) {
+    first_week = PREDICTIONS_DEFAULT_SEASON_WEEKS - num_games + 1;
+  }
+  int *pick_sequence = calloc(num_games + 1, sizeof(int));
+  float expected_wins;
+  start = picks_profile_start();
+  PicksKBest *kb = picks_kbest_new(num_games, predictions->rows, k);
+  if (!kb) {
+    fprintf(stderr, "The DP table for %d weeks does not fit in the memory "
+            "budget; raise it with -m.\n", num_games);
+    exit(1);
+  }
+  for (int rank = 1; picks_kbest_next(kb, &expected_wins, pick_sequence);
+       ++rank) {
+    printf("Pick sequence %d, expected wins: %g.\n", rank, expected_wins);
+    picks_print_sequence(first_week, num_games, pick_sequence,
+                         predictions->names);
+    fflush(stdout);
+  }
+  picks_profile_end(PICKS_STAGE_SOLVE, start);
+
+  /* Clean-up */
+  picks_kbest_free(kb);
+  predictions_unload(predictions);
   free(pick_sequence);
 }
+
+/* Points a row-pointer array at the rows of a contiguous matrix. */
+static void picks_matrix_rows(int num_games, float *matrix, float **rows) {
+  for (int i = 0; i < NUM_TEAMS; ++i) {
+    rows[i] = matrix + i * num_games;
+  }
+}
+
+/**
+ * Finds the optimal pick sequence for a contiguous, row-major
+ * NUM_TEAMS x num_games matrix of predictions, without copying it.
+ *
+ * Fills in pick_sequence, which must have room for num_games entries, and
+ * returns the optimal expected wins.
+ */
+float picks_solve(int num_games, float *matrix, int *pick_sequence) {
+  float *rows[NUM_TEAMS];
+  picks_matrix_rows(num_games, matrix, rows);
+  return picks_find_opt(num_games, rows, pick_sequence);
+}
+
+/* Like picks_upper_bound(), for a contiguous matrix as in picks_solve(). */
+float picks_upper_bound_matrix(int num_games, float *matrix) {
+  float *rows[NUM_TEAMS];
+  picks_matrix_rows(num_games, matrix, rows);
+  return picks_upper_bound(num_games, rows);
+}
+
+/* Like picks_what_if_new(), for a contiguous matrix as in picks_solve(). */
+PicksWhatIf *picks_what_if_new_matrix(int num_games, float *matrix) {
+  float *rows[NUM_TEAMS];
+  picks_matrix_rows(num_games, matrix, rows);
+  return picks_what_if_new(num_games, rows);
+}
+
+/* Like picks_kbest_new(), for a contiguous matrix as in picks_solve(). */
+PicksKBest *picks_kbest_new_matrix(int num_games, float *matrix, int max_k) {
+  float *rows[NUM_TEAMS];
+  picks_matrix_rows(num_games, matrix, rows);
+  return picks_kbest_new(num_games, rows, max_k);
+}
+
+/**
+ * Like picks_candidate_values(), for a contiguous matrix as in picks_solve().
+ */
+void picks_compare_matrix(int num_games, float *matrix, float *values) {
+  float *rows[NUM_TEAMS];
+  picks_matrix_rows(num_games, matrix, rows);
+  picks_candidate_values(num_games, rows, values);
+}
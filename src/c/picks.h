@@ -5,39 +5,218 @@
  * subsets of teams, of which there are 2^32 ~ 4 billion.  The trick is to do
  * the DP goes team-by-team, so that the DP state is pairs
  *    (number of teams, subsets of weeks)
- * of which there are 32 * 2^17 ~ 2 million.  dp_table[i][week_subset] gives
+ * of which there are 32 * 2^17 ~ 4 million (32 * 2^18 ~ 8 million for an
+ * 18-week season).  dp_table[i][week_subset] gives
  * the optimal expected wins if you only choose games in week_subset and only
  * pick one of the first i teams.
  * 
  * As in sequence alignement, we store pointers between nodes so that we can recover
- * the entire sequence of optimal picks.
+ * the entire sequence of optimal picks.  Each pointer is just the week picked
+ * for the current team, which fits in a byte.  If even that table would not
+ * fit in the memory budget (see picks_set_memory_budget), we use Hirschberg's
+ * trick instead: run the DP forwards over the first half of the teams and
+ * backwards over the second half, keeping only values, find the best way to
+ * split the weeks between the halves, and recurse on each half.
  * 
- * TODO(robinjia): Figure out if there's a better way to get the expectimax
- * outcome given that you pick team i in the current week.  Dumb way is just to
- * run this 32 times.
+ * To get the expectimax outcome given that you pick team i in the current
+ * week, we combine a DP over the teams before i with a DP over the teams after
+ * i, which gives the values for all teams from two table builds instead of 32
+ * (see picks_candidate_values).
+ *
+ * Many teams are never worth picking: if in every remaining week there are
+ * enough better teams, any sequence using the team can be improved.  Such
+ * teams are dropped before the DP (see picks_set_pruning), which late in the
+ * season removes most of the layers.
+ *
+ * Since picking a team only adds its win probability, the optimal picks are
+ * also a maximum weight matching between weeks and teams, which the
+ * Hungarian algorithm finds in polynomial time (see assignment.h).  Which
+ * algorithm is used is set by picks_set_engine().  For quick what-ifs there is
+ * also an approximate beam search over partial pick sequences, whose answers
+ * come with an upper bound on the optimum (see picks_upper_bound).
+ *
+ * When only a few predictions change, e.g. for an injury, most of the DP can
+ * be reused: layers only depend on the teams before them, so the edited
+ * teams are moved to the end of the team order and only their layers are
+ * rebuilt (see picks_what_if_new).
+ *
+ * The DP values also give the exact best completion of any partial path back
+ * through the table, so a best-first search from the last state finds the
+ * 2nd, 3rd, ... best pick sequences in order, without re-solving (see
+ * picks_kbest_new).
  */
 #ifndef NFLPOOL_PICKS_H_
 #define NFLPOOL_PICKS_H_
 
+#include <stddef.h>
 #include <stdint.h>
+#include <stdio.h>
+
+#include "predictions.h"
+
+/* Stages and counters recorded while profiling.  See picks_set_profiling(). */
+#define PICKS_STAGE_READ 0
+#define PICKS_STAGE_SOLVE 1
+#define PICKS_STAGE_COMPARE 2
+#define PICKS_NUM_STAGES 3
+
+#define PICKS_COUNTER_DP_LAYERS 0  /* Teams added to a DP layer. */
+#define PICKS_COUNTER_DP_STATES 1  /* (team, set of weeks) states visited. */
+#define PICKS_COUNTER_PRUNED_TEAMS 2  /* Teams dropped before a DP. */
+#define PICKS_COUNTER_BEAM_STATES 3  /* Partial sequences tried by the beam. */
+#define PICKS_COUNTER_KBEST_PATHS 4  /* Partial paths queued by k-best. */
+#define PICKS_NUM_COUNTERS 5
+
+/* Algorithms for finding optimal picks.  See picks_set_engine(). */
+#define PICKS_ENGINE_DP 0
+#define PICKS_ENGINE_ASSIGNMENT 1
+#define PICKS_ENGINE_BEAM 2
+#define PICKS_NUM_ENGINES 3
+
+/* Defaults for PICKS_ENGINE_BEAM.  See picks_set_beam_width(). */
+#define PICKS_DEFAULT_BEAM_WIDTH 256
+#define PICKS_DEFAULT_BEAM_TOP_K 4
+
+/* Default limit on the memory used by the DP tables of one solve, in bytes. */
+#define PICKS_DEFAULT_MEMORY_BUDGET ((size_t) 256 << 20)
+
+/* Marks a team that is not picked in any week in DpTable.choices. */
+#define DP_NO_PICK 0xFF
 
 /**
- * One cell in our dynamic programming table.
+ * Our dynamic programming table.
+ *
+ * Only the choices are kept for every (team, week subset) state; values are
+ * only needed for the previous team, so they are overwritten as we go.
  */
-typedef struct DpCell {
+typedef struct DpTable {
+  int num_teams;
+  int num_games;
 
-  /* Maximum expected wins using the current teams and weeks. */
-  float expected_wins;
+  /* Optimal expected wins, using all teams and all weeks. */
+  float opt_val;
 
-  /* "Pointer" to the DP state with one fewer team. */
-  uint32_t prev_weeks;
-} DpCell;
+  /**
+   * num_teams x 2^num_games array.  choices[(i << num_games) + week_subset]
+   * is the week team i is picked in, in the optimal picks from the first i+1
+   * teams for week_subset, or DP_NO_PICK if team i is not picked.
+   */
+  uint8_t *choices;
+} DpTable;
+
+/**
+ * DP state kept between what-if edits to a few predictions.  See
+ * picks_what_if_new().
+ */
+typedef struct PicksWhatIf {
+  int num_games;
 
-DpCell **picks_run_dp(int, float **);
-void picks_free_table(DpCell **);
-float picks_get_opt(DpCell **, int, int *);
-void picks_print(int, float, int *, char *);
-void picks_run(char *, char *);
+  /* The predictions, as edited so far. */
+  float *rows[NUM_TEAMS];
+
+  /**
+   * Teams in the order they are added to the DP, and each team's index in
+   * it.  The first num_unedited teams have not been edited since the state
+   * was made; edited teams are moved after them.
+   */
+  int order[NUM_TEAMS];
+  int position[NUM_TEAMS];
+  int num_unedited;
+
+  /**
+   * (NUM_TEAMS + 1) x 2^num_games values and NUM_TEAMS x 2^num_games choices
+   * of the DP over all weeks, for the teams in order, as in DpTable.  Layer
+   * k is the values using the first k teams.  Only layers up to num_valid,
+   * and the choices before it, are up to date.  NULL if they would not fit
+   * in the memory budget, in which case every query is solved from scratch.
+   */
+  float *layers;
+  uint8_t *choices;
+  int num_valid;
+
+  /**
+   * NUM_TEAMS x 2^(num_games - 1) values.  For unedited team t, row t is the
+   * DP over the weeks after the first, using the unedited teams after t in
+   * order.  Only up to date where suffix_valid[t] is set.
+   */
+  float *suffixes;
+  int suffix_valid[NUM_TEAMS];
+} PicksWhatIf;
+
+/* A partial path back through the DP table, in k-best enumeration. */
+typedef struct KBestPath {
+  /* The path is at the DP state for the first num_teams teams and set. */
+  int num_teams;
+  uint32_t set;
+
+  /* Expected wins of the picks on the path so far. */
+  float wins;
+
+  /* Index of the path it extends, or -1, and the week the team it passed
+     (team num_teams) was picked in, or -1. */
+  int parent;
+  int week;
+} KBestPath;
+
+/**
+ * State of a lazy enumeration of the best pick sequences.  See
+ * picks_kbest_new().
+ */
+typedef struct PicksKBest {
+  int num_games;
+  int max_k;
+  int num_returned;
+
+  /* The teams that may be in the k best sequences, and their predictions. */
+  int num_teams;
+  int teams[NUM_TEAMS];
+  float *rows[NUM_TEAMS];
+
+  /* (num_teams + 1) x 2^num_games DP values; layer i uses the first i. */
+  float *layers;
+
+  /* Every path queued so far, and a max-heap of the unexpanded ones. */
+  KBestPath *paths;
+  int num_paths;
+  int *heap;
+  int heap_size;
+  int capacity;
+} PicksKBest;
+
+void picks_set_profiling(int);
+void picks_take_counters(uint64_t *);
+void picks_print_profile(FILE *);
+void picks_set_memory_budget(size_t);
+void picks_set_engine(int);
+void picks_set_pruning(int);
+void picks_set_beam_width(int);
+void picks_set_beam_top_k(int);
+int picks_engine_from_name(const char *);
+DpTable *picks_run_dp_teams(int, int, float **);
+DpTable *picks_run_dp(int, float **);
+void picks_free_table(DpTable *);
+float picks_get_opt(DpTable *, int *);
+float picks_find_opt(int, float **, int *);
+float picks_upper_bound(int, float **);
+void picks_print(int, int, float, int *, char *);
+void picks_run(char *, char *, int);
+void picks_candidate_values(int, float **, float *);
 void picks_compare(char *, char *);
+PicksWhatIf *picks_what_if_new(int, float **);
+void picks_what_if_edit(PicksWhatIf *, int, int, float);
+float picks_what_if_opt(PicksWhatIf *, int *);
+void picks_what_if_candidate_values(PicksWhatIf *, float *);
+void picks_what_if_free(PicksWhatIf *);
+PicksKBest *picks_kbest_new(int, float **, int);
+int picks_kbest_next(PicksKBest *, float *, int *);
+void picks_kbest_free(PicksKBest *);
+void picks_run_kbest(char *, char *, int, int);
+
+/* Entry points for the shared library, on contiguous prediction matrices. */
+float picks_solve(int, float *, int *);
+void picks_compare_matrix(int, float *, float *);
+float picks_upper_bound_matrix(int, float *);
+PicksWhatIf *picks_what_if_new_matrix(int, float *);
+PicksKBest *picks_kbest_new_matrix(int, float *, int);
 
 #endif  // NFLPOOL_PICKS_H_
@@ -1,7 +1,13 @@
+#define _POSIX_C_SOURCE 200809L
+
+#include <fcntl.h>
 #include <math.h>
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
 
 #include "predictions.h"
 
@@ -9,7 +15,7 @@
 float **predictions_allocate() {
   float **games = calloc(NUM_TEAMS, sizeof(float *));
   for (int i = 0; i < NUM_TEAMS; ++i) {
-    games[i] = calloc(17, sizeof(float));  // Need at most 17.
+    games[i] = calloc(PREDICTIONS_MAX_WEEKS, sizeof(float));
   }
   return games;
 }
@@ -22,6 +28,26 @@ void predictions_free(float **games) {
   free(games);
 }
 
+/**
+ * Sets the rows of the comma-separated teams_to_avoid to -Inf, so they are
+ * never picked.
+ */
+static void predictions_avoid(char *teams_to_avoid, int num_games,
+                              float **predictions, char *names) {
+  char *team = strtok(teams_to_avoid, ",");
+  while (team != NULL) {
+    // Find the index of this team
+    for (int i = 0; i < NUM_TEAMS; ++i) {
+      if (strcmp(names + 4 * i, team) == 0) {
+        for (int j = 0; j < num_games; ++j) {
+          predictions[i][j] = -INFINITY;
+        }
+      }
+    }
+    team = strtok(NULL, ",");
+  }
+}
+
 /**
  * Reads games input from stdin
  *
@@ -39,6 +65,7 @@ int predictions_read(char *filename, char *teams_to_avoid, float **predictions,
   int num_games = 0;
   char buf[32];
   float prob;
+  memset(names, 0, NUM_TEAMS * 4);
 
   /* Read the file of probabilities */
   FILE *fp = fopen(filename, "r");
@@ -49,29 +76,165 @@ int predictions_read(char *filename, char *teams_to_avoid, float **predictions,
   while (fscanf(fp, "%s", buf) == 1) {
     if (sscanf(buf, "%g", &prob) == 1) {
       // Read in a winning probability
+      if (cur_game >= PREDICTIONS_MAX_WEEKS) {
+        fprintf(stderr, "Too many weeks in %s, at most %d are allowed.\n",
+                filename, PREDICTIONS_MAX_WEEKS);
+        exit(1);
+      }
       predictions[cur_team][cur_game] = prob;
       cur_game++;
     } else {
       // Read in a new team name
       cur_team++;
+      if (cur_team >= NUM_TEAMS) {
+        fprintf(stderr, "Too many teams in %s.\n", filename);
+        exit(1);
+      }
       strncpy(names + 4 * cur_team, buf, 4);
       num_games = cur_game;
       cur_game = 0;
     }
   }
 
-  /* Set rows for teams_to_avoid to -Inf */
-  char *team = strtok(teams_to_avoid, ",");
-  while (team != NULL) {
-    // Find the index of this team
+  fclose(fp);
+
+  predictions_avoid(teams_to_avoid, num_games, predictions, names);
+  return num_games;
+}
+
+/* Returns whether the file starts like a binary predictions file. */
+int predictions_is_binary(char *filename) {
+  char magic[4];
+  FILE *fp = fopen(filename, "rb");
+  if (fp == NULL) {
+    fprintf(stderr, "Could not open file %s.\n", filename);
+    exit(1);
+  }
+  int is_binary = fread(magic, 1, 4, fp) == 4 &&
+                  memcmp(magic, PREDICTIONS_MAGIC, 4) == 0;
+  fclose(fp);
+  return is_binary;
+}
+
+/* Exits with an error about a malformed binary predictions file. */
+static void predictions_bad_file(char *filename, char *reason) {
+  fprintf(stderr, "Bad predictions file %s: %s.\n", filename, reason);
+  exit(1);
+}
+
+/**
+ * Maps a binary predictions file into p.
+ *
+ * The mapping is private, so marking used teams and teams to avoid only
+ * copies the pages they are on.  float32 matrices are used in place; float64 ones are
+ * converted.  Assumes a little-endian host, like the file.
+ */
+static void predictions_map(char *filename, Predictions *p) {
+  int fd = open(filename, O_RDONLY);
+  struct stat st;
+  if (fd < 0 || fstat(fd, &st) != 0) {
+    fprintf(stderr, "Could not open file %s.\n", filename);
+    exit(1);
+  }
+  p->map_size = st.st_size;
+  if (p->map_size < sizeof(PredictionsHeader)) {
+    predictions_bad_file(filename, "too short");
+  }
+  p->map = mmap(NULL, p->map_size, PROT_READ | PROT_WRITE, MAP_PRIVATE, fd,
+                0);
+  close(fd);
+  if (p->map == MAP_FAILED) {
+    fprintf(stderr, "Could not map file %s.\n", filename);
+    exit(1);
+  }
+
+  PredictionsHeader *header = p->map;
+  if (header->version != PREDICTIONS_VERSION) {
+    predictions_bad_file(filename, "unsupported version");
+  }
+  if (header->num_teams > NUM_TEAMS) {
+    predictions_bad_file(filename, "too many teams");
+  }
+  if (header->num_weeks > PREDICTIONS_MAX_WEEKS) {
+    predictions_bad_file(filename, "too many weeks");
+  }
+  if (header->value_size != sizeof(float) &&
+      header->value_size != sizeof(double)) {
+    predictions_bad_file(filename, "unsupported value size");
+  }
+  size_t num_values = (size_t) header->num_teams * header->num_weeks;
+  if (sizeof(PredictionsHeader) + header->num_teams * PREDICTIONS_CODE_SIZE >
+          p->map_size ||
+      header->probabilities_offset % header->value_size != 0 ||
+      header->probabilities_offset + num_values * header->value_size >
+          p->map_size ||
+      header->status_offset + num_values > p->map_size) {
+    predictions_bad_file(filename, "truncated");
+  }
+  p->first_week = header->first_week;
+  p->num_games = header->num_weeks;
+
+  char *codes = (char *) p->map + sizeof(PredictionsHeader);
+  for (int i = 0; i < header->num_teams; ++i) {
+    memcpy(p->names + 4 * i, codes + PREDICTIONS_CODE_SIZE * i, 3);
+  }
+
+  /* Teams missing from the file never win. */
+  char *matrix = (char *) p->map + header->probabilities_offset;
+  if (header->value_size == sizeof(float)) {
+    p->values = calloc((NUM_TEAMS - header->num_teams) * p->num_games + 1,
+                       sizeof(float));
     for (int i = 0; i < NUM_TEAMS; ++i) {
-      if (strcmp(names + 4 * i, team) == 0) {
-        for (int j = 0; j < num_games; ++j) {
-          predictions[i][j] = -INFINITY;
-        }
+      p->rows[i] = i < header->num_teams ?
+          (float *) matrix + (size_t) i * p->num_games :
+          p->values + (size_t) (i - header->num_teams) * p->num_games;
+    }
+  } else {
+    p->values = calloc(NUM_TEAMS * p->num_games + 1, sizeof(float));
+    for (int i = 0; i < NUM_TEAMS; ++i) {
+      p->rows[i] = p->values + (size_t) i * p->num_games;
+    }
+    for (size_t k = 0; k < num_values; ++k) {
+      p->values[k] = ((double *) matrix)[k];
+    }
+  }
+
+  /* Used teams can't be picked. */
+  uint8_t *status = (uint8_t *) p->map + header->status_offset;
+  for (int i = 0; i < header->num_teams; ++i) {
+    for (int j = 0; j < p->num_games; ++j) {
+      if (status[(size_t) i * p->num_games + j] == PREDICTIONS_STATUS_USED) {
+        p->rows[i][j] = -INFINITY;
       }
     }
-    team = strtok(NULL, ",");
   }
-  return num_games;
+}
+
+/**
+ * Loads predictions from a file of either format.
+ *
+ * teams_to_avoid is as in predictions_read().  Free with
+ * predictions_unload().
+ */
+Predictions *predictions_load(char *filename, char *teams_to_avoid) {
+  Predictions *p = calloc(1, sizeof(Predictions));
+  if (predictions_is_binary(filename)) {
+    predictions_map(filename, p);
+    predictions_avoid(teams_to_avoid, p->num_games, p->rows, p->names);
+  } else {
+    p->values = calloc(NUM_TEAMS * PREDICTIONS_MAX_WEEKS, sizeof(float));
+    for (int i = 0; i < NUM_TEAMS; ++i) {
+      p->rows[i] = p->values + i * PREDICTIONS_MAX_WEEKS;
+    }
+    p->num_games = predictions_read(filename, teams_to_avoid, p->rows,
+                                    p->names);
+  }
+  return p;
+}
+
+/* Frees predictions loaded by predictions_load(). */
+void predictions_unload(Predictions *p) {
+  if (p->map) munmap(p->map, p->map_size);
+  free(p->values);
+  free(p);
 }
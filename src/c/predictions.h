@@ -4,10 +4,73 @@
 #ifndef NFLPOOL_PREDICTIONS_H_
 #define NFLPOOL_PREDICTIONS_H_
 
+#include <stddef.h>
+#include <stdint.h>
+
 #define NUM_TEAMS 32
 
+/* Most weeks a predictions file may have. */
+#define PREDICTIONS_MAX_WEEKS 24
+
+/**
+ * Number of weeks in the season, used to number the weeks of a predictions
+ * file when the caller does not say which week it starts at.
+ */
+#define PREDICTIONS_DEFAULT_SEASON_WEEKS 17
+
+/**
+ * Binary predictions files, as written by src/py/prediction_files.py.
+ *
+ * All integers are little-endian.  The file starts with a PredictionsHeader,
+ * followed by num_teams team abbreviations of PREDICTIONS_CODE_SIZE bytes
+ * each.  At probabilities_offset is a num_teams x num_weeks row-major matrix of
+ * winning probabilities, float32 or float64 according to value_size, with 0
+ * in bye weeks.  At status_offset is a matrix of the same shape of uint8
+ * PREDICTIONS_STATUS_* values.  Teams marked used keep their probabilities in
+ * the file; the loader sets their rows to -Inf.
+ */
+#define PREDICTIONS_MAGIC "NFLP"
+#define PREDICTIONS_VERSION 1
+#define PREDICTIONS_CODE_SIZE 4
+
+#define PREDICTIONS_STATUS_GAME 0
+#define PREDICTIONS_STATUS_BYE 1
+#define PREDICTIONS_STATUS_USED 2
+
+typedef struct PredictionsHeader {
+  char magic[4];
+  uint32_t version;
+  uint32_t num_teams;
+  uint32_t first_week;
+  uint32_t num_weeks;
+  uint32_t value_size;
+  uint32_t probabilities_offset;
+  uint32_t status_offset;
+} PredictionsHeader;
+
+/* Predictions loaded from a file of either format. */
+typedef struct Predictions {
+  /* Week of the first column, or 0 if the file does not say. */
+  int first_week;
+  int num_games;
+
+  /* rows[i][j] is the winning probability of team i in the j-th week. */
+  float *rows[NUM_TEAMS];
+  char names[NUM_TEAMS * 4];
+
+  /* The mapped binary file, or NULL for text files. */
+  void *map;
+  size_t map_size;
+
+  /* Memory the rows point to, when they don't point into map. */
+  float *values;
+} Predictions;
+
 float **predictions_allocate(void);
 void predictions_free(float **);
 int predictions_read(char *, char *, float **, char *);
+int predictions_is_binary(char *);
+Predictions *predictions_load(char *, char *);
+void predictions_unload(Predictions *);
 
 #endif  // NFLPOOL_PREDICTIONS_H_
@@ -1,6 +1,8 @@
 #include <assert.h>
+#include <math.h>
 #include <stdlib.h>
 #include <stdio.h>
+#include <string.h>
 
 #include "../predictions.h"
 #include "../picks.h"
@@ -10,14 +12,17 @@
 #define KGRN  "\x1B[32m"
 
 static char *test_file = "src/c/testdata/test_predictions.txt";
+static char *test_binary_file = "src/c/testdata/test_predictions.bin";
+/* All 32 teams, with the text file's teams and DET marked used. */
+static char *test_used_file = "src/c/testdata/test_predictions_used.bin";
 
 void run_tests(void) {
   float **predictions = predictions_allocate();
   char team_names[NUM_TEAMS * 4];
   int num_games = predictions_read(test_file, "", predictions, team_names);
-  DpCell **dp_table = picks_run_dp(num_games, predictions);
+  DpTable *dp_table = picks_run_dp(num_games, predictions);
   int *pick_sequence = calloc(num_games, sizeof(int));
-  float opt_val = picks_get_opt(dp_table, num_games, pick_sequence);
+  float opt_val = picks_get_opt(dp_table, pick_sequence);
   
   assert(opt_val - 2.2 <= 1e-7 && opt_val - 2.2 >= -1e-7);
   assert(pick_sequence[0] == 0);  // CHI
@@ -25,8 +30,508 @@ void run_tests(void) {
   assert(pick_sequence[2] == 3);  // MIN
 }
 
+/* Computes candidate values by re-running the DP once per team. */
+void naive_candidate_values(int num_games, float **predictions,
+                            float *values) {
+  float *pred_skip_cur[NUM_TEAMS];
+  float all_neg_inf[32];
+  int pick_sequence[32];
+  for (int j = 0; j < num_games; ++j) all_neg_inf[j] = -INFINITY;
+  for (int i = 0; i < NUM_TEAMS; ++i) {
+    pred_skip_cur[i] = predictions[i] + 1;
+  }
+  for (int i = 0; i < NUM_TEAMS; ++i) {
+    pred_skip_cur[i] = all_neg_inf;
+    DpTable *dp_table = picks_run_dp(num_games - 1, pred_skip_cur);
+    values[i] = predictions[i][0] + picks_get_opt(dp_table, pick_sequence);
+    picks_free_table(dp_table);
+    pred_skip_cur[i] = predictions[i] + 1;
+  }
+}
+
+/* Fills the first num_games weeks of predictions with random numbers. */
+static void random_predictions(int num_games, float **predictions) {
+  for (int i = 0; i < NUM_TEAMS; ++i) {
+    for (int j = 0; j < num_games; ++j) {
+      predictions[i][j] = (float) rand() / RAND_MAX;
+    }
+  }
+}
+
+void test_candidate_values(void) {
+  int num_games = 6;
+  float **predictions = predictions_allocate();
+  srand(1);
+  random_predictions(num_games, predictions);
+  for (int j = 0; j < num_games; ++j) {
+    predictions[5][j] = -INFINITY;  // A used team
+  }
+  float values[NUM_TEAMS], expected[NUM_TEAMS];
+  picks_candidate_values(num_games, predictions, values);
+  naive_candidate_values(num_games, predictions, expected);
+  for (int i = 0; i < NUM_TEAMS; ++i) {
+    if (i == 5) {
+      assert(isnan(values[i]));
+    } else {
+      assert(fabsf(values[i] - expected[i]) <= 1e-5);
+    }
+  }
+  predictions_free(predictions);
+}
+
+void test_memory_budget(void) {
+  int num_games = 10;
+  float **predictions = predictions_allocate();
+  srand(2);
+  random_predictions(num_games, predictions);
+  predictions[7][3] = -INFINITY;  // A bye week
+
+  DpTable *dp_table = picks_run_dp(num_games, predictions);
+  int expected_sequence[32];
+  float expected = picks_get_opt(dp_table, expected_sequence);
+  picks_free_table(dp_table);
+  float expected_values[NUM_TEAMS];
+  picks_candidate_values(num_games, predictions, expected_values);
+
+  /* Small enough that both the solve and the candidate values split. */
+  picks_set_memory_budget(1);
+  int pick_sequence[32];
+  float opt_val = picks_find_opt(num_games, predictions, pick_sequence);
+  assert(fabsf(opt_val - expected) <= 1e-5);
+  float total = 0;
+  for (int j = 0; j < num_games; ++j) {
+    for (int k = 0; k < j; ++k) assert(pick_sequence[j] != pick_sequence[k]);
+    total += predictions[pick_sequence[j]][j];
+  }
+  assert(fabsf(total - expected) <= 1e-5);
+
+  float values[NUM_TEAMS];
+  picks_candidate_values(num_games, predictions, values);
+  for (int i = 0; i < NUM_TEAMS; ++i) {
+    assert(fabsf(values[i] - expected_values[i]) <= 1e-5);
+  }
+  picks_set_memory_budget(PICKS_DEFAULT_MEMORY_BUDGET);
+  predictions_free(predictions);
+}
+
+void test_full_season(void) {
+  int num_games = 18;
+  float **predictions = predictions_allocate();
+  srand(3);
+  random_predictions(num_games, predictions);
+  int pick_sequence[32];
+  picks_set_memory_budget(4 << 20);  // Less than the 9MB table.
+  float opt_val = picks_find_opt(num_games, predictions, pick_sequence);
+  float total = 0;
+  for (int j = 0; j < num_games; ++j) {
+    for (int k = 0; k < j; ++k) assert(pick_sequence[j] != pick_sequence[k]);
+    total += predictions[pick_sequence[j]][j];
+  }
+  assert(fabsf(total - opt_val) <= 1e-4);
+  picks_set_memory_budget(PICKS_DEFAULT_MEMORY_BUDGET);
+
+  /* The assignment engine finds the same picks without the DP. */
+  int assignment_sequence[32];
+  picks_set_engine(PICKS_ENGINE_ASSIGNMENT);
+  float assignment_opt = picks_find_opt(num_games, predictions,
+                                        assignment_sequence);
+  picks_set_engine(PICKS_ENGINE_DP);
+  assert(fabsf(assignment_opt - opt_val) <= 1e-4);
+  for (int j = 0; j < num_games; ++j) {
+    assert(assignment_sequence[j] == pick_sequence[j]);
+  }
+  predictions_free(predictions);
+}
+
+/* Checks that the assignment engine agrees with the DP. */
+void test_assignment_engine(void) {
+  float **predictions = predictions_allocate();
+  srand(4);
+  for (int num_games = 1; num_games <= 12; ++num_games) {
+    random_predictions(num_games, predictions);
+    for (int j = 0; j < num_games; ++j) {
+      predictions[9][j] = -INFINITY;  // A used team
+    }
+    predictions[rand() % NUM_TEAMS][rand() % num_games] = -INFINITY;  // A bye
+    predictions[rand() % NUM_TEAMS][0] = 0;  // A bye in the current week
+
+    int expected_sequence[32], pick_sequence[32];
+    float expected_values[NUM_TEAMS], values[NUM_TEAMS];
+    float expected = picks_find_opt(num_games, predictions, expected_sequence);
+    picks_candidate_values(num_games, predictions, expected_values);
+    picks_set_engine(PICKS_ENGINE_ASSIGNMENT);
+    float opt_val = picks_find_opt(num_games, predictions, pick_sequence);
+    picks_candidate_values(num_games, predictions, values);
+    picks_set_engine(PICKS_ENGINE_DP);
+
+    assert(fabsf(opt_val - expected) <= 1e-5);
+    for (int j = 0; j < num_games; ++j) {
+      assert(pick_sequence[j] == expected_sequence[j]);
+    }
+    for (int i = 0; i < NUM_TEAMS; ++i) {
+      if (isnan(expected_values[i])) {
+        assert(isnan(values[i]));
+      } else {
+        assert(fabsf(values[i] - expected_values[i]) <= 1e-5);
+      }
+    }
+  }
+
+  /* Fewer available teams than weeks: no way to pick every week. */
+  for (int i = 2; i < NUM_TEAMS; ++i) {
+    for (int j = 0; j < 3; ++j) predictions[i][j] = -INFINITY;
+  }
+  int pick_sequence[32];
+  float values[NUM_TEAMS];
+  picks_set_engine(PICKS_ENGINE_ASSIGNMENT);
+  assert(picks_find_opt(3, predictions, pick_sequence) == -INFINITY);
+  picks_candidate_values(3, predictions, values);
+  picks_set_engine(PICKS_ENGINE_DP);
+  assert(values[0] == -INFINITY);
+  assert(isnan(values[2]));
+  assert(picks_engine_from_name("assignment") == PICKS_ENGINE_ASSIGNMENT);
+  assert(picks_engine_from_name("simplex") == -1);
+  predictions_free(predictions);
+}
+
+/* Checks that pruning dominated teams does not change any answer. */
+void test_pruning(void) {
+  float **predictions = predictions_allocate();
+  srand(5);
+  for (int num_games = 1; num_games <= 12; ++num_games) {
+    random_predictions(num_games, predictions);
+    for (int j = 0; j < num_games; ++j) {
+      predictions[9][j] = -INFINITY;  // A used team
+    }
+    predictions[rand() % NUM_TEAMS][rand() % num_games] = -INFINITY;  // A bye
+    predictions[rand() % NUM_TEAMS][0] = 0;  // A bye in the current week
+
+    int expected_sequence[32], pick_sequence[32];
+    float expected_values[NUM_TEAMS], values[NUM_TEAMS];
+    uint64_t counters[PICKS_NUM_COUNTERS];
+    picks_set_pruning(0);
+    float expected = picks_find_opt(num_games, predictions, expected_sequence);
+    picks_candidate_values(num_games, predictions, expected_values);
+    picks_set_pruning(1);
+    picks_set_profiling(1);
+    picks_take_counters(counters);
+    float opt_val = picks_find_opt(num_games, predictions, pick_sequence);
+    picks_candidate_values(num_games, predictions, values);
+    picks_take_counters(counters);
+    picks_set_profiling(0);
+
+    assert(fabsf(opt_val - expected) <= 1e-5);
+    for (int j = 0; j < num_games; ++j) {
+      assert(pick_sequence[j] == expected_sequence[j]);
+    }
+    for (int i = 0; i < NUM_TEAMS; ++i) {
+      if (isnan(expected_values[i])) {
+        assert(isnan(values[i]));
+      } else {
+        assert(fabsf(values[i] - expected_values[i]) <= 1e-5);
+      }
+    }
+    /* The used team is always dropped. */
+    assert(counters[PICKS_COUNTER_PRUNED_TEAMS] >= 1);
+    if (num_games <= 3) {
+      assert(counters[PICKS_COUNTER_PRUNED_TEAMS] >= NUM_TEAMS);
+    }
+  }
+  predictions_free(predictions);
+}
+
+/* Checks that a pick sequence uses distinct teams and has the given value. */
+static void assert_valid_sequence(int num_games, float **predictions,
+                                  int *pick_sequence, float value) {
+  float total = 0;
+  for (int j = 0; j < num_games; ++j) {
+    for (int k = 0; k < j; ++k) assert(pick_sequence[k] != pick_sequence[j]);
+    total += predictions[pick_sequence[j]][j];
+  }
+  assert(fabsf(total - value) <= 1e-4);
+}
+
+/* Checks the beam engine's picks against the DP's and the upper bound. */
+void test_beam_engine(void) {
+  float **predictions = predictions_allocate();
+  srand(6);
+  for (int num_games = 1; num_games <= 12; ++num_games) {
+    random_predictions(num_games, predictions);
+    for (int j = 0; j < num_games; ++j) {
+      predictions[9][j] = -INFINITY;  // A used team
+    }
+    predictions[rand() % NUM_TEAMS][0] = 0;  // A bye in the current week
+
+    int expected_sequence[32], pick_sequence[32];
+    float expected_values[NUM_TEAMS], values[NUM_TEAMS];
+    float expected = picks_find_opt(num_games, predictions, expected_sequence);
+    picks_candidate_values(num_games, predictions, expected_values);
+    float bound = picks_upper_bound(num_games, predictions);
+    assert(bound >= expected - 1e-4);
+
+    /* With the default limits, the picks are valid but maybe not optimal. */
+    picks_set_engine(PICKS_ENGINE_BEAM);
+    float approx = picks_find_opt(num_games, predictions, pick_sequence);
+    assert(approx <= expected + 1e-4);
+    assert_valid_sequence(num_games, predictions, pick_sequence, approx);
+    picks_candidate_values(num_games, predictions, values);
+    for (int i = 0; i < NUM_TEAMS; ++i) {
+      assert(isnan(values[i]) == isnan(expected_values[i]));
+      if (!isnan(values[i])) assert(values[i] <= expected_values[i] + 1e-4);
+    }
+
+    /* Keeping every set of teams is the exact week-by-week DP. */
+    if (num_games <= 4) {
+      picks_set_beam_width(1 << 20);
+      picks_set_beam_top_k(NUM_TEAMS);
+      float exact = picks_find_opt(num_games, predictions, pick_sequence);
+      assert(fabsf(exact - expected) <= 1e-4);
+      assert_valid_sequence(num_games, predictions, pick_sequence, exact);
+      picks_candidate_values(num_games, predictions, values);
+      for (int i = 0; i < NUM_TEAMS; ++i) {
+        if (!isnan(values[i])) {
+          assert(fabsf(values[i] - expected_values[i]) <= 1e-4);
+        }
+      }
+      picks_set_beam_width(PICKS_DEFAULT_BEAM_WIDTH);
+      picks_set_beam_top_k(PICKS_DEFAULT_BEAM_TOP_K);
+    }
+
+    /* A beam of one is the greedy picks: the best unused team each week. */
+    picks_set_beam_width(1);
+    picks_set_beam_top_k(1);
+    float greedy = picks_find_opt(num_games, predictions, pick_sequence);
+    picks_set_beam_width(PICKS_DEFAULT_BEAM_WIDTH);
+    picks_set_beam_top_k(PICKS_DEFAULT_BEAM_TOP_K);
+    picks_set_engine(PICKS_ENGINE_DP);
+    assert(greedy <= expected + 1e-4);
+    assert_valid_sequence(num_games, predictions, pick_sequence, greedy);
+  }
+  assert(picks_engine_from_name("beam") == PICKS_ENGINE_BEAM);
+  predictions_free(predictions);
+
+  /* The beam is not limited to PREDICTIONS_MAX_WEEKS weeks. */
+  int num_games = 30;
+  float *values = malloc(NUM_TEAMS * num_games * sizeof(float));
+  float *rows[NUM_TEAMS];
+  for (int i = 0; i < NUM_TEAMS; ++i) {
+    rows[i] = values + i * num_games;
+    for (int j = 0; j < num_games; ++j) rows[i][j] = (float) rand() / RAND_MAX;
+  }
+  int pick_sequence[30];
+  float candidate_values[NUM_TEAMS];
+  picks_set_engine(PICKS_ENGINE_BEAM);
+  float bound = picks_upper_bound(num_games, rows);
+  float approx = picks_find_opt(num_games, rows, pick_sequence);
+  assert(approx <= bound + 1e-4);
+  assert_valid_sequence(num_games, rows, pick_sequence, approx);
+  picks_candidate_values(num_games, rows, candidate_values);
+  for (int i = 0; i < NUM_TEAMS; ++i) {
+    assert(candidate_values[i] <= bound + 1e-4);
+  }
+  picks_set_engine(PICKS_ENGINE_DP);
+  free(values);
+}
+
+/* Checks a what-if state against solving the edited predictions. */
+static void assert_what_if_matches(PicksWhatIf *w, float **predictions) {
+  int num_games = w->num_games;
+  int expected_sequence[32], pick_sequence[32];
+  float expected_values[NUM_TEAMS], values[NUM_TEAMS];
+  float expected = picks_find_opt(num_games, predictions, expected_sequence);
+  picks_candidate_values(num_games, predictions, expected_values);
+  float opt_val = picks_what_if_opt(w, pick_sequence);
+  picks_what_if_candidate_values(w, values);
+  assert(fabsf(opt_val - expected) <= 1e-4);
+  assert_valid_sequence(num_games, predictions, pick_sequence, opt_val);
+  for (int i = 0; i < NUM_TEAMS; ++i) {
+    if (isnan(expected_values[i])) {
+      assert(isnan(values[i]));
+    } else {
+      assert(fabsf(values[i] - expected_values[i]) <= 1e-4);
+    }
+  }
+}
+
+/* Checks that what-if edits give the same answers as solving from scratch. */
+void test_what_if(void) {
+  float **predictions = predictions_allocate();
+  srand(7);
+  for (int num_games = 1; num_games <= 10; num_games += 3) {
+    random_predictions(num_games, predictions);
+    for (int j = 0; j < num_games; ++j) {
+      predictions[9][j] = -INFINITY;  // A used team
+    }
+    predictions[4][0] = 0;  // A bye in the current week
+    PicksWhatIf *w = picks_what_if_new(num_games, predictions);
+    assert_what_if_matches(w, predictions);
+    for (int edit = 0; edit < 8; ++edit) {
+      /* Mostly edit the same few teams, as in a what-if session. */
+      int team = edit % 3 == 2 ? rand() % NUM_TEAMS : 3 + edit % 2;
+      int week = rand() % num_games;
+      float prediction = (float) rand() / RAND_MAX;
+      predictions[team][week] = prediction;
+      picks_what_if_edit(w, team, week, prediction);
+      assert_what_if_matches(w, predictions);
+    }
+    picks_what_if_free(w);
+  }
+
+  /* Editing a team again only rebuilds its own layer. */
+  int num_games = 12, pick_sequence[32];
+  uint64_t counters[PICKS_NUM_COUNTERS];
+  random_predictions(num_games, predictions);
+  PicksWhatIf *w = picks_what_if_new(num_games, predictions);
+  picks_what_if_edit(w, 5, 3, 0.99);
+  picks_what_if_opt(w, pick_sequence);
+  picks_set_profiling(1);
+  picks_take_counters(counters);
+  picks_what_if_edit(w, 5, 3, 0.01);
+  picks_what_if_opt(w, pick_sequence);
+  picks_take_counters(counters);
+  picks_set_profiling(0);
+  assert(counters[PICKS_COUNTER_DP_LAYERS] == 1);
+  predictions[5][3] = 0.01;
+  assert_what_if_matches(w, predictions);
+  picks_what_if_free(w);
+
+  /* Over the memory budget, queries are solved from scratch. */
+  picks_set_memory_budget(1);
+  w = picks_what_if_new(num_games, predictions);
+  assert(w->layers == NULL);
+  picks_what_if_edit(w, 5, 3, 0.5);
+  predictions[5][3] = 0.5;
+  assert_what_if_matches(w, predictions);
+  picks_what_if_free(w);
+  picks_set_memory_budget(PICKS_DEFAULT_MEMORY_BUDGET);
+  predictions_free(predictions);
+}
+
+/* Used to sort floats in decreasing order. */
+static int compare_floats_decreasing(const void *a, const void *b) {
+  float x = *(const float *) a, y = *(const float *) b;
+  return x < y ? 1 : x > y ? -1 : 0;
+}
+
+/* Checks k-best sequences against all sequences, for 3 weeks. */
+void test_kbest(void) {
+  float **predictions = predictions_allocate();
+  srand(8);
+  int num_games = 3;
+  random_predictions(num_games, predictions);
+  for (int j = 0; j < num_games; ++j) {
+    predictions[9][j] = -INFINITY;  // A used team
+  }
+  predictions[4][1] = 0;  // A bye
+
+  float *all_wins = malloc(NUM_TEAMS * NUM_TEAMS * NUM_TEAMS * sizeof(float));
+  int num_sequences = 0;
+  for (int a = 0; a < NUM_TEAMS; ++a) {
+    for (int b = 0; b < NUM_TEAMS; ++b) {
+      for (int c = 0; c < NUM_TEAMS; ++c) {
+        float wins = predictions[a][0] + predictions[b][1] + predictions[c][2];
+        if (a == b || a == c || b == c || wins == -INFINITY) continue;
+        all_wins[num_sequences++] = wins;
+      }
+    }
+  }
+  qsort(all_wins, num_sequences, sizeof(float), compare_floats_decreasing);
+
+  int expected_sequence[32], pick_sequence[32];
+  float expected = picks_find_opt(num_games, predictions, expected_sequence);
+  PicksKBest *kb;
+  float wins;
+  int rank;
+
+  /* With few sequences some teams are pruned, and with many none are. */
+  int ks[] = {5, 200};
+  for (int n = 0; n < 2; ++n) {
+    int k = ks[n];
+    kb = picks_kbest_new(num_games, predictions, k);
+    assert(k == 5 ? kb->num_teams < NUM_TEAMS : kb->num_teams == NUM_TEAMS);
+    float prev_wins = INFINITY;
+    rank = 0;
+    while (picks_kbest_next(kb, &wins, pick_sequence)) {
+      if (rank == 0) {
+        assert(fabsf(wins - expected) <= 1e-5);
+        for (int j = 0; j < num_games; ++j) {
+          assert(pick_sequence[j] == expected_sequence[j]);
+        }
+      }
+      assert(wins <= prev_wins);
+      assert(fabsf(wins - all_wins[rank]) <= 1e-5);
+      assert_valid_sequence(num_games, predictions, pick_sequence, wins);
+      prev_wins = wins;
+      ++rank;
+    }
+    assert(rank == k);
+    picks_kbest_free(kb);
+  }
+
+  /* Fewer sequences than asked for. */
+  for (int i = 2; i < NUM_TEAMS; ++i) {
+    for (int j = 0; j < num_games; ++j) predictions[i][j] = -INFINITY;
+  }
+  predictions[2][2] = 0.5;
+  kb = picks_kbest_new(num_games, predictions, 10);
+  for (rank = 0; picks_kbest_next(kb, &wins, pick_sequence); ++rank) {
+    assert_valid_sequence(num_games, predictions, pick_sequence, wins);
+  }
+  assert(rank == 2);  // Only teams 0 and 1 can be picked in the first weeks.
+  picks_kbest_free(kb);
+  picks_set_memory_budget(1);
+  assert(picks_kbest_new(num_games, predictions, 10) == NULL);
+  picks_set_memory_budget(PICKS_DEFAULT_MEMORY_BUDGET);
+  free(all_wins);
+  predictions_free(predictions);
+}
+
+void test_binary_predictions(void) {
+  char avoid_text[] = "DET", avoid_binary[] = "DET";
+  Predictions *text = predictions_load(test_file, avoid_text);
+  Predictions *binary = predictions_load(test_binary_file, avoid_binary);
+  assert(predictions_is_binary(test_binary_file));
+  assert(!predictions_is_binary(test_file));
+  assert(text->first_week == 0);
+  assert(binary->first_week == 15);
+  assert(binary->num_games == text->num_games);
+  for (int i = 0; i < NUM_TEAMS; ++i) {
+    assert(strcmp(text->names + 4 * i, binary->names + 4 * i) == 0);
+    for (int j = 0; j < text->num_games; ++j) {
+      assert(text->rows[i][j] == binary->rows[i][j]);
+    }
+  }
+  assert(isinf(binary->rows[1][0]));
+  predictions_unload(binary);
+
+  /* Used teams keep their probabilities in the file but can't be picked. */
+  char no_teams[] = "";
+  Predictions *used = predictions_load(test_used_file, no_teams);
+  for (int i = 0; i < NUM_TEAMS; ++i) {
+    char *name = used->names + 4 * i;
+    for (int j = 0; j < used->num_games; ++j) {
+      if (strcmp(name, "DET") == 0) {
+        assert(used->rows[i][j] == -INFINITY);
+      } else if (strcmp(name, "CHI") == 0) {
+        assert(used->rows[i][j] == text->rows[0][j]);
+      }
+    }
+  }
+  predictions_unload(used);
+  predictions_unload(text);
+}
+
 int main(int argc, char *argv[]) {
   run_tests();
+  test_binary_predictions();
+  test_candidate_values();
+  test_memory_budget();
+  test_full_season();
+  test_assignment_engine();
+  test_pruning();
+  test_beam_engine();
+  test_what_if();
+  test_kbest();
   printf("%sPicks tests passed!%s\n", KGRN, KNRM);
   return 0;
 }
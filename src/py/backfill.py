@@ -0,0 +1,112 @@
+"""Downloads and parses the games pages of a range of seasons.
+
+Pages are downloaded by a pool of threads, which share per-host connections
+and rate limits (see fetch.py), and each page is parsed as soon as it
+arrives, while the rest are still downloading.  Pages that are already cached
+and fresh are not downloaded again.  With --refresh, cached pages are
+revalidated with conditional requests, so unchanged pages cost a round trip
+but no download.
+
+With --output, the finished games of all seasons are also written to one
+file, which game_store.GameStore.Load() reads.
+"""
+import argparse
+import json
+import multiprocessing.pool
+import sys
+
+import game_store
+import profiling
+import table
+
+# Default number of pages downloaded at once.
+DEFAULT_THREADS = 8
+
+def _ReadArgs():
+  parser = argparse.ArgumentParser(description='Download and parse the games '
+                                   'pages of a range of seasons.  Prints the '
+                                   'number of games in each to stdout as '
+                                   'JSON.')
+  parser.add_argument('start_year', type=int, help='First season to fetch')
+  parser.add_argument('end_year', type=int, help='Last season to fetch')
+  parser.add_argument('--threads', type=int, default=DEFAULT_THREADS,
+                      help='Number of pages downloaded at once')
+  parser.add_argument('--min-interval', type=float,
+                      default=table.MIN_FETCH_INTERVAL_SECONDS,
+                      help='Minimum seconds between the starts of two '
+                      'downloads from the site')
+  parser.add_argument('--refresh', action='store_true',
+                      help='Revalidate pages even if their cached copies are '
+                      'fresh')
+  parser.add_argument('--output',
+                      help='Also write the finished games of all seasons to '
+                      'this file, in game_store format')
+  parser.add_argument('--profile', action='store_true',
+                      help='Print time spent in each stage, and counters, to '
+                      'stderr as JSON.')
+  if len(sys.argv) == 1:
+    parser.print_help()
+    sys.exit(1)
+  return vars(parser.parse_args())
+
+
+def _FetchPage(year, refresh):
+  """Returns (year, page, error message), with one of page and error None."""
+  try:
+    if refresh:
+      return year, table.RefreshPageForYear(year), None
+    return year, table.FetchPageForYear(year), None
+  except IOError as e:
+    return year, None, str(e)
+
+
+def Backfill(start_year, end_year, threads=DEFAULT_THREADS, refresh=False,
+             output=None):
+  """Fetches and parses the games pages of a range of seasons.
+
+  Args:
+    start_year: First season to fetch.
+    end_year: Last season to fetch, inclusive.
+    threads: Number of pages downloaded at once.
+    refresh: If True, revalidates cached pages even if they are fresh.
+    output: If given, the finished games of the seasons that could be fetched
+        are written to this file, as a game_store.GameStore.
+  Returns:
+    JSON-like dictionary structured like: {
+        2013: {'past_games': n, 'future_games': m},
+        2014: {'error': 'Could not fetch ...'},
+        ...
+    }
+  """
+  years = range(start_year, end_year + 1)
+  results = {}
+  stores = {}
+  pool = multiprocessing.pool.ThreadPool(max(1, min(threads, len(years))))
+  try:
+    for year, page, error in pool.imap_unordered(
+        lambda year: _FetchPage(year, refresh), years):
+      if error is not None:
+        results[year] = {'error': error}
+        continue
+      # Parsed games are memoized, so later FetchGameStore() calls are free.
+      stores[year] = game_store.ParseGameStore(page, year)
+      results[year] = {
+          'past_games': len(stores[year]),
+          'future_games': len(table.ParseFutureGamesTable(page))
+      }
+  finally:
+    pool.close()
+    pool.join()
+  if output:
+    game_store.Concatenate(stores[year] for year in sorted(stores)).Save(output)
+  return results
+
+
+if __name__ == '__main__':
+  args = _ReadArgs()
+  table.MIN_FETCH_INTERVAL_SECONDS = args.pop('min_interval')
+  if args.pop('profile'):
+    profiling.Enable()
+  print json.dumps(Backfill(**args), indent=2, sort_keys=True)
+  if profiling.IsEnabled():
+    profiling.PrintReport()
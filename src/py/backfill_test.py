@@ -0,0 +1,93 @@
+import mock
+import numpy
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import backfill
+import game_store
+import synthetic
+import table
+import test_utils
+
+class TestBackfill(unittest.TestCase):
+
+  def setUp(self):
+    rng = numpy.random.RandomState(0)
+    self.this_year = time.localtime().tm_year
+    self.years = range(self.this_year - 29, self.this_year + 1)
+    self.server = test_utils.StandInServer(dict(
+        ('/%d' % year, synthetic.GenerateSeasonPage(
+            32, 17, 8 if year == self.this_year else 17, rng))
+        for year in self.years))
+    self.addCleanup(self.server.Stop)
+    cache_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, cache_dir)
+    for patcher in [
+        mock.patch.object(table, 'CACHE_DIRECTORY', cache_dir),
+        mock.patch.object(table, 'OFFLINE', False),
+        mock.patch.object(table, 'MIN_FETCH_INTERVAL_SECONDS', 0),
+        mock.patch.object(table, '_fetcher', None),
+        mock.patch.object(table, 'MakeUrlForYear',
+                          lambda year: self.server.Url('/%d' % year)),
+        mock.patch.dict(table._page_memo, clear=True)]:
+      patcher.start()
+      self.addCleanup(patcher.stop)
+
+  def testBackfill(self):
+    results = backfill.Backfill(self.years[0], self.years[-1])
+    self.assertEqual(self.years, sorted(results))
+    self.assertEqual({'past_games': 16 * 16, 'future_games': 0},
+                     results[self.years[0]])
+    page = self.server.pages['/%d' % self.this_year]
+    self.assertEqual({
+        'past_games': len(table.ParsePastGamesTable(page)),
+        'future_games': len(table.ParseFutureGamesTable(page))
+    }, results[self.this_year])
+    self.assertGreater(results[self.this_year]['future_games'], 0)
+    for year in self.years:
+      self.assertEqual(1, self.server.requests['/%d' % year])
+    self.assertLessEqual(self.server.connections, backfill.DEFAULT_THREADS)
+    # Parsed pages are memoized for later stages.
+    self.assertEqual(16 * 16, len(table.FetchPastGames(self.years[0])))
+
+  def testOutput(self):
+    filename = os.path.join(table.CACHE_DIRECTORY, 'history.npz')
+    results = backfill.Backfill(self.years[0], self.years[-1], output=filename)
+    history = game_store.GameStore.Load(filename)
+    self.assertEqual(sum(result['past_games'] for result in results.values()),
+                     len(history))
+    self.assertEqual(results[self.years[0]]['past_games'],
+                     len(history.Seasons(self.years[0])))
+
+  def testCachedPagesAreNotDownloaded(self):
+    backfill.Backfill(self.years[0], self.years[-1])
+    table._page_memo.clear()
+    backfill.Backfill(self.years[0], self.years[-1])
+    for year in self.years:
+      self.assertEqual(1, self.server.requests['/%d' % year])
+
+  def testRefreshDownloadsOnlyChangedPages(self):
+    backfill.Backfill(self.this_year, self.this_year)
+    with mock.patch.object(table, 'StorePageForYear') as mock_store:
+      backfill.Backfill(self.this_year, self.this_year, refresh=True)
+    self.assertEqual(2, self.server.requests['/%d' % self.this_year])
+    self.assertFalse(mock_store.called)
+
+    page = synthetic.GenerateSeasonPage(32, 17, 9, numpy.random.RandomState(1))
+    self.server.pages['/%d' % self.this_year] = page
+    results = backfill.Backfill(self.this_year, self.this_year, refresh=True)
+    self.assertEqual(len(table.ParsePastGamesTable(page)),
+                     results[self.this_year]['past_games'])
+    self.assertEqual(page, table.FetchPageForYear(self.this_year))
+
+  def testErrors(self):
+    results = backfill.Backfill(self.this_year, self.this_year + 1)
+    self.assertIn('past_games', results[self.this_year])
+    self.assertIn('error', results[self.this_year + 1])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,204 @@
+"""Backtests the team strength model against past seasons.
+
+For every week of every season in a range, we fit team strengths on the games
+before that week (in the same way as teams.GetTeamStrengthsMLE), predict the
+games of that week, and score the predictions against what actually happened.
+This is done for a grid of values of the model parameters in teams.py, so they
+can be tuned on history.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import numpy
+import sys
+
+import game_store
+import schedule
+import table
+import teams
+import util
+
+# Probabilities are clipped to [EPSILON, 1 - EPSILON] when computing log loss.
+EPSILON = 1e-15
+
+def _ReadArgs():
+  parser = argparse.ArgumentParser(description='Score the team strength model '
+                                   'on past seasons for a grid of parameters.  '
+                                   'Prints results to stdout, best first.')
+  parser.add_argument('start_year', type=int, help='First season to replay')
+  parser.add_argument('end_year', type=int, help='Last season to replay')
+  parser.add_argument('--last-season-weights', type=_FloatList,
+                      default=[teams.LAST_SEASON_WEIGHT],
+                      help='Comma-separated values of LAST_SEASON_WEIGHT')
+  parser.add_argument('--prior-variances', type=_FloatList,
+                      default=[teams.PRIOR_VARIANCE],
+                      help='Comma-separated values of PRIOR_VARIANCE')
+  parser.add_argument('--game-variances', type=_FloatList,
+                      default=[teams.GAME_VARIANCE],
+                      help='Comma-separated values of GAME_VARIANCE')
+  parser.add_argument('--processes', type=int, default=None,
+                      help='Number of worker processes.  Defaults to the '
+                      'number of CPUs.')
+  parser.add_argument('--offline', action='store_true',
+                      help='Only use cached pages; never access the network.')
+  if len(sys.argv) == 1:
+    parser.print_help()
+    sys.exit(1)
+  return vars(parser.parse_args())
+
+
+def _FloatList(value):
+  """Parses a comma-separated list of floats."""
+  return [float(x) for x in value.split(',')]
+
+
+def PrepareSeason(year):
+  """Precomputes everything needed to replay a season.
+
+  The least squares problem for any week and any choice of parameters can be
+  assembled from these pieces without looking at individual games again.
+
+  Args:
+    year: The season to replay.
+  Returns:
+    A dict with the following keys:
+      'year': The season.
+      'last_season': (normal_matrix, normal_rhs) for all games of the previous
+          season, each with weight 1.
+      'before_week': List where entry w holds (normal_matrix, normal_rhs) for
+          all regular season games of this season before week w + 1.
+      'weeks': List where entry w holds (home, away, outcomes) arrays for the
+          games of week w + 1.  outcomes is 1 if the home team won, 0 if it
+          lost and 0.5 for a tie.
+  """
+  last_season_games = game_store.FetchGameStore(year - 1)
+  last_season = teams.NormalEquations(last_season_games,
+                                      numpy.ones(len(last_season_games)))
+  season_games = game_store.FetchGameStore(year)
+
+  before_week = []
+  weeks = []
+  normal_matrix = numpy.zeros((util.NUM_TEAMS + 1, util.NUM_TEAMS + 1))
+  normal_rhs = numpy.zeros(util.NUM_TEAMS + 1)
+  for week in range(1, util.NumWeeksPerSeason(year) + 1):
+    games = season_games.Weeks(week, week + 1)
+    before_week.append((normal_matrix, normal_rhs))
+    home, away, _, differentials = games.HomeAwayArrays()
+    weeks.append((home, away, (numpy.sign(differentials) + 1) / 2))
+    if len(games):
+      week_matrix, week_rhs = teams.NormalEquations(games,
+                                                    numpy.ones(len(games)))
+      normal_matrix = normal_matrix + week_matrix
+      normal_rhs = normal_rhs + week_rhs
+  return {'year': year, 'last_season': last_season,
+          'before_week': before_week, 'weeks': weeks}
+
+
+def FitTeamStrengths(season, week, last_season_weight, prior_variance,
+                     game_variance):
+  """Fits team strengths for one week of a season prepared by PrepareSeason.
+
+  Uses the same model as teams.GetTeamStrengthsMLE(season['year'], week), but
+  with the given parameters.
+
+  Returns:
+    A (scores, home_field) pair, as in teams.SolveNormalEquations().
+  """
+  last_matrix, last_rhs = season['last_season']
+  cur_matrix, cur_rhs = season['before_week'][week - 1]
+  return teams.SolveNormalEquations(
+      last_season_weight * last_matrix + cur_matrix,
+      last_season_weight * last_rhs + cur_rhs,
+      regularization=game_variance / prior_variance)
+
+
+def EvaluateParameters(seasons, last_season_weight, prior_variance,
+                       game_variance):
+  """Scores predictions for every week of the given seasons.
+
+  Args:
+    seasons: List of outputs of PrepareSeason().
+    last_season_weight: Value of teams.LAST_SEASON_WEIGHT to use.
+    prior_variance: Value of teams.PRIOR_VARIANCE to use.
+    game_variance: Value of teams.GAME_VARIANCE to use.
+  Returns:
+    JSON-like dictionary with the parameters, the number of games predicted,
+    and the mean log loss and Brier score of the predictions.
+  """
+  probs = []
+  outcomes = []
+  for season in seasons:
+    for week, (home, away, week_outcomes) in enumerate(season['weeks'], 1):
+      if not len(home):
+        continue
+      scores, home_field = FitTeamStrengths(
+          season, week, last_season_weight, prior_variance, game_variance)
+      probs.append(schedule.WinningProbabilities(
+          scores, home_field, game_variance, home, away))
+      outcomes.append(week_outcomes)
+  probs = numpy.clip(numpy.concatenate(probs), EPSILON, 1 - EPSILON)
+  outcomes = numpy.concatenate(outcomes)
+  log_loss = -numpy.mean(outcomes * numpy.log(probs) +
+                         (1 - outcomes) * numpy.log(1 - probs))
+  return {
+      'last_season_weight': last_season_weight,
+      'prior_variance': prior_variance,
+      'game_variance': game_variance,
+      'num_games': len(outcomes),
+      'log_loss': float(log_loss),
+      'brier': float(numpy.mean((probs - outcomes) ** 2))
+  }
+
+
+# Seasons shared by all tasks in a worker process.  Set once per worker, so
+# the prepared seasons are not sent along with every grid cell.
+_worker_seasons = None
+
+
+def _InitWorker(seasons):
+  global _worker_seasons
+  _worker_seasons = seasons
+
+
+def _EvaluateInWorker(params):
+  return EvaluateParameters(_worker_seasons, *params)
+
+
+def RunBacktest(start_year, end_year, last_season_weights, prior_variances,
+                game_variances, processes=None):
+  """Evaluates every combination of parameters on a range of seasons.
+
+  Args:
+    start_year: First season to replay.
+    end_year: Last season to replay.
+    last_season_weights: Values of teams.LAST_SEASON_WEIGHT to try.
+    prior_variances: Values of teams.PRIOR_VARIANCE to try.
+    game_variances: Values of teams.GAME_VARIANCE to try.
+    processes: Number of worker processes, or None for the number of CPUs.
+        If 1, runs everything in the current process.
+  Returns:
+    List of outputs of EvaluateParameters(), sorted by log loss.
+  """
+  seasons = [PrepareSeason(year) for year in range(start_year, end_year + 1)]
+  grid = list(itertools.product(last_season_weights, prior_variances,
+                                game_variances))
+  if processes == 1:
+    _InitWorker(seasons)
+    results = map(_EvaluateInWorker, grid)
+  else:
+    processes = processes or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(processes, _InitWorker, (seasons,))
+    try:
+      results = pool.map(_EvaluateInWorker, grid,
+                         chunksize=max(1, len(grid) // (4 * processes)))
+    finally:
+      pool.close()
+      pool.join()
+  return sorted(results, key=lambda result: result['log_loss'])
+
+
+if __name__ == '__main__':
+  args = _ReadArgs()
+  table.OFFLINE = args.pop('offline')
+  print json.dumps(RunBacktest(**args), indent=2)
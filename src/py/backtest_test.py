@@ -0,0 +1,45 @@
+import mock
+import unittest
+
+import backtest
+import table
+import teams
+import test_utils
+import util
+
+class TestBacktestFunctions(test_utils.BaseTest):
+
+  def setUp(self):
+    # Replay the 2013 season, using the 2013 games as last season too.
+    self._MockFetchPastGames(current_season_filename='2013_past_season.html')
+    self.season = backtest.PrepareSeason(2014)
+
+  def testFitMatchesMLE(self):
+    for week in [1, 5, 17]:
+      scores, home_field = backtest.FitTeamStrengths(
+          self.season, week, teams.LAST_SEASON_WEIGHT, teams.PRIOR_VARIANCE,
+          teams.GAME_VARIANCE)
+      strengths = teams.GetTeamStrengthsMLE(2014, week)
+      self.assertAlmostEqual(strengths['home_field'], home_field)
+      for i, team in enumerate(util.TEAM_ABBREVIATIONS):
+        self.assertAlmostEqual(strengths['scores'][team], scores[i])
+
+  def testEvaluateParameters(self):
+    result = backtest.EvaluateParameters(
+        [self.season], teams.LAST_SEASON_WEIGHT, teams.PRIOR_VARIANCE,
+        teams.GAME_VARIANCE)
+    self.assertEqual(util.NUM_REGULAR_SEASON_GAMES, result['num_games'])
+    # Having seen last season, we should beat a coin flip.
+    self.assertLess(result['log_loss'], 0.69)
+    self.assertLess(result['brier'], 0.25)
+
+  def testRunBacktest(self):
+    results = backtest.RunBacktest(2014, 2014, [0.1, 1], [49.0], [100.0, 200.0],
+                                   processes=1)
+    self.assertEqual(4, len(results))
+    log_losses = [result['log_loss'] for result in results]
+    self.assertEqual(sorted(log_losses), log_losses)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,142 @@
+"""Makes picks for many pool entries at once.
+
+Every entry shares one prediction matrix but has its own set of used teams.
+All entries are solved in one process: entries with the same used teams are
+solved once, and distinct ones are solved in parallel by a pool of threads.
+The C optimizer releases the GIL while it runs, so threads are enough.
+
+Prints one JSON record per entry, in the order of the entries file.
+"""
+import argparse
+import json
+import multiprocessing
+import multiprocessing.pool
+import sys
+
+import picks
+import prediction_files
+import util
+
+def _ReadArgs():
+  parser = argparse.ArgumentParser(description='Make picks for many pool '
+                                   'entries.  Prints one JSON record per '
+                                   'entry to stdout.')
+  parser.add_argument('predictions',
+                      help='Predictions file, in either format of '
+                      'prediction_files.py')
+  parser.add_argument('entries',
+                      help='File with one entry per line, like '
+                      '"name [used,teams]".')
+  parser.add_argument('--first-week', type=int, default=None,
+                      help='Week of the first column of predictions.  '
+                      'Defaults to the week recorded in binary predictions '
+                      'files, and otherwise to assuming the predictions run '
+                      'until the end of a %d-week season.' %
+                      util.NUM_WEEKS_PER_SEASON)
+  parser.add_argument('--threads', type=int, default=None,
+                      help='Number of worker threads.  Defaults to the number '
+                      'of CPUs.')
+  if len(sys.argv) == 1:
+    parser.print_help()
+    sys.exit(1)
+  return vars(parser.parse_args())
+
+
+def ReadEntriesFile(filename):
+  """Reads pool entries, one per line, like "name [used,teams]".
+
+  Returns:
+    A list of (name, used_teams) pairs, where used_teams is a list of team
+    abbreviations.
+  """
+  entries = []
+  with open(filename) as f:
+    for line in f:
+      tokens = line.split()
+      if tokens:
+        used_teams = tokens[1].split(',') if len(tokens) > 1 else []
+        entries.append((tokens[0], [team for team in used_teams if team]))
+  return entries
+
+
+def SolveEntry(predictions, used_teams, first_week):
+  """Finds the optimal picks for one set of used teams.
+
+  Args:
+    predictions: Prediction matrix, as from
+        schedule.GetSchedulePredictionMatrix().
+    used_teams: Abbreviations of teams that must not be picked.
+    first_week: Week of the first column of predictions.
+  Returns:
+    JSON-like dictionary structured like: {
+        'expected_wins': w,
+        'picks': [{'week': first_week, 'team': 'DEN'}, ...],
+        'candidates': [['DEN', v_1], ['SEA', v_2], ...], the value of each
+            possible pick for the current week, best first,
+    }
+  """
+  matrix = picks.PicksMatrix(predictions, used_teams)
+  expected_wins, pick_sequence = picks.ChoosePicks(matrix)
+  values = picks.ComparePicks(matrix)
+  candidates = [[team, float(value)]
+                for team, value in zip(util.TEAM_ABBREVIATIONS, values)
+                if value == value]  # Skip NaN, i.e. teams that can't be picked
+  # Sort by value, keeping teams with equal values in alphabetical order.
+  candidates.sort(key=lambda candidate: -candidate[1])
+  return {
+      'expected_wins': float(expected_wins),
+      'picks': [{'week': first_week + i,
+                 'team': util.TEAM_ABBREVIATIONS[team]}
+                for i, team in enumerate(pick_sequence)],
+      'candidates': candidates
+  }
+
+
+def BatchPicks(predictions, entries, first_week, threads=None):
+  """Finds the optimal picks for every entry.
+
+  Args:
+    predictions: Prediction matrix, as from
+        schedule.GetSchedulePredictionMatrix().
+    entries: List of (name, used_teams) pairs, as from ReadEntriesFile().
+    first_week: Week of the first column of predictions.
+    threads: Number of worker threads, or None for the number of CPUs.
+  Returns:
+    List with one output of SolveEntry() per entry, in order, each with the
+    extra keys 'entry' (the name) and 'used_teams'.
+  """
+  # Entries only differ by their set of used teams, so solve each set once.
+  masks = sorted(set(frozenset(used_teams) for _, used_teams in entries))
+  pool = multiprocessing.pool.ThreadPool(
+      threads or multiprocessing.cpu_count())
+  try:
+    solutions = pool.map(
+        lambda mask: SolveEntry(predictions, sorted(mask), first_week), masks)
+  finally:
+    pool.close()
+    pool.join()
+  solution_for_mask = dict(zip(masks, solutions))
+
+  results = []
+  for name, used_teams in entries:
+    result = dict(solution_for_mask[frozenset(used_teams)])
+    result['entry'] = name
+    result['used_teams'] = used_teams
+    results.append(result)
+  return results
+
+
+def _PrintBatchPicks(predictions, entries, first_week, threads):
+  """Prints the results of BatchPicks() as JSON lines to stdout."""
+  matrix, file_first_week = prediction_files.ReadPredictions(predictions)
+  first_week = first_week or file_first_week
+  if first_week is None:
+    first_week = util.NUM_WEEKS_PER_SEASON - matrix.shape[1] + 1
+  for result in BatchPicks(matrix, ReadEntriesFile(entries), first_week,
+                           threads):
+    print json.dumps(result, sort_keys=True)
+
+
+if __name__ == '__main__':
+  args = _ReadArgs()
+  _PrintBatchPicks(**args)
@@ -0,0 +1,60 @@
+import numpy
+import os
+import tempfile
+import unittest
+
+import batch_picks
+import picks
+import prediction_files
+import util
+
+@unittest.skipUnless(os.path.exists(picks.LIBRARY_PATH),
+                     'Run make to build the pick optimizer')
+class TestBatchPicksFunctions(unittest.TestCase):
+
+  def setUp(self):
+    self.predictions = numpy.random.RandomState(0).random_sample(
+        (util.NUM_TEAMS, 5))
+    self.predictions[3, 2] = numpy.nan  # A bye week
+
+  def testReadEntriesFile(self):
+    with tempfile.NamedTemporaryFile() as f:
+      f.write('alice DEN,SEA\nbob\n\ncarol NE\n')
+      f.flush()
+      self.assertEqual([('alice', ['DEN', 'SEA']), ('bob', []),
+                        ('carol', ['NE'])],
+                       batch_picks.ReadEntriesFile(f.name))
+
+  def testBatchPicks(self):
+    entries = [('a', ['DEN', 'SEA']), ('b', []), ('c', ['SEA', 'DEN']),
+               ('d', ['NE'])]
+    results = batch_picks.BatchPicks(self.predictions, entries, 14, threads=2)
+    self.assertEqual(['a', 'b', 'c', 'd'],
+                     [result['entry'] for result in results])
+    for (_, used_teams), result in zip(entries, results):
+      expected = batch_picks.SolveEntry(self.predictions, used_teams, 14)
+      self.assertEqual(expected['picks'], result['picks'])
+      self.assertAlmostEqual(expected['expected_wins'],
+                             result['expected_wins'])
+      self.assertEqual(used_teams, result['used_teams'])
+      picked = [pick['team'] for pick in result['picks']]
+      self.assertFalse(set(picked) & set(used_teams))
+      self.assertEqual(range(14, 19), [pick['week'] for pick in result['picks']])
+      candidates = [team for team, _ in result['candidates']]
+      self.assertEqual(util.NUM_TEAMS - len(used_teams), len(candidates))
+      self.assertEqual(picked[0], candidates[0])
+
+  def testUsedTeamsInFileOnlyAffectTheirEntries(self):
+    predictions = self.predictions.copy()
+    predictions[util.GetTeamIndex('NE')] = 0.95
+    with tempfile.NamedTemporaryFile() as f:
+      prediction_files.WriteBinaryPredictions(f.name, predictions, 14, ['NE'])
+      matrix, _ = prediction_files.ReadPredictions(f.name)
+    results = batch_picks.BatchPicks(matrix, [('a', []), ('b', ['NE'])], 14)
+    self.assertIn('NE', [pick['team'] for pick in results[0]['picks']])
+    self.assertIn('NE', [team for team, _ in results[0]['candidates']])
+    self.assertNotIn('NE', [team for team, _ in results[1]['candidates']])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,271 @@
+"""Benchmarks each stage of the pipeline on synthetic data.
+
+Stages are timed for a grid of league and season shapes, built by
+synthetic.py, so we can see how they scale with more teams, more weeks and
+longer histories.  Everything runs offline: synthetic season pages are put in
+a temporary page cache, and table.OFFLINE is set while benchmarking.
+
+Results are written as JSON.  Given the results of an earlier run as a
+baseline, also reports how much each benchmark slowed down or sped up, and
+exits with status 1 if any slowed down by more than the tolerance.
+"""
+import argparse
+import json
+import numpy
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import backtest
+import picks
+import schedule
+import synthetic
+import table
+import teams
+import util
+
+# Paths of the C binaries, built by running make at the top of the repository.
+BUILD_DIRECTORY = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                               os.pardir, os.pardir, 'build')
+
+# Seasons to take the number of weeks from, by number of weeks.  The Python
+# stages follow the real season shape of the year they are asked about.
+_YEARS_BY_NUM_WEEKS = {17: 2019, 18: 2023}
+
+def _ReadArgs():
+  parser = argparse.ArgumentParser(description='Benchmark the pipeline on '
+                                   'synthetic data.  Prints results to stdout '
+                                   'as JSON.')
+  parser.add_argument('--teams', type=_IntList, default=[util.NUM_TEAMS],
+                      help='Comma-separated numbers of teams with games')
+  parser.add_argument('--weeks', type=_IntList, default=[17, 18],
+                      help='Comma-separated season lengths, each one of %s' %
+                      sorted(_YEARS_BY_NUM_WEEKS))
+  parser.add_argument('--history', type=_IntList, default=[1, 5],
+                      help='Comma-separated numbers of seasons to backtest')
+  parser.add_argument('--dp-weeks', type=_IntList, default=[12, 15, 18],
+                      help='Comma-separated numbers of weeks left for the C '
+                      'pick optimizer')
+  parser.add_argument('--repeat', type=int, default=3,
+                      help='Number of runs to take the median of')
+  parser.add_argument('--seed', type=int, default=0, help='Random seed')
+  parser.add_argument('--output', help='Also write the results to this file')
+  parser.add_argument('--baseline',
+                      help='Results of an earlier run to compare against')
+  parser.add_argument('--tolerance', type=float, default=0.25,
+                      help='Slowdown relative to the baseline, as a fraction, '
+                      'above which a benchmark counts as a regression')
+  if len(sys.argv) == 1:
+    parser.print_help()
+    sys.exit(1)
+  return vars(parser.parse_args())
+
+
+def _IntList(value):
+  """Parses a comma-separated list of ints."""
+  return [int(x) for x in value.split(',')]
+
+
+def _MedianTime(function, repeat, setup=None):
+  """Returns the median wall time of function(), in seconds.
+
+  setup(), if given, is called untimed before each run.
+  """
+  times = []
+  for _ in range(repeat):
+    if setup:
+      setup()
+    start = time.time()
+    function()
+    times.append(time.time() - start)
+  return sorted(times)[len(times) // 2]
+
+
+def _Result(name, seconds, **params):
+  return {'name': name, 'params': params, 'seconds': seconds}
+
+
+def _ClearParsedPages():
+  table._parsed_memo.clear()
+
+
+def _BenchmarkSeasons(num_teams, num_weeks, history, repeat, rng):
+  """Benchmarks the Python stages for one league and season shape.
+
+  Must be called with a temporary, offline page cache.
+  """
+  year = _YEARS_BY_NUM_WEEKS[num_weeks]
+  num_played_weeks = num_weeks // 2
+  week = num_played_weeks + 1
+  for season in range(year - max(history), year + 1):
+    season_weeks = util.NumWeeksPerSeason(season)
+    table.StorePageForYear(season, synthetic.GenerateSeasonPage(
+        num_teams, season_weeks,
+        num_played_weeks if season == year else season_weeks, rng))
+  page = table.FetchPageForYear(year)
+  shape = {'teams': num_teams, 'weeks': num_weeks}
+
+  results = [_Result('parse', _MedianTime(
+      lambda: table.ParsePastGamesTable(page), repeat, _ClearParsedPages),
+                     **shape)]
+  # Later stages see parsed pages, as they would in a warm process.
+  results.append(_Result('strengths_mle', _MedianTime(
+      lambda: teams.GetTeamStrengthsMLE(year, week), repeat), **shape))
+  results.append(_Result('strengths_simple', _MedianTime(
+      lambda: teams.GetTeamStrengthsSimple(year, week), repeat), **shape))
+  results.append(_Result('strengths_decayed', _MedianTime(
+      lambda: teams.GetTeamStrengthsDecayed(year, week, max(history) + 1),
+      repeat), history=max(history), **shape))
+  team_strengths = teams.GetTeamStrengthsMLE(year, week)
+  results.append(_Result('schedule', _MedianTime(
+      lambda: schedule.GetSchedulePredictionMatrix(year, week, team_strengths),
+      repeat), **shape))
+  for num_seasons in history:
+    results.append(_Result('backtest', _MedianTime(
+        lambda: backtest.RunBacktest(
+            year - num_seasons + 1, year, [teams.LAST_SEASON_WEIGHT],
+            [teams.PRIOR_VARIANCE], [teams.GAME_VARIANCE], processes=1),
+        repeat), history=num_seasons, **shape))
+  return results
+
+
+def _RunProfiledBinary(binary, options, filename, repeat):
+  """Runs a C binary with -p, returning the median of each stage's seconds."""
+  reports = []
+  with open(os.devnull, 'w') as devnull:
+    for _ in range(repeat):
+      process = subprocess.Popen(
+          [os.path.join(BUILD_DIRECTORY, binary), '-p'] + options +
+          [filename],
+          stdout=devnull, stderr=subprocess.PIPE)
+      _, stderr = process.communicate()
+      reports.append(json.loads(stderr))
+  stages = dict((name, sorted(report['stages'][name]['seconds']
+                              for report in reports)[len(reports) // 2])
+                for name in reports[0]['stages'])
+  return stages, reports[0]['counters']
+
+
+def _BenchmarkPicks(num_teams, num_weeks, repeat, rng, directory):
+  """Benchmarks the C pick optimizer on one synthetic prediction file.
+
+  Each engine is timed, under names like 'dp_solve' and 'assignment_compare'.
+  """
+  filename = os.path.join(directory, 'predictions_%d_%d.txt' %
+                          (num_teams, num_weeks))
+  with open(filename, 'w') as f:
+    print >> f, schedule.SchedulePredictionsToString(
+        synthetic.GeneratePredictions(num_teams, num_weeks, rng))
+  shape = {'teams': num_teams, 'weeks': num_weeks}
+  results = []
+  for engine in picks.ENGINES:
+    for binary, stage, kind in [('choose-picks', 'picks.solve', 'solve'),
+                                ('compare-picks', 'picks.compare', 'compare')]:
+      stages, counters = _RunProfiledBinary(binary, ['-e', engine], filename,
+                                            repeat)
+      result = _Result('%s_%s' % (engine, kind), stages[stage], **shape)
+      result['dp_states'] = counters['picks.dp_states']
+      result['pruned_teams'] = counters['picks.pruned_teams']
+      results.append(result)
+  return results
+
+
+def RunBenchmarks(teams_list, weeks_list, history, dp_weeks, repeat, seed=0):
+  """Runs every benchmark.
+
+  Args:
+    teams_list: Numbers of teams with games to try.
+    weeks_list: Season lengths to try, each a key of _YEARS_BY_NUM_WEEKS.
+    history: Numbers of seasons to backtest.
+    dp_weeks: Numbers of weeks left to give the C pick optimizer.  Skipped if
+        the C binaries have not been built.
+    repeat: Number of runs to take the median of.
+    seed: Random seed for the synthetic data.
+  Returns:
+    A list of results, each a dict with the benchmark 'name', its 'params'
+    and the median 'seconds'.
+  """
+  rng = numpy.random.RandomState(seed)
+  directory = tempfile.mkdtemp()
+  saved = (table.CACHE_DIRECTORY, table.OFFLINE, dict(table._page_memo))
+  table.CACHE_DIRECTORY = directory
+  table.OFFLINE = True
+  results = []
+  try:
+    for num_teams in teams_list:
+      for num_weeks in weeks_list:
+        table._page_memo.clear()
+        _ClearParsedPages()
+        results.extend(_BenchmarkSeasons(num_teams, num_weeks, history, repeat,
+                                         rng))
+      if os.path.exists(os.path.join(BUILD_DIRECTORY, 'choose-picks')):
+        for num_weeks in dp_weeks:
+          results.extend(_BenchmarkPicks(num_teams, num_weeks, repeat, rng,
+                                         directory))
+  finally:
+    table.CACHE_DIRECTORY, table.OFFLINE = saved[:2]
+    table._page_memo.clear()
+    table._page_memo.update(saved[2])
+    _ClearParsedPages()
+    shutil.rmtree(directory)
+  return results
+
+
+def _ResultKey(result):
+  return (result['name'], tuple(sorted(result['params'].iteritems())))
+
+
+def CompareToBaseline(results, baseline, tolerance):
+  """Compares results to those of an earlier run.
+
+  Args:
+    results: Output of RunBenchmarks().
+    baseline: Output of RunBenchmarks() from an earlier run.
+    tolerance: Slowdown, as a fraction, above which a benchmark regressed.
+  Returns:
+    A list with one dict per benchmark in both runs, with its 'name',
+    'params', 'baseline_seconds', 'seconds', their 'ratio' and whether it
+    'regressed'.
+  """
+  baseline_seconds = dict((_ResultKey(result), result['seconds'])
+                          for result in baseline)
+  comparison = []
+  for result in results:
+    old_seconds = baseline_seconds.get(_ResultKey(result))
+    if old_seconds is None:
+      continue
+    ratio = result['seconds'] / max(old_seconds, 1e-9)
+    comparison.append({
+        'name': result['name'],
+        'params': result['params'],
+        'baseline_seconds': old_seconds,
+        'seconds': result['seconds'],
+        'ratio': ratio,
+        'regressed': ratio > 1 + tolerance
+    })
+  return comparison
+
+
+def _PrintBenchmarks(teams, weeks, history, dp_weeks, repeat, seed, output,
+                     baseline, tolerance):
+  """Prints benchmark results, and the comparison to a baseline, as JSON."""
+  results = RunBenchmarks(teams, weeks, history, dp_weeks, repeat, seed)
+  if output:
+    with open(output, 'w') as f:
+      json.dump(results, f, indent=2, sort_keys=True)
+  report = {'results': results}
+  if baseline:
+    with open(baseline) as f:
+      report['comparison'] = CompareToBaseline(results, json.load(f),
+                                               tolerance)
+  print json.dumps(report, indent=2, sort_keys=True)
+  if any(entry['regressed'] for entry in report.get('comparison', [])):
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+  args = _ReadArgs()
+  _PrintBenchmarks(**args)
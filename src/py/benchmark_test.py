@@ -0,0 +1,33 @@
+import unittest
+
+import benchmark
+import table
+
+class TestBenchmarkFunctions(unittest.TestCase):
+
+  def testRunBenchmarks(self):
+    cache_directory = table.CACHE_DIRECTORY
+    results = benchmark.RunBenchmarks([8], [18], [1], [4], repeat=1)
+    names = set(result['name'] for result in results)
+    for name in ['parse', 'strengths_mle', 'strengths_simple',
+                 'strengths_decayed', 'schedule', 'backtest']:
+      self.assertIn(name, names)
+    self.assertTrue(all(result['seconds'] >= 0 for result in results))
+    # The real cache is left alone.
+    self.assertEqual(cache_directory, table.CACHE_DIRECTORY)
+    self.assertFalse(table.OFFLINE)
+
+  def testCompareToBaseline(self):
+    baseline = [{'name': 'parse', 'params': {'weeks': 18}, 'seconds': 1.0},
+                {'name': 'schedule', 'params': {'weeks': 18}, 'seconds': 1.0}]
+    results = [{'name': 'parse', 'params': {'weeks': 18}, 'seconds': 1.1},
+               {'name': 'schedule', 'params': {'weeks': 18}, 'seconds': 2.0},
+               {'name': 'schedule', 'params': {'weeks': 17}, 'seconds': 2.0}]
+    comparison = benchmark.CompareToBaseline(results, baseline, 0.25)
+    self.assertEqual([False, True],
+                     [entry['regressed'] for entry in comparison])
+    self.assertAlmostEqual(2.0, comparison[1]['ratio'])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,181 @@
+"""Downloads pages politely and efficiently.
+
+A Fetcher keeps one connection per host open in each thread that uses it,
+waits between requests to the same host, retries failed requests with
+exponential backoff, and makes conditional requests when it is given the
+validators (ETag and Last-Modified) of a copy that is already cached.
+"""
+import httplib
+import socket
+import threading
+import time
+import urlparse
+
+import profiling
+
+# Minimum time, in seconds, between the starts of two requests to one host.
+DEFAULT_MIN_INTERVAL = 0.1
+
+# Number of times a failed request is retried, and the delay before the first
+# retry, in seconds.  Each further retry waits twice as long.
+MAX_RETRIES = 3
+RETRY_DELAY = 0.5
+
+# Seconds to wait for a server before giving up on a request.
+TIMEOUT = 30
+
+# Number of redirects followed for a single request.
+MAX_REDIRECTS = 5
+
+# Status codes worth retrying, besides connection errors.
+_RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+_REDIRECT_STATUSES = frozenset([301, 302, 303, 307, 308])
+
+class FetchError(IOError):
+  """Raised when a page cannot be downloaded."""
+
+
+class Page(object):
+  """The result of a request.
+
+  Attributes:
+    url: The URL requested.
+    body: The page, or None if the server said the cached copy is current.
+    etag: The ETag header of the response, or None.
+    last_modified: The Last-Modified header of the response, or None.
+  """
+
+  def __init__(self, url, body, etag=None, last_modified=None):
+    self.url = url
+    self.body = body
+    self.etag = etag
+    self.last_modified = last_modified
+
+  def IsModified(self):
+    return self.body is not None
+
+
+class RateLimiter(object):
+  """Spaces out events by at least a minimum interval, across threads."""
+
+  def __init__(self, min_interval):
+    self.min_interval = min_interval
+    self._lock = threading.Lock()
+    self._next_time = 0
+
+  def Wait(self):
+    """Blocks until the next event may happen."""
+    with self._lock:
+      now = time.time()
+      start = max(now, self._next_time)
+      self._next_time = start + self.min_interval
+    if start > now:
+      time.sleep(start - now)
+
+
+class Fetcher(object):
+  """Downloads pages; may be shared by several threads."""
+
+  def __init__(self, min_interval=DEFAULT_MIN_INTERVAL, max_retries=MAX_RETRIES,
+               retry_delay=RETRY_DELAY, timeout=TIMEOUT):
+    self.min_interval = min_interval
+    self.max_retries = max_retries
+    self.retry_delay = retry_delay
+    self.timeout = timeout
+    self._lock = threading.Lock()
+    self._limiters = {}
+    # Each thread's open connections, keyed by (scheme, host).
+    self._local = threading.local()
+
+  def _Limiter(self, host):
+    with self._lock:
+      if host not in self._limiters:
+        self._limiters[host] = RateLimiter(self.min_interval)
+      return self._limiters[host]
+
+  def _Connection(self, scheme, host):
+    connections = self._local.__dict__.setdefault('connections', {})
+    key = (scheme, host)
+    if key not in connections:
+      connection_class = (httplib.HTTPSConnection if scheme == 'https' else
+                          httplib.HTTPConnection)
+      connections[key] = connection_class(host, timeout=self.timeout)
+    return connections[key]
+
+  def _CloseConnection(self, scheme, host):
+    connection = self._local.__dict__.get('connections', {}).pop(
+        (scheme, host), None)
+    if connection:
+      connection.close()
+
+  def _Request(self, url, headers):
+    """Makes one request.  Returns (status, response headers, body)."""
+    parts = urlparse.urlsplit(url)
+    path = parts.path or '/'
+    if parts.query:
+      path += '?' + parts.query
+    self._Limiter(parts.netloc).Wait()
+    connection = self._Connection(parts.scheme, parts.netloc)
+    try:
+      with profiling.Stage('fetch.request'):
+        connection.request('GET', path, headers=headers)
+        response = connection.getresponse()
+        body = response.read()
+    except (httplib.HTTPException, socket.error):
+      # The server may have closed a kept-alive connection; start afresh.
+      self._CloseConnection(parts.scheme, parts.netloc)
+      raise
+    if response.getheader('connection', '').lower() == 'close':
+      self._CloseConnection(parts.scheme, parts.netloc)
+    profiling.Count('fetch.requests')
+    profiling.Count('fetch.bytes', len(body))
+    return response.status, response, body
+
+  def Fetch(self, url, etag=None, last_modified=None):
+    """Downloads a page, unless it has not changed.
+
+    Args:
+      url: The page to download.
+      etag: ETag of the cached copy of the page, if any.
+      last_modified: Last-Modified header of the cached copy, if any.
+    Returns:
+      A Page.  Its body is None if the server says the cached copy is
+      current.
+    Raises:
+      FetchError: if the page could not be downloaded, even after retries.
+    """
+    headers = {}
+    if etag:
+      headers['If-None-Match'] = etag
+    if last_modified:
+      headers['If-Modified-Since'] = last_modified
+    delay = self.retry_delay
+    redirects = 0
+    attempt = 0
+    while True:
+      try:
+        status, response, body = self._Request(url, headers)
+      except (httplib.HTTPException, socket.error) as e:
+        status, error = None, e
+      else:
+        if status == 200:
+          return Page(url, body, response.getheader('etag'),
+                      response.getheader('last-modified'))
+        elif status == 304:
+          return Page(url, None, response.getheader('etag') or etag,
+                      response.getheader('last-modified') or last_modified)
+        elif (status in _REDIRECT_STATUSES and response.getheader('location')
+              and redirects < MAX_REDIRECTS):
+          url = urlparse.urljoin(url, response.getheader('location'))
+          redirects += 1
+          continue
+        error = 'HTTP status %d' % status
+      if status is not None and status not in _RETRY_STATUSES:
+        raise FetchError('Could not fetch %s: %s' % (url, error))
+      if attempt == self.max_retries:
+        raise FetchError('Could not fetch %s after %d attempts: %s' %
+                         (url, attempt + 1, error))
+      profiling.Count('fetch.retries')
+      time.sleep(delay)
+      delay *= 2
+      attempt += 1
@@ -0,0 +1,70 @@
+import threading
+import time
+import unittest
+
+import fetch
+import test_utils
+
+class TestFetcher(unittest.TestCase):
+
+  def setUp(self):
+    self.server = test_utils.StandInServer({'/a': 'page a', '/b': 'page b'})
+    self.addCleanup(self.server.Stop)
+    self.fetcher = fetch.Fetcher(min_interval=0, retry_delay=0)
+
+  def testFetch(self):
+    page = self.fetcher.Fetch(self.server.Url('/a'))
+    self.assertTrue(page.IsModified())
+    self.assertEqual('page a', page.body)
+    self.assertTrue(page.etag)
+
+  def testReusesConnections(self):
+    for path in ['/a', '/b', '/a']:
+      self.fetcher.Fetch(self.server.Url(path))
+    self.assertEqual(1, self.server.connections)
+
+  def testConditionalRequest(self):
+    page = self.fetcher.Fetch(self.server.Url('/a'))
+    unchanged = self.fetcher.Fetch(self.server.Url('/a'), etag=page.etag)
+    self.assertFalse(unchanged.IsModified())
+    self.assertEqual(page.etag, unchanged.etag)
+
+    self.server.pages['/a'] = 'new page a'
+    changed = self.fetcher.Fetch(self.server.Url('/a'), etag=page.etag)
+    self.assertEqual('new page a', changed.body)
+    self.assertNotEqual(page.etag, changed.etag)
+
+  def testRetries(self):
+    self.server.failures['/a'] = 2
+    self.assertEqual('page a', self.fetcher.Fetch(self.server.Url('/a')).body)
+    self.assertEqual(3, self.server.requests['/a'])
+
+    self.server.failures['/a'] = fetch.MAX_RETRIES + 1
+    self.assertRaises(fetch.FetchError, self.fetcher.Fetch,
+                      self.server.Url('/a'))
+
+  def testNotFound(self):
+    self.assertRaises(fetch.FetchError, self.fetcher.Fetch,
+                      self.server.Url('/missing'))
+    self.assertEqual(1, self.server.requests['/missing'])
+
+  def testRedirect(self):
+    self.server.redirects['/old'] = '/b'
+    self.assertEqual('page b', self.fetcher.Fetch(self.server.Url('/old')).body)
+
+  def testRateLimitIsSharedByThreads(self):
+    fetcher = fetch.Fetcher(min_interval=0.05)
+    start = time.time()
+    threads = [threading.Thread(target=fetcher.Fetch,
+                                args=(self.server.Url('/a'),))
+               for _ in range(5)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertGreaterEqual(time.time() - start, 0.2)
+    self.assertEqual(5, self.server.requests['/a'])
+
+
+if __name__ == '__main__':
+  unittest.main()
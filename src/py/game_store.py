@@ -0,0 +1,184 @@
+"""Columnar storage of finished games.
+
+A GameStore holds the same information as a list of table.PastGame objects,
+as one typed numpy array per field, so that many seasons of games fit in a
+few MB and can be filtered without looping in Python:
+
+  games = game_store.FetchGameStore(2013)
+  games.RegularSeason().Weeks(1, 9)
+
+Stores are read-only; filters return new stores.  Postseason games have
+week numbers following the last regular season week, in the order of
+POSTSEASON_ROUNDS, and are flagged in the postseason column.
+"""
+import numpy
+
+import table
+import util
+
+# Week labels of postseason games on a season page, in the order played.
+POSTSEASON_ROUNDS = ['WildCard', 'Division', 'ConfChamp', 'SuperBowl']
+
+# Name and dtype of each column.
+COLUMNS = [
+    ('season', numpy.int16),
+    ('week', numpy.int8),
+    ('postseason', numpy.bool_),
+    ('winning_team', numpy.int8),  # Index into util.TEAM_ABBREVIATIONS
+    ('losing_team', numpy.int8),
+    ('home_or_away', numpy.int8),  # table.HOME_TEAM_WON, etc.
+    ('winning_points', numpy.int16),
+    ('losing_points', numpy.int16),
+]
+
+class GameStore(object):
+  """Finished games, one array per column in COLUMNS.
+
+  Attributes:
+    season, week, postseason, winning_team, losing_team, home_or_away,
+    winning_points, losing_points: The columns, all of the same length.
+  """
+
+  def __init__(self, **columns):
+    for name, dtype in COLUMNS:
+      setattr(self, name, numpy.asarray(columns.get(name, ()), dtype=dtype))
+
+  def __len__(self):
+    return len(self.season)
+
+  @classmethod
+  def FromPastGames(cls, season, games):
+    """Builds a store from a list of table.PastGame objects of one season.
+
+    Raises:
+      KeyError: if a game's week is neither a number nor in POSTSEASON_ROUNDS.
+    """
+    num_weeks = util.NumWeeksPerSeason(season)
+    weeks = []
+    postseason = []
+    for game in games:
+      if game.week.isdigit():
+        weeks.append(int(game.week))
+        postseason.append(False)
+      elif game.week in POSTSEASON_ROUNDS:
+        weeks.append(num_weeks + 1 + POSTSEASON_ROUNDS.index(game.week))
+        postseason.append(True)
+      else:
+        raise KeyError('Unrecognized week "%s"' % game.week)
+    return cls(
+        season=[season] * len(games), week=weeks, postseason=postseason,
+        winning_team=[util.GetTeamIndex(g.winning_team) for g in games],
+        losing_team=[util.GetTeamIndex(g.losing_team) for g in games],
+        home_or_away=[g.home_or_away for g in games],
+        winning_points=[g.winning_points for g in games],
+        losing_points=[g.losing_points for g in games])
+
+  def Select(self, mask):
+    """Returns the games selected by a boolean mask or array of indices."""
+    return GameStore(**dict((name, getattr(self, name)[mask])
+                            for name, _ in COLUMNS))
+
+  def Seasons(self, first, last=None):
+    """Returns the games of the seasons from first to last, inclusive.
+
+    last defaults to first.
+    """
+    if last is None:
+      last = first
+    return self.Select((self.season >= first) & (self.season <= last))
+
+  def RegularSeason(self):
+    """Returns the regular season games."""
+    return self.Select(~self.postseason)
+
+  def Postseason(self):
+    """Returns the postseason games."""
+    return self.Select(self.postseason)
+
+  def Weeks(self, first=1, end=None):
+    """Returns regular season games from week first up to, not including, end.
+
+    end defaults to after the last week.
+    """
+    mask = ~self.postseason & (self.week >= first)
+    if end is not None:
+      mask &= self.week < end
+    return self.Select(mask)
+
+  def NotWeeks(self, first=1, end=None):
+    """Returns the games that Weeks(first, end) leaves out."""
+    mask = self.postseason | (self.week < first)
+    if end is not None:
+      mask |= self.week >= end
+    return self.Select(mask)
+
+  def PointDifferentials(self):
+    """Returns the winner's margin of victory in each game."""
+    return (self.winning_points.astype(float) -
+            self.losing_points.astype(float))
+
+  def HomeAwayArrays(self):
+    """Returns the games from the home team's perspective.
+
+    For the Super Bowl, the winner is treated as the "home" team.
+
+    Returns:
+      A (home, away, has_home, differentials) tuple of arrays with one entry
+      per game.  home and away index into util.TEAM_ABBREVIATIONS, has_home is
+      0 for games played at a neutral site and 1 otherwise, and differentials
+      gives the home team's margin of victory.
+    """
+    home_lost = self.home_or_away == table.HOME_TEAM_LOST
+    home = numpy.where(home_lost, self.losing_team,
+                       self.winning_team).astype(numpy.intp)
+    away = numpy.where(home_lost, self.winning_team,
+                       self.losing_team).astype(numpy.intp)
+    has_home = (self.home_or_away != table.NO_HOME_TEAM).astype(float)
+    differentials = self.PointDifferentials()
+    differentials[home_lost] *= -1
+    return home, away, has_home, differentials
+
+  def Save(self, f):
+    """Writes the store to a file or filename, in numpy's .npz format."""
+    numpy.savez_compressed(f, **dict((name, getattr(self, name))
+                                     for name, _ in COLUMNS))
+
+  @classmethod
+  def Load(cls, f):
+    """Reads a store written by Save()."""
+    data = numpy.load(f)
+    try:
+      return cls(**dict((name, data[name]) for name, _ in COLUMNS))
+    finally:
+      data.close()
+
+
+def Concatenate(stores):
+  """Returns a store with the games of all the given stores, in order."""
+  stores = list(stores)
+  return GameStore(**dict(
+      (name, numpy.concatenate([getattr(store, name) for store in stores] or
+                               [numpy.empty(0, dtype)]))
+      for name, dtype in COLUMNS))
+
+
+def ParseGameStore(html_body, season):
+  """Parses the finished games on a season page into a GameStore.
+
+  Results are memoized per document, like table.ParsePastGamesTable().
+  """
+  return table.MemoizeForDocument(
+      html_body, ('game_store', season),
+      lambda: GameStore.FromPastGames(season,
+                                      table.ParsePastGamesTable(html_body)))
+
+
+def FetchGameStore(year):
+  """Fetches the finished games of the given year as a GameStore."""
+  return ParseGameStore(table.FetchPageForYear(year), year)
+
+
+def FetchGameHistory(first_year, last_year):
+  """Fetches the finished games of a range of seasons as one GameStore."""
+  return Concatenate(FetchGameStore(year)
+                     for year in range(first_year, last_year + 1))
@@ -0,0 +1,78 @@
+import numpy
+import StringIO
+import unittest
+
+import game_store
+import table
+import test_utils
+import util
+
+class TestGameStore(unittest.TestCase):
+
+  def setUp(self):
+    self.html = test_utils.ReadTestdataFile('2013_past_season.html')
+    self.past_games = table.ParsePastGamesTable(self.html)
+    self.games = game_store.GameStore.FromPastGames(2013, self.past_games)
+
+  def _AssertStoresEqual(self, expected, actual):
+    for name, dtype in game_store.COLUMNS:
+      self.assertEqual(dtype, getattr(actual, name).dtype)
+      numpy.testing.assert_array_equal(getattr(expected, name),
+                                       getattr(actual, name))
+
+  def testFromPastGames(self):
+    self.assertEqual(len(self.past_games), len(self.games))
+    self.assertEqual(util.NumRegularSeasonGames(2013),
+                     len(self.games.RegularSeason()))
+    postseason = self.games.Postseason()
+    self.assertEqual(util.NumPlayoffTeams(2013) - 1, len(postseason))
+    self.assertEqual(util.NumWeeksPerSeason(2013) + 4, postseason.week.max())
+    for i, game in enumerate(self.past_games):
+      self.assertEqual(game.winning_team,
+                       util.TEAM_ABBREVIATIONS[self.games.winning_team[i]])
+      self.assertEqual(game.GetPointDifferential(),
+                       self.games.PointDifferentials()[i])
+
+  def testFilters(self):
+    first_half = self.games.Weeks(1, 9)
+    self.assertTrue(numpy.all(first_half.week < 9))
+    self.assertEqual(
+        len([g for g in self.past_games if g.week.isdigit() and
+             int(g.week) < 9]), len(first_half))
+    self.assertEqual(len(self.games),
+                     len(first_half) + len(self.games.NotWeeks(1, 9)))
+    self.assertEqual(len(self.games.RegularSeason()), len(self.games.Weeks()))
+
+    history = game_store.Concatenate(
+        [self.games, game_store.GameStore.FromPastGames(2014,
+                                                         self.past_games)])
+    self.assertEqual(2 * len(self.games), len(history))
+    self._AssertStoresEqual(self.games, history.Seasons(2013))
+    self.assertEqual(len(history), len(history.Seasons(2013, 2014)))
+    self.assertEqual(0, len(game_store.Concatenate([])))
+
+  def testHomeAwayArrays(self):
+    home, away, has_home, differentials = self.games.HomeAwayArrays()
+    for i, game in enumerate(self.past_games):
+      if game.home_or_away == table.HOME_TEAM_LOST:
+        self.assertEqual(game.losing_team, util.TEAM_ABBREVIATIONS[home[i]])
+        self.assertEqual(-game.GetPointDifferential(), differentials[i])
+      else:
+        self.assertEqual(game.winning_team, util.TEAM_ABBREVIATIONS[home[i]])
+        self.assertEqual(game.GetPointDifferential(), differentials[i])
+      self.assertEqual(game.home_or_away != table.NO_HOME_TEAM, has_home[i])
+
+  def testSaveAndLoad(self):
+    f = StringIO.StringIO()
+    self.games.Save(f)
+    f.seek(0)
+    self._AssertStoresEqual(self.games, game_store.GameStore.Load(f))
+
+  def testParseGameStoreIsMemoized(self):
+    games = game_store.ParseGameStore(self.html, 2013)
+    self.assertIs(games, game_store.ParseGameStore(self.html, 2013))
+    self._AssertStoresEqual(self.games, games)
+
+
+if __name__ == '__main__':
+  unittest.main()
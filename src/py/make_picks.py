@@ -0,0 +1,112 @@
+"""Makes NFL Suicide Pool picks, running the whole pipeline in one process.
+
+Prints the same output as build/choose-picks followed by build/compare-picks.
+"""
+import argparse
+import sys
+
+import picks
+import prediction_files
+import profiling
+import schedule
+import table
+import util
+
+def _ReadArgs():
+  parser = argparse.ArgumentParser(description='Make suicide pool picks.  '
+                                   'Prints results to stdout.')
+  parser.add_argument('year', type=int, help='The current year')
+  parser.add_argument('week', type=int,
+                      help='The current week.  Represents the week about to be '
+                      'played, e.g. week 1 means the season hasn\'t started.')
+  parser.add_argument('used_teams', nargs='?', default='',
+                      help='Comma-separated teams that have already been used')
+  parser.add_argument('--predictions-file',
+                      help='Also write the predictions to this file, in the '
+                      'format of schedule.py')
+  parser.add_argument('--binary-predictions-file',
+                      help='Also write the predictions to this file, in the '
+                      'binary format of prediction_files.py')
+  parser.add_argument('--engine', choices=picks.ENGINES,
+                      default=picks.ENGINE_DP,
+                      help='Algorithm used to optimize the picks')
+  parser.add_argument('--beam-width', type=int,
+                      default=picks.DEFAULT_BEAM_WIDTH,
+                      help='Partial pick sequences kept each week by the beam '
+                      'engine')
+  parser.add_argument('--beam-top-k', type=int,
+                      default=picks.DEFAULT_BEAM_TOP_K,
+                      help='Teams tried each week per sequence by the beam '
+                      'engine')
+  parser.add_argument('--offline', action='store_true',
+                      help='Only use cached pages; never access the network.')
+  parser.add_argument('--profile', action='store_true',
+                      help='Print time spent per stage and other counters to '
+                      'stderr, as JSON.')
+  if len(sys.argv) == 1:
+    parser.print_help()
+    sys.exit(1)
+  return vars(parser.parse_args())
+
+
+def _PicksToString(week, expected_wins, pick_sequence, values,
+                   upper_bound=None):
+  """Formats results like build/choose-picks and build/compare-picks.
+
+  upper_bound is given for approximate picks, as with the beam engine.
+  """
+  if upper_bound is None:
+    lines = ['Optimal expected wins: %g.' % expected_wins,
+             'Optimal pick sequence:']
+  else:
+    lines = ['Approximate expected wins: %g.' % expected_wins,
+             'Upper bound on optimal expected wins: %g.' % upper_bound,
+             'Pick sequence:']
+  for i, team in enumerate(pick_sequence):
+    lines.append('  Week %d: %s' % (week + i, util.TEAM_ABBREVIATIONS[team]))
+  lines.append('Comparing different picks for the current week:')
+  candidates = [(value, team)
+                for team, value in zip(util.TEAM_ABBREVIATIONS, values)
+                if value == value]  # Skip NaN, i.e. teams that can't be picked
+  # Sort by value, keeping teams with equal values in alphabetical order.
+  candidates.sort(key=lambda candidate: -candidate[0])
+  for value, team in candidates:
+    lines.append('  %s: %g' % (team, value))
+  if upper_bound is not None:
+    lines.append('Upper bound on optimal expected wins: %g.' % upper_bound)
+  return '\n'.join(lines)
+
+
+def MakePicks(year, week, used_teams, predictions_file=None,
+              binary_predictions_file=None, approximate=False):
+  """Prints the optimal picks for the given week to stdout.
+
+  With approximate, also prints an upper bound on the optimal expected wins,
+  for engines whose picks may not be optimal.
+  """
+  predictions = schedule.GetSchedulePredictionMatrix(year, week)
+  used_teams = [team for team in used_teams.split(',') if team]
+  if predictions_file:
+    with open(predictions_file, 'w') as f:
+      print >> f, schedule.SchedulePredictionsToString(predictions)
+  if binary_predictions_file:
+    prediction_files.WriteBinaryPredictions(binary_predictions_file,
+                                            predictions, week, used_teams)
+  matrix = picks.PicksMatrix(predictions, used_teams)
+  expected_wins, pick_sequence = picks.ChoosePicks(matrix)
+  upper_bound = picks.UpperBound(matrix) if approximate else None
+  print _PicksToString(week, expected_wins, pick_sequence,
+                       picks.ComparePicks(matrix), upper_bound)
+
+
+if __name__ == '__main__':
+  args = _ReadArgs()
+  table.OFFLINE = args.pop('offline')
+  if args.pop('profile'):
+    profiling.Enable()
+  engine = args.pop('engine')
+  picks.SetEngine(engine)
+  picks.SetBeam(args.pop('beam_width'), args.pop('beam_top_k'))
+  MakePicks(approximate=engine == picks.ENGINE_BEAM, **args)
+  if profiling.IsEnabled():
+    profiling.PrintReport()
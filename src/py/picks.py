@@ -0,0 +1,341 @@
+"""Python interface to the C pick optimizer in src/c/picks.c.
+
+The optimizer is loaded from build/libpicks.so, which is built by running make
+at the top of the repository.  Prediction matrices are passed to C without
+copying, so the optimizer can be called cheaply in loops.
+"""
+import ctypes
+import numpy
+import os
+
+import profiling
+import util
+
+# Path to the shared library built from src/c.
+LIBRARY_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                            os.pardir, os.pardir, 'build', 'libpicks.so')
+
+_FLOAT_MATRIX = numpy.ctypeslib.ndpointer(dtype=numpy.float32,
+                                          flags='C_CONTIGUOUS')
+_INT_ARRAY = numpy.ctypeslib.ndpointer(dtype=numpy.intc, flags='C_CONTIGUOUS')
+_COUNTER_ARRAY = numpy.ctypeslib.ndpointer(dtype=numpy.uint64,
+                                           flags='C_CONTIGUOUS')
+
+# Names of the counters kept by the C library while profiling, in the order
+# of PICKS_COUNTER_* in src/c/picks.h.
+_COUNTER_NAMES = ['picks.dp_layers', 'picks.dp_states', 'picks.pruned_teams',
+                  'picks.beam_states', 'picks.kbest_paths']
+
+# Algorithms the optimizer can use; see picks_set_engine() in src/c/picks.c.
+ENGINE_DP = 'dp'  # Exact DP over sets of weeks; exponential in weeks.
+ENGINE_ASSIGNMENT = 'assignment'  # Hungarian algorithm; polynomial.
+ENGINE_BEAM = 'beam'  # Approximate beam search; see SetBeam().
+ENGINES = [ENGINE_DP, ENGINE_ASSIGNMENT, ENGINE_BEAM]
+
+# Defaults of SetBeam(), as in src/c/picks.h.
+DEFAULT_BEAM_WIDTH = 256
+DEFAULT_BEAM_TOP_K = 4
+
+# Most weeks the optimizer accepts, PREDICTIONS_MAX_WEEKS in
+# src/c/predictions.h.
+MAX_WEEKS = 24
+
+_library = None
+
+def _Library():
+  """Loads the shared library on first use."""
+  global _library
+  if _library is None:
+    library = ctypes.CDLL(LIBRARY_PATH)
+    library.picks_solve.argtypes = [ctypes.c_int, _FLOAT_MATRIX, _INT_ARRAY]
+    library.picks_solve.restype = ctypes.c_float
+    library.picks_compare_matrix.argtypes = [ctypes.c_int, _FLOAT_MATRIX,
+                                             _FLOAT_MATRIX]
+    library.picks_compare_matrix.restype = None
+    library.picks_set_memory_budget.argtypes = [ctypes.c_size_t]
+    library.picks_set_memory_budget.restype = None
+    library.picks_set_engine.argtypes = [ctypes.c_int]
+    library.picks_set_engine.restype = None
+    library.picks_engine_from_name.argtypes = [ctypes.c_char_p]
+    library.picks_engine_from_name.restype = ctypes.c_int
+    library.picks_set_beam_width.argtypes = [ctypes.c_int]
+    library.picks_set_beam_width.restype = None
+    library.picks_set_beam_top_k.argtypes = [ctypes.c_int]
+    library.picks_set_beam_top_k.restype = None
+    library.picks_upper_bound_matrix.argtypes = [ctypes.c_int, _FLOAT_MATRIX]
+    library.picks_upper_bound_matrix.restype = ctypes.c_float
+    library.picks_what_if_new_matrix.argtypes = [ctypes.c_int, _FLOAT_MATRIX]
+    library.picks_what_if_new_matrix.restype = ctypes.c_void_p
+    library.picks_what_if_edit.argtypes = [ctypes.c_void_p, ctypes.c_int,
+                                           ctypes.c_int, ctypes.c_float]
+    library.picks_what_if_edit.restype = None
+    library.picks_what_if_opt.argtypes = [ctypes.c_void_p, _INT_ARRAY]
+    library.picks_what_if_opt.restype = ctypes.c_float
+    library.picks_what_if_candidate_values.argtypes = [ctypes.c_void_p,
+                                                       _FLOAT_MATRIX]
+    library.picks_what_if_candidate_values.restype = None
+    library.picks_what_if_free.argtypes = [ctypes.c_void_p]
+    library.picks_what_if_free.restype = None
+    library.picks_kbest_new_matrix.argtypes = [ctypes.c_int, _FLOAT_MATRIX,
+                                               ctypes.c_int]
+    library.picks_kbest_new_matrix.restype = ctypes.c_void_p
+    library.picks_kbest_next.argtypes = [ctypes.c_void_p,
+                                         ctypes.POINTER(ctypes.c_float),
+                                         _INT_ARRAY]
+    library.picks_kbest_next.restype = ctypes.c_int
+    library.picks_kbest_free.argtypes = [ctypes.c_void_p]
+    library.picks_kbest_free.restype = None
+    library.picks_set_profiling.argtypes = [ctypes.c_int]
+    library.picks_set_profiling.restype = None
+    library.picks_take_counters.argtypes = [_COUNTER_ARRAY]
+    library.picks_take_counters.restype = None
+    _library = library
+  return _library
+
+
+def _Call(stage, function, *args):
+  """Calls into the library, recording the time and counters if profiling."""
+  if not profiling.IsEnabled():
+    return function(*args)
+  library = _Library()
+  library.picks_set_profiling(1)
+  with profiling.Stage(stage):
+    result = function(*args)
+  counters = numpy.zeros(len(_COUNTER_NAMES), dtype=numpy.uint64)
+  library.picks_take_counters(counters)
+  for name, value in zip(_COUNTER_NAMES, counters):
+    profiling.Count(name, int(value))
+  return result
+
+
+def _NumWeeks(matrix):
+  """Returns the number of weeks of a matrix from PicksMatrix().
+
+  Raises:
+    ValueError: if there are more than MAX_WEEKS.
+  """
+  num_weeks = matrix.shape[1]
+  if num_weeks > MAX_WEEKS:
+    raise ValueError('The optimizer handles at most %d weeks, not %d' %
+                     (MAX_WEEKS, num_weeks))
+  return num_weeks
+
+
+def SetMemoryBudget(num_bytes):
+  """Limits the memory used by the DP tables of each solve.
+
+  Solves that would need more memory trade some extra time for less memory,
+  rather than failing.  The default is PICKS_DEFAULT_MEMORY_BUDGET in
+  src/c/picks.h.
+  """
+  _Library().picks_set_memory_budget(num_bytes)
+
+
+def SetEngine(engine):
+  """Sets the algorithm used by ChoosePicks() and ComparePicks().
+
+  Args:
+    engine: One of ENGINES.  ENGINE_DP and ENGINE_ASSIGNMENT give the same
+        answers, up to rounding and ties; ENGINE_ASSIGNMENT is much faster for
+        many weeks.  ENGINE_BEAM is fast too, but its picks may be worse than
+        optimal, by at most UpperBound() minus their expected wins.
+  Raises:
+    ValueError: if engine is unknown.
+  """
+  library = _Library()
+  engine_id = library.picks_engine_from_name(engine)
+  if engine_id < 0:
+    raise ValueError('Unrecognized engine "%s"' % engine)
+  library.picks_set_engine(engine_id)
+
+
+def SetBeam(width=DEFAULT_BEAM_WIDTH, top_k=DEFAULT_BEAM_TOP_K):
+  """Sets the limits of ENGINE_BEAM.
+
+  Args:
+    width: Number of partial pick sequences kept after each week.
+    top_k: Number of the best unused teams tried each week for each partial
+        sequence.  Time grows linearly with both.
+  """
+  library = _Library()
+  library.picks_set_beam_width(width)
+  library.picks_set_beam_top_k(top_k)
+
+
+def PicksMatrix(predictions, teams_to_avoid=()):
+  """Converts a prediction matrix into the form the optimizer expects.
+
+  The result can be passed to ChoosePicks() and ComparePicks() any number of
+  times without being copied again.
+
+  Args:
+    predictions: Output of schedule.GetSchedulePredictionMatrix().
+    teams_to_avoid: Abbreviations of teams that must not be picked, e.g.
+        because they have been used already.
+  Returns:
+    A C-contiguous float32 array of the same shape, with bye weeks set to 0
+    and the rows of teams_to_avoid set to -Inf.
+  """
+  matrix = numpy.nan_to_num(numpy.asarray(predictions, dtype=numpy.float32))
+  for team in teams_to_avoid:
+    matrix[util.GetTeamIndex(team)] = -numpy.inf
+  return numpy.ascontiguousarray(matrix)
+
+
+def ChoosePicks(matrix):
+  """Finds the pick sequence that maximizes expected wins.
+
+  Args:
+    matrix: Output of PicksMatrix().
+  Returns:
+    A (expected_wins, pick_sequence) pair, where pick_sequence[i] is the index
+    of the team to pick i weeks from now.
+  Raises:
+    ValueError: if matrix has more than MAX_WEEKS weeks.
+  """
+  num_weeks = _NumWeeks(matrix)
+  pick_sequence = numpy.zeros(num_weeks, dtype=numpy.intc)
+  expected_wins = _Call('picks.solve', _Library().picks_solve, num_weeks,
+                        matrix, pick_sequence)
+  return expected_wins, pick_sequence
+
+
+def BestPickSequences(matrix, k):
+  """Generates the k best pick sequences, in decreasing order of expected wins.
+
+  Sequences are found lazily, one per iteration, each at a small fraction of
+  the cost of ChoosePicks().  Fewer are generated if there are fewer than k
+  possible sequences.
+
+  Args:
+    matrix: Output of PicksMatrix().
+    k: Maximum number of sequences to generate.
+  Yields:
+    (expected_wins, pick_sequence) pairs, as returned by ChoosePicks().
+  Raises:
+    ValueError: if matrix has more than MAX_WEEKS weeks.
+    MemoryError: if the DP table does not fit in the memory budget; see
+        SetMemoryBudget().
+  """
+  # Checked here rather than in the generator, so errors are raised at once.
+  return _BestPickSequences(matrix, _NumWeeks(matrix), k)
+
+
+def _BestPickSequences(matrix, num_weeks, k):
+  """Generates the sequences for BestPickSequences()."""
+  library = _Library()
+  state = _Call('picks.solve', library.picks_kbest_new_matrix, num_weeks,
+                matrix, k)
+  if not state:
+    raise MemoryError('The DP table for %d weeks does not fit in the memory '
+                      'budget' % num_weeks)
+  try:
+    expected_wins = ctypes.c_float()
+    while True:
+      pick_sequence = numpy.zeros(num_weeks, dtype=numpy.intc)
+      if not _Call('picks.solve', library.picks_kbest_next, state,
+                   ctypes.byref(expected_wins), pick_sequence):
+        return
+      yield expected_wins.value, pick_sequence
+  finally:
+    library.picks_kbest_free(state)
+
+
+def UpperBound(matrix):
+  """Returns an upper bound on the expected wins of any picks.
+
+  The bound is the sum over weeks of the best win probability that week, so
+  picks from ENGINE_BEAM are within its difference from their expected wins of
+  the optimum.
+
+  Args:
+    matrix: Output of PicksMatrix().
+  Raises:
+    ValueError: if matrix has more than MAX_WEEKS weeks.
+  """
+  return _Library().picks_upper_bound_matrix(_NumWeeks(matrix), matrix)
+
+
+def ComparePicks(matrix):
+  """Computes the value of each possible pick for the current week.
+
+  Args:
+    matrix: Output of PicksMatrix().
+  Returns:
+    A float32 array where entry i is the optimal expected wins if team i is
+    picked this week, or NaN if team i cannot be picked.
+  Raises:
+    ValueError: if matrix has more than MAX_WEEKS weeks.
+  """
+  values = numpy.zeros(util.NUM_TEAMS, dtype=numpy.float32)
+  _Call('picks.compare', _Library().picks_compare_matrix, _NumWeeks(matrix),
+        matrix, values)
+  return values
+
+
+class WhatIf(object):
+  """Re-optimizes picks after edits to a few predictions.
+
+  Keeps the optimizer's DP state between edits, so that each query only
+  rebuilds the parts of it for the teams that were edited:
+
+    what_if = picks.WhatIf(picks.PicksMatrix(predictions, used_teams))
+    expected_wins, pick_sequence, values = what_if.Edit([('NE', 2, 0.6)])
+
+  Answers are those of ChoosePicks() and ComparePicks() with ENGINE_DP, up to
+  rounding and ties.
+  """
+
+  def __init__(self, matrix):
+    """Copies the output of PicksMatrix(), which is not changed by edits.
+
+    Raises:
+      ValueError: if matrix has more than MAX_WEEKS weeks.
+    """
+    self._num_weeks = _NumWeeks(matrix)
+    # Teams that cannot be picked at all, e.g. because they were used.
+    self._used_teams = set(numpy.nonzero(
+        (matrix == -numpy.inf).all(axis=1))[0])
+    self._state = _Library().picks_what_if_new_matrix(self._num_weeks, matrix)
+
+  def __del__(self):
+    if getattr(self, '_state', None):
+      _Library().picks_what_if_free(self._state)
+      self._state = None
+
+  def Edit(self, edits):
+    """Edits win probabilities, and re-optimizes the picks.
+
+    Edits accumulate: each applies to the predictions as edited so far.  All
+    edits are checked before any is applied, so a bad edit changes nothing.
+
+    Args:
+      edits: List of (team, week, probability) tuples, where team is an
+          abbreviation and week counts from 0 for the current week.
+    Returns:
+      A (expected_wins, pick_sequence, values) tuple, as returned by
+      ChoosePicks() followed by ComparePicks() on the edited predictions.
+    Raises:
+      ValueError: if a team or week is unknown, a team cannot be picked at all
+          (its row of the matrix is -Inf), or a probability is not in [0, 1].
+    """
+    library = _Library()
+    checked = []
+    for team, week, probability in edits:
+      index = util.GetTeamIndex(team)
+      if index in self._used_teams:
+        raise ValueError('%s cannot be picked, so cannot be edited' % team)
+      if not 0 <= week < self._num_weeks:
+        raise ValueError('Week %d is not in the predictions' % week)
+      if not 0 <= probability <= 1:
+        raise ValueError('Probability %r is not in [0, 1]' % probability)
+      checked.append((index, week, probability))
+    for index, week, probability in checked:
+      library.picks_what_if_edit(self._state, index, week, probability)
+    pick_sequence = numpy.zeros(self._num_weeks, dtype=numpy.intc)
+    expected_wins = _Call('picks.what_if', library.picks_what_if_opt,
+                          self._state, pick_sequence)
+    values = numpy.zeros(util.NUM_TEAMS, dtype=numpy.float32)
+    _Call('picks.what_if', library.picks_what_if_candidate_values,
+          self._state, values)
+    return expected_wins, pick_sequence, values
@@ -0,0 +1,159 @@
+import numpy
+import os
+import unittest
+
+import picks
+import util
+
+@unittest.skipUnless(os.path.exists(picks.LIBRARY_PATH),
+                     'Run make to build the pick optimizer')
+class TestPicksFunctions(unittest.TestCase):
+
+  def setUp(self):
+    # Same as src/c/testdata/test_predictions.txt; other teams never win.
+    self.predictions = numpy.zeros((util.NUM_TEAMS, 3))
+    self.predictions[:4] = [[0.8, 0.95, 0.9],
+                            [0.5, 0.9, 0.1],
+                            [0.2, 0.1, 0.1],
+                            [0.2, 0.3, 0.5]]
+
+  def testChoosePicks(self):
+    matrix = picks.PicksMatrix(self.predictions)
+    expected_wins, pick_sequence = picks.ChoosePicks(matrix)
+    self.assertAlmostEqual(2.2, expected_wins, places=6)
+    self.assertEqual([0, 1, 3], list(pick_sequence))
+
+  def testComparePicks(self):
+    matrix = picks.PicksMatrix(self.predictions, ['ARI'])
+    values = picks.ComparePicks(matrix)
+    self.assertTrue(numpy.isnan(values[0]))
+    self.assertAlmostEqual(1.1, values[1], places=6)  # 0.5 + 0.3 + 0.5
+    self.assertAlmostEqual(1.6, values[2], places=6)
+    self.assertAlmostEqual(1.2, values[3], places=6)
+
+  def testMemoryBudget(self):
+    # A full 18-week season, solved within a budget smaller than its DP table.
+    matrix = picks.PicksMatrix(
+        numpy.random.RandomState(0).random_sample((util.NUM_TEAMS, 18)))
+    expected_wins, pick_sequence = picks.ChoosePicks(matrix)
+    picks.SetMemoryBudget(2 << 20)
+    try:
+      bounded_wins, bounded_sequence = picks.ChoosePicks(matrix)
+    finally:
+      picks.SetMemoryBudget(256 << 20)
+    self.assertAlmostEqual(expected_wins, bounded_wins, places=4)
+    self.assertEqual(18, len(set(bounded_sequence)))
+    self.assertAlmostEqual(
+        bounded_wins, matrix[bounded_sequence, numpy.arange(18)].sum(),
+        places=4)
+
+  def testEngines(self):
+    matrix = picks.PicksMatrix(
+        numpy.random.RandomState(1).random_sample((util.NUM_TEAMS, 12)),
+        ['ARI'])
+    expected_wins, expected_sequence = picks.ChoosePicks(matrix)
+    expected_values = picks.ComparePicks(matrix)
+    picks.SetEngine(picks.ENGINE_ASSIGNMENT)
+    try:
+      expected_wins_assignment, sequence = picks.ChoosePicks(matrix)
+      values = picks.ComparePicks(matrix)
+    finally:
+      picks.SetEngine(picks.ENGINE_DP)
+    self.assertAlmostEqual(expected_wins, expected_wins_assignment, places=5)
+    self.assertEqual(list(expected_sequence), list(sequence))
+    numpy.testing.assert_allclose(expected_values, values, atol=1e-5)
+    self.assertRaises(ValueError, picks.SetEngine, 'simplex')
+
+  def testBeamEngine(self):
+    matrix = picks.PicksMatrix(
+        numpy.random.RandomState(2).random_sample((util.NUM_TEAMS, 18)),
+        ['ARI'])
+    picks.SetEngine(picks.ENGINE_ASSIGNMENT)
+    try:
+      optimal_wins, _ = picks.ChoosePicks(matrix)
+      optimal_values = picks.ComparePicks(matrix)
+      picks.SetEngine(picks.ENGINE_BEAM)
+      expected_wins, pick_sequence = picks.ChoosePicks(matrix)
+      values = picks.ComparePicks(matrix)
+      picks.SetBeam(width=1, top_k=1)
+      greedy_wins, greedy_sequence = picks.ChoosePicks(matrix)
+    finally:
+      picks.SetBeam()
+      picks.SetEngine(picks.ENGINE_DP)
+    upper_bound = picks.UpperBound(matrix)
+    self.assertLessEqual(expected_wins, optimal_wins + 1e-4)
+    self.assertLessEqual(optimal_wins, upper_bound + 1e-4)
+    self.assertEqual(18, len(set(pick_sequence)))
+    self.assertAlmostEqual(
+        expected_wins, matrix[pick_sequence, numpy.arange(18)].sum(), places=4)
+    self.assertTrue(numpy.isnan(values[0]))
+    self.assertTrue(numpy.all(values[1:] <= optimal_values[1:] + 1e-4))
+    # Greedy picks take the best unused team each week.
+    self.assertEqual(numpy.argmax(matrix[:, 0]), greedy_sequence[0])
+    self.assertLessEqual(greedy_wins, optimal_wins + 1e-4)
+
+  def testWhatIf(self):
+    predictions = numpy.random.RandomState(3).random_sample(
+        (util.NUM_TEAMS, 10))
+    what_if = picks.WhatIf(picks.PicksMatrix(predictions, ['ARI']))
+    for edits in [[], [('NE', 0, 0.99)], [('NE', 3, 0.2), ('DEN', 1, 0.95)],
+                  [('NE', 0, 0.1)]]:
+      for team, week, probability in edits:
+        predictions[util.GetTeamIndex(team), week] = probability
+      matrix = picks.PicksMatrix(predictions, ['ARI'])
+      expected_wins, expected_sequence = picks.ChoosePicks(matrix)
+      expected_values = picks.ComparePicks(matrix)
+      wins, pick_sequence, values = what_if.Edit(edits)
+      self.assertAlmostEqual(expected_wins, wins, places=5)
+      self.assertEqual(list(expected_sequence), list(pick_sequence))
+      numpy.testing.assert_allclose(expected_values, values, atol=1e-5)
+    self.assertRaises(ValueError, what_if.Edit, [('XYZ', 0, 0.5)])
+    self.assertRaises(ValueError, what_if.Edit, [('NE', 10, 0.5)])
+    self.assertRaises(ValueError, what_if.Edit, [('NE', 0, float('nan'))])
+    self.assertRaises(ValueError, what_if.Edit, [('ARI', 0, 0.99)])
+    # A bad edit leaves the earlier ones in the same list unapplied.
+    self.assertRaises(ValueError, what_if.Edit,
+                      [('DEN', 0, 0.99), ('NE', 10, 0.5)])
+    self.assertAlmostEqual(expected_wins, what_if.Edit([])[0], places=5)
+
+  def testBestPickSequences(self):
+    matrix = picks.PicksMatrix(self.predictions)
+    sequences = list(picks.BestPickSequences(matrix, 5))
+    self.assertEqual(5, len(sequences))
+    self.assertAlmostEqual(2.2, sequences[0][0], places=6)
+    self.assertEqual([0, 1, 3], list(sequences[0][1]))
+    # 0.2 + 0.9 + 0.9, with BAL or BUF first and then ATL and ARI.
+    self.assertAlmostEqual(2.0, sequences[1][0], places=6)
+    self.assertAlmostEqual(2.0, sequences[2][0], places=6)
+    for expected_wins, pick_sequence in sequences:
+      self.assertEqual(3, len(set(pick_sequence)))
+      self.assertAlmostEqual(
+          expected_wins, matrix[pick_sequence, numpy.arange(3)].sum(),
+          places=6)
+    wins = [expected_wins for expected_wins, _ in sequences]
+    self.assertEqual(sorted(wins, reverse=True), wins)
+
+    # Only ARI and ATL can be picked, in either order.
+    matrix = picks.PicksMatrix(self.predictions[:, :2],
+                               util.TEAM_ABBREVIATIONS[2:])
+    self.assertEqual(2, len(list(picks.BestPickSequences(matrix, 10))))
+
+  def testTooManyWeeks(self):
+    matrix = picks.PicksMatrix(numpy.full((util.NUM_TEAMS, picks.MAX_WEEKS + 1),
+                                          0.5))
+    for function in [picks.ChoosePicks, picks.ComparePicks, picks.UpperBound,
+                     picks.WhatIf, lambda m: picks.BestPickSequences(m, 2)]:
+      self.assertRaises(ValueError, function, matrix)
+
+  def testPicksMatrix(self):
+    predictions = numpy.full((util.NUM_TEAMS, 2), 0.5)
+    predictions[1, 1] = numpy.nan
+    matrix = picks.PicksMatrix(predictions, ['ARI'])
+    self.assertEqual(numpy.float32, matrix.dtype)
+    self.assertTrue(matrix.flags['C_CONTIGUOUS'])
+    self.assertEqual(0, matrix[1, 1])
+    self.assertTrue(numpy.isneginf(matrix[0]).all())
+
+
+if __name__ == '__main__':
+  unittest.main()
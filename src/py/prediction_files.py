@@ -0,0 +1,198 @@
+"""Reads and writes files of game outcome predictions.
+
+Predictions are handed to the pick optimizer in one of two formats:
+
+Text, as written by schedule.SchedulePredictionsToString(): one line per team,
+with the team abbreviation followed by its winning probability in each
+upcoming week, or 0 for a bye week.
+
+Binary, laid out so that readers can memory-map it and use it without parsing.
+All integers are little-endian uint32.
+  - A header, HEADER_FORMAT: MAGIC, VERSION, number of teams, first week,
+    number of weeks, bytes per probability (4 or 8), offset of the probability
+    matrix and offset of the status matrix.
+  - The team abbreviations, TEAM_CODE_SIZE bytes each, padded with NULs.
+  - The probability matrix: teams x weeks, row-major, little-endian float32 or
+    float64.  Bye weeks hold 0.  Used teams keep their probabilities, so
+    readers that do not care which teams are used can ignore the status.
+  - The status matrix: teams x weeks uint8, holding STATUS_GAME, STATUS_BYE or
+    STATUS_USED.
+Both matrices start at a multiple of 8 bytes.  See also src/c/predictions.h.
+"""
+import argparse
+import numpy
+import struct
+import sys
+
+import schedule
+import util
+
+MAGIC = 'NFLP'
+VERSION = 1
+HEADER_FORMAT = '<4s7I'
+TEAM_CODE_SIZE = 4
+
+# Values of the status matrix.
+STATUS_GAME = 0
+STATUS_BYE = 1
+STATUS_USED = 2
+
+_DTYPES = {4: numpy.dtype('<f4'), 8: numpy.dtype('<f8')}
+
+def _ReadArgs():
+  parser = argparse.ArgumentParser(description='Export a binary predictions '
+                                   'file as text.  Prints results to stdout.')
+  parser.add_argument('filename', help='Binary predictions file')
+  if len(sys.argv) == 1:
+    parser.print_help()
+    sys.exit(1)
+  return vars(parser.parse_args())
+
+
+def _Align(offset):
+  """Rounds offset up to a multiple of 8."""
+  return (offset + 7) // 8 * 8
+
+
+class PredictionsFile(object):
+  """A memory-mapped binary predictions file.
+
+  Attributes:
+    teams: Team abbreviations, one per row.
+    first_week: The week of the first column.
+    probabilities: teams x weeks array of winning probabilities, mapped
+        read-only from the file.  Bye weeks are 0.
+    status: teams x weeks array of STATUS_GAME, STATUS_BYE or STATUS_USED,
+        mapped read-only from the file.
+  """
+
+  def __init__(self, filename):
+    with open(filename, 'rb') as f:
+      header = f.read(struct.calcsize(HEADER_FORMAT))
+    if len(header) < struct.calcsize(HEADER_FORMAT):
+      raise ValueError('%s is too short to be a predictions file' % filename)
+    (magic, version, num_teams, first_week, num_weeks, value_size,
+     probabilities_offset, status_offset) = struct.unpack(HEADER_FORMAT, header)
+    if magic != MAGIC:
+      raise ValueError('%s is not a binary predictions file' % filename)
+    if version != VERSION:
+      raise ValueError('%s has unsupported version %d' % (filename, version))
+    if value_size not in _DTYPES:
+      raise ValueError('%s has unsupported value size %d' %
+                       (filename, value_size))
+    codes = numpy.memmap(filename, dtype='S%d' % TEAM_CODE_SIZE, mode='r',
+                         offset=struct.calcsize(HEADER_FORMAT),
+                         shape=(num_teams,))
+    self.teams = [code.rstrip('\0') for code in codes]
+    self.first_week = first_week
+    self.probabilities = numpy.memmap(
+        filename, dtype=_DTYPES[value_size], mode='r',
+        offset=probabilities_offset, shape=(num_teams, num_weeks))
+    self.status = numpy.memmap(filename, dtype=numpy.uint8, mode='r',
+                               offset=status_offset,
+                               shape=(num_teams, num_weeks))
+
+  def PredictionMatrix(self, mask_used=False):
+    """Returns the predictions like schedule.GetSchedulePredictionMatrix().
+
+    Rows are reordered to follow util.TEAM_ABBREVIATIONS and bye weeks are
+    schedule.BYE_WEEK.  Used teams keep their probabilities, unless mask_used
+    is set, in which case their rows are -Inf as in picks.PicksMatrix().
+    """
+    rows = [self.teams.index(team) for team in util.TEAM_ABBREVIATIONS]
+    predictions = numpy.array(self.probabilities[rows], dtype=numpy.float64)
+    status = self.status[rows]
+    predictions[status == STATUS_BYE] = schedule.BYE_WEEK
+    if mask_used:
+      predictions[(status == STATUS_USED).any(axis=1)] = -numpy.inf
+    return predictions
+
+  def UsedTeams(self):
+    """Returns the abbreviations of teams marked as used."""
+    return [team for team, row in zip(self.teams, self.status)
+            if (row == STATUS_USED).any()]
+
+
+def WriteBinaryPredictions(filename, predictions, first_week, used_teams=(),
+                           dtype=numpy.float32):
+  """Writes predictions to a binary predictions file.
+
+  Args:
+    filename: Name of the file to write.
+    predictions: Output of schedule.GetSchedulePredictionMatrix().
+    first_week: The week of the first column of predictions.
+    used_teams: Abbreviations of teams to mark as used, in the status matrix
+        only.
+    dtype: numpy.float32 or numpy.float64.
+  """
+  num_teams, num_weeks = predictions.shape
+  dtype = numpy.dtype(dtype).newbyteorder('<')
+  status = numpy.where(numpy.isnan(predictions), STATUS_BYE,
+                       STATUS_GAME).astype(numpy.uint8)
+  probabilities = numpy.nan_to_num(predictions).astype(dtype)
+  for team in used_teams:
+    status[util.GetTeamIndex(team)] = STATUS_USED
+
+  header_size = struct.calcsize(HEADER_FORMAT)
+  probabilities_offset = _Align(header_size + num_teams * TEAM_CODE_SIZE)
+  status_offset = _Align(probabilities_offset + probabilities.nbytes)
+  with open(filename, 'wb') as f:
+    f.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, num_teams, first_week,
+                        num_weeks, dtype.itemsize, probabilities_offset,
+                        status_offset))
+    for team in util.TEAM_ABBREVIATIONS:
+      f.write(team.ljust(TEAM_CODE_SIZE, '\0'))
+    f.write('\0' * (probabilities_offset - f.tell()))
+    f.write(probabilities.tostring())
+    f.write('\0' * (status_offset - f.tell()))
+    f.write(status.tostring())
+
+
+def IsBinaryPredictionsFile(filename):
+  """Returns whether filename starts like a binary predictions file."""
+  with open(filename, 'rb') as f:
+    return f.read(len(MAGIC)) == MAGIC
+
+
+def ReadTextPredictions(filename):
+  """Reads a file written by schedule.py into a prediction matrix.
+
+  Returns:
+    A util.NUM_TEAMS x (number of weeks) array, like
+    schedule.GetSchedulePredictionMatrix().  Bye weeks, which are written as 0,
+    are read back as NaN.
+  """
+  rows = {}
+  with open(filename) as f:
+    for line in f:
+      tokens = line.split()
+      if tokens:
+        rows[tokens[0]] = [float(x) for x in tokens[1:]]
+  predictions = numpy.array([rows[team] for team in util.TEAM_ABBREVIATIONS])
+  predictions[predictions == 0] = schedule.BYE_WEEK
+  return predictions
+
+
+def ReadPredictions(filename):
+  """Reads a predictions file in either format.
+
+  Returns:
+    A (predictions, first_week) pair, where predictions is like the output of
+    schedule.GetSchedulePredictionMatrix(), with the probabilities of used
+    teams too.  first_week is None for text files, which do not record it.
+  """
+  if IsBinaryPredictionsFile(filename):
+    predictions_file = PredictionsFile(filename)
+    return predictions_file.PredictionMatrix(), predictions_file.first_week
+  return ReadTextPredictions(filename), None
+
+
+def _PrintTextPredictions(filename):
+  """Prints a binary predictions file in the text format."""
+  print schedule.SchedulePredictionsToString(
+      PredictionsFile(filename).PredictionMatrix())
+
+
+if __name__ == '__main__':
+  args = _ReadArgs()
+  _PrintTextPredictions(**args)
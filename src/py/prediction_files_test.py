@@ -0,0 +1,64 @@
+import numpy
+import os
+import shutil
+import tempfile
+import unittest
+
+import prediction_files
+import schedule
+import util
+
+class TestPredictionFilesFunctions(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.predictions = numpy.random.RandomState(0).random_sample(
+        (util.NUM_TEAMS, 5))
+    self.predictions[3, 2] = schedule.BYE_WEEK
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def testBinaryRoundTrip(self):
+    filename = os.path.join(self.directory, 'predictions.bin')
+    prediction_files.WriteBinaryPredictions(filename, self.predictions, 14,
+                                            dtype=numpy.float64)
+    self.assertTrue(prediction_files.IsBinaryPredictionsFile(filename))
+    predictions, first_week = prediction_files.ReadPredictions(filename)
+    self.assertEqual(14, first_week)
+    # float64 files keep full precision.
+    self.assertTrue(numpy.allclose(self.predictions, predictions, rtol=0,
+                                   atol=0, equal_nan=True))
+
+  def testBinaryMarkers(self):
+    filename = os.path.join(self.directory, 'predictions.bin')
+    prediction_files.WriteBinaryPredictions(filename, self.predictions, 1,
+                                            used_teams=['DEN'])
+    predictions_file = prediction_files.PredictionsFile(filename)
+    self.assertEqual(util.TEAM_ABBREVIATIONS, predictions_file.teams)
+    self.assertEqual(numpy.float32, predictions_file.probabilities.dtype)
+    self.assertEqual(0, predictions_file.probabilities[3, 2])
+    self.assertEqual(prediction_files.STATUS_BYE, predictions_file.status[3, 2])
+    self.assertEqual(['DEN'], predictions_file.UsedTeams())
+    # Used teams keep their probabilities unless they are asked to be masked.
+    den = util.GetTeamIndex('DEN')
+    self.assertTrue(numpy.allclose(self.predictions[den],
+                                   predictions_file.PredictionMatrix()[den]))
+    masked = predictions_file.PredictionMatrix(mask_used=True)
+    self.assertTrue(numpy.isneginf(masked[den]).all())
+    self.assertTrue(numpy.isfinite(masked[util.GetTeamIndex('NE')]).all())
+
+  def testTextFile(self):
+    filename = os.path.join(self.directory, 'predictions.txt')
+    with open(filename, 'w') as f:
+      f.write(schedule.SchedulePredictionsToString(self.predictions))
+    self.assertFalse(prediction_files.IsBinaryPredictionsFile(filename))
+    predictions, first_week = prediction_files.ReadPredictions(filename)
+    self.assertIsNone(first_week)
+    self.assertTrue(numpy.isnan(predictions[3, 2]))
+    self.assertTrue(numpy.allclose(self.predictions, predictions, atol=1e-5,
+                                   equal_nan=True))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,115 @@
+"""Records where a run spends its time.
+
+Code is instrumented with stages, which accumulate wall time, and counters:
+
+  with profiling.Stage('teams.solve'):
+    ...
+  profiling.Count('table.bytes_fetched', len(body))
+
+Nothing is recorded unless Enable() has been called, and disabled calls only
+check a flag, so instrumentation can stay in hot code.  Names are prefixed
+with the module that records them.
+"""
+import collections
+import json
+import sys
+import time
+
+_enabled = False
+
+# Maps stage name to [number of calls, total seconds], in order of first use.
+_stages = collections.OrderedDict()
+
+# Maps counter name to its value.  Values are usually numbers, but may be
+# strings, e.g. a solver status.
+_counters = collections.OrderedDict()
+
+class _Stage(object):
+  """Context manager that adds its wall time to a stage."""
+
+  def __init__(self, name):
+    self.name = name
+
+  def __enter__(self):
+    self.start = time.time()
+
+  def __exit__(self, *exc_info):
+    stage = _stages.setdefault(self.name, [0, 0.0])
+    stage[0] += 1
+    stage[1] += time.time() - self.start
+
+
+class _NullStage(object):
+  """Context manager that does nothing, used while profiling is disabled."""
+
+  def __enter__(self):
+    pass
+
+  def __exit__(self, *exc_info):
+    pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+def Enable():
+  """Starts recording."""
+  global _enabled
+  _enabled = True
+
+
+def Disable():
+  """Stops recording, keeping what was recorded so far."""
+  global _enabled
+  _enabled = False
+
+
+def IsEnabled():
+  """Returns whether stages and counters are being recorded."""
+  return _enabled
+
+
+def Reset():
+  """Forgets everything recorded so far."""
+  _stages.clear()
+  _counters.clear()
+
+
+def Stage(name):
+  """Returns a context manager that adds its wall time to the named stage."""
+  return _Stage(name) if _enabled else _NULL_STAGE
+
+
+def Count(name, amount=1):
+  """Adds amount to the named counter."""
+  if _enabled:
+    _counters[name] = _counters.get(name, 0) + amount
+
+
+def Set(name, value):
+  """Sets the named counter, e.g. to a solver status."""
+  if _enabled:
+    _counters[name] = value
+
+
+def Report():
+  """Returns everything recorded.
+
+  Returns:
+    JSON-like dictionary structured like: {
+        'stages': {'teams.solve': {'calls': n, 'seconds': t}, ...},
+        'counters': {'table.bytes_fetched': b, ...},
+    }
+  """
+  return {
+      'stages': collections.OrderedDict(
+          (name, collections.OrderedDict([('calls', calls),
+                                          ('seconds', seconds)]))
+          for name, (calls, seconds) in _stages.iteritems()),
+      'counters': collections.OrderedDict(_counters)
+  }
+
+
+def PrintReport(f=None):
+  """Writes Report() as JSON to f, by default stderr."""
+  print >> (f or sys.stderr), json.dumps(Report(), indent=2)
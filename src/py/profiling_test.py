@@ -0,0 +1,48 @@
+import numpy
+import os
+import unittest
+
+import picks
+import profiling
+import util
+
+class TestProfilingFunctions(unittest.TestCase):
+
+  def setUp(self):
+    profiling.Reset()
+    self.addCleanup(profiling.Reset)
+    self.addCleanup(profiling.Disable)
+
+  def testDisabled(self):
+    with profiling.Stage('stage'):
+      profiling.Count('counter', 3)
+    self.assertEqual({'stages': {}, 'counters': {}}, profiling.Report())
+
+  def testEnabled(self):
+    profiling.Enable()
+    for _ in range(2):
+      with profiling.Stage('stage'):
+        profiling.Count('counter', 3)
+    profiling.Set('status', 'optimal')
+    report = profiling.Report()
+    self.assertEqual(2, report['stages']['stage']['calls'])
+    self.assertGreaterEqual(report['stages']['stage']['seconds'], 0)
+    self.assertEqual({'counter': 6, 'status': 'optimal'}, report['counters'])
+
+  @unittest.skipUnless(os.path.exists(picks.LIBRARY_PATH),
+                       'Run make to build the pick optimizer')
+  def testPicksCounters(self):
+    profiling.Enable()
+    matrix = picks.PicksMatrix(numpy.full((util.NUM_TEAMS, 3), 0.5))
+    picks.ChoosePicks(matrix)
+    report = profiling.Report()
+    self.assertEqual(1, report['stages']['picks.solve']['calls'])
+    # One layer per team, each with a state per subset of the 3 weeks.
+    self.assertEqual(util.NUM_TEAMS, report['counters']['picks.dp_layers'])
+    self.assertEqual(util.NUM_TEAMS * 8, report['counters']['picks.dp_states'])
+    # With every team tied, none is dominated.
+    self.assertEqual(0, report['counters']['picks.pruned_teams'])
+
+
+if __name__ == '__main__':
+  unittest.main()
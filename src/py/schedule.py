@@ -1,10 +1,13 @@
 """Assigns probabilities to games in a schedule."""
 import argparse
 import collections
+import itertools
 import math
-from scipy import stats
+import numpy
+from scipy import special
 import sys
 
+import profiling
 import table
 import teams
 import util
@@ -16,27 +19,125 @@ def _ReadArgs():
   parser.add_argument('week', type=int,
                       help='The current week.  Represents the week about to be '
                       'played, e.g. week 1 means the season hasn\'t started.')
+  parser.add_argument('--offline', action='store_true',
+                      help='Only use cached pages; never access the network.')
+  parser.add_argument('--profile', action='store_true',
+                      help='Print time spent per stage and other counters to '
+                      'stderr, as JSON.')
   if len(sys.argv) == 1:
     parser.print_help()
     sys.exit(1)
   return vars(parser.parse_args())
 
 
-def _PredictHomeTeamWinningProbability(home_team, away_team, team_strengths):
-  """Predicts probability that home team will win against away team.
+# Marks a week in which a team has no game in a prediction matrix.
+BYE_WEEK = float('nan')
+
+
+def ScheduleToArrays(future_games, week):
+  """Converts a schedule into arrays of team indices.
+
+  Args:
+    future_games: List of FutureGame objects.
+    week: Only keep regular season games in or after this week.
+  Returns:
+    A (home, away, week_offsets) triple of integer arrays with one entry per
+    game.  home and away index into util.TEAM_ABBREVIATIONS, and week_offsets
+    gives the week of the game minus the given week.
+  """
+  home = []
+  away = []
+  week_offsets = []
+  for game in future_games:
+    if not game.week.isdigit() or int(game.week) < week:
+      # Game is from post-season or is from before the current week.
+      continue
+    home.append(util.GetTeamIndex(game.home_team))
+    away.append(util.GetTeamIndex(game.away_team))
+    week_offsets.append(int(game.week) - week)
+  return (numpy.array(home, dtype=numpy.intp),
+          numpy.array(away, dtype=numpy.intp),
+          numpy.array(week_offsets, dtype=numpy.intp))
+
+
+def OpponentMatrix(home, away, week_offsets, num_weeks):
+  """Returns who each team plays in each week.
+
+  Args:
+    home, away, week_offsets: Output of ScheduleToArrays().
+    num_weeks: Number of weeks, starting at the week given to
+        ScheduleToArrays().
+  Returns:
+    A util.NUM_TEAMS x num_weeks integer array with the index of each team's
+    opponent in each week, or -1 in its bye week.
+  """
+  opponents = numpy.full((util.NUM_TEAMS, num_weeks), -1, dtype=numpy.intp)
+  opponents[home, week_offsets] = away
+  opponents[away, week_offsets] = home
+  return opponents
+
+
+def PredictHomeTeamWinningProbabilities(home, away, team_strengths):
+  """Predicts probabilities that home teams will win against away teams.
   
   Args:
-    home_team: The home team
-    away_tema: The away team
+    home: Array of home team indices.
+    away: Array of away team indices, of the same shape as home.
     team_strengths: Output of teams.GetTeamStrengths()
   Returns:
-    Probability that home team will win.
+    Array of the probability that each home team will win.
   """
-  variance = team_strengths['variance']
-  scores = team_strengths['scores']
-  home_field = team_strengths['home_field']
-  return stats.norm.cdf((scores[home_team] - scores[away_team] + home_field) /
-                        math.sqrt(variance))
+  scores = numpy.array([team_strengths['scores'][team]
+                        for team in util.TEAM_ABBREVIATIONS])
+  return WinningProbabilities(scores, team_strengths['home_field'],
+                              team_strengths['variance'], home, away)
+
+
+def WinningProbabilities(scores, home_field, variance, home, away):
+  """Like PredictHomeTeamWinningProbabilities(), on raw model parameters.
+
+  Args:
+    scores: Array of team strengths, in the order of util.TEAM_ABBREVIATIONS.
+    home_field: Home field advantage.
+    variance: Variance of the margin of victory.
+    home: Array of home team indices.
+    away: Array of away team indices, of the same shape as home.
+  Returns:
+    Array of the probability that each home team will win.
+  """
+  # special.ndtr is the standard normal cdf; scipy.stats costs far more to
+  # import.
+  return special.ndtr((scores[home] - scores[away] + home_field) /
+                      math.sqrt(variance))
+
+
+def GetSchedulePredictionMatrix(year, week, team_strengths=None):
+  """Predicts outcomes of games starting at the given week and year.
+  
+  Args:
+    year: The current year.
+    week: Predict games starting in this week.
+    team_strengths: Output of teams.GetTeamStrengths().  If not given, uses
+        teams.GetTeamStrengthsMLE(year, week).
+  Returns:
+    A util.NUM_TEAMS x (util.NumWeeksPerSeason(year) - week + 1) array, where
+    entry [i, j] is the probability that the i-th team in
+    util.TEAM_ABBREVIATIONS wins its game in week (week + j), or BYE_WEEK if
+    it has no game that week.
+  """
+  if team_strengths is None:
+    team_strengths = teams.GetTeamStrengthsMLE(year, week)
+  home, away, week_offsets = ScheduleToArrays(
+      table.FetchFutureGames(year, week), week)
+  profiling.Count('schedule.games_predicted', len(home))
+  with profiling.Stage('schedule.predict'):
+    home_probs = PredictHomeTeamWinningProbabilities(home, away,
+                                                     team_strengths)
+  predictions = numpy.full(
+      (util.NUM_TEAMS, util.NumWeeksPerSeason(year) - week + 1), BYE_WEEK)
+  predictions[home, week_offsets] = home_probs
+  predictions[away, week_offsets] = 1 - home_probs
+  return predictions
 
 
 def GetSchedulePredictions(year, week):
@@ -49,51 +150,46 @@ def GetSchedulePredictions(year, week):
     A dict predictions where predictions[week][team] gives the win probability
     of that team to win in that week.
   """
-  team_strengths = teams.GetTeamStrengthsMLE(year, week)
-
-  future_games = table.FetchFutureGames(year, week)
+  matrix = GetSchedulePredictionMatrix(year, week)
   predictions = collections.defaultdict(lambda: collections.defaultdict(float))
-  for game in future_games:
-    if not game.week.isdigit() or int(game.week) < week:
-      # Game is from post-season or is from before the current week.
-      continue
-    home_prob = _PredictHomeTeamWinningProbability(
-        game.home_team, game.away_team, team_strengths)
-    predictions[game.home_team][game.week] = home_prob
-    predictions[game.away_team][game.week] = 1 - home_prob
+  for team, row in itertools.izip(util.TEAM_ABBREVIATIONS, matrix):
+    for offset, prob in enumerate(row):
+      if not numpy.isnan(prob):
+        predictions[team][str(week + offset)] = prob
   return predictions
 
 
-def _SchedulePredictionsToString(predictions, week):
+def SchedulePredictionsToString(predictions):
   """Creates a string representation of predictions.
 
   Args:
-    predictions: Output of GetSchedulePredictions().  This is a nested dict
-        mapping (team, week) pairs to the probability the given team will win
-        in the given week.
-    week: The week in which predictions start.
+    predictions: Output of GetSchedulePredictionMatrix().
   Returns:
     String with one line per NFL team.
     Each line will have the team abbreviation and n numbers, where n is the
     number of games left in the season.  The i-th number represents the team's
-    winning probability in the i-th upcoming game.  Teams will be in
-    alphabetical order.  Fields are delimited by the space character.
+    winning probability in the i-th upcoming game, or 0 for a bye week.  Teams
+    will be in alphabetical order.  Fields are delimited by the space
+    character.
   """
   lines = []
-  for team in util.TEAM_ABBREVIATIONS:
-    tokens = [team]
-    for cur_week in range(week, util.NUM_WEEKS_PER_SEASON + 1):
-      tokens.append('%g' % predictions[team][str(cur_week)])
-    lines.append(' '.join(tokens))
+  for team, row in itertools.izip(util.TEAM_ABBREVIATIONS,
+                                  numpy.nan_to_num(predictions)):
+    lines.append(' '.join([team] + ['%g' % prob for prob in row]))
   return '\n'.join(lines)
 
 
 def _PrintSchedulePredictions(year, week):
   """Prints out predictions of winning probabilities to stdout."""
-  predictions = GetSchedulePredictions(year, week)
-  print _SchedulePredictionsToString(predictions, week)
+  predictions = GetSchedulePredictionMatrix(year, week)
+  print SchedulePredictionsToString(predictions)
 
 
 if __name__ == '__main__':
   args = _ReadArgs()
+  table.OFFLINE = args.pop('offline')
+  if args.pop('profile'):
+    profiling.Enable()
   _PrintSchedulePredictions(**args)
+  if profiling.IsEnabled():
+    profiling.PrintReport()
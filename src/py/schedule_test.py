@@ -1,8 +1,11 @@
 """Does some basic sanity checks on game outcome predictions."""
+import numpy
 import unittest
 
 import schedule
+import startup_benchmark
 import test_utils
+import util
 
 class TestScheduleFunctions(test_utils.BaseTest):
 
@@ -34,6 +37,22 @@ class TestScheduleFunctions(test_utils.BaseTest):
         self.assertLess(winning_prob, 0.5)
     self.assertEqual(1, num_zero)
 
+  def testSchedulePredictionMatrix(self):
+    predictions = schedule.GetSchedulePredictionMatrix(2014, 2)
+    self.assertEqual((util.NUM_TEAMS, util.NUM_WEEKS_PER_SEASON - 1),
+                     predictions.shape)
+    # Every team has exactly one bye week, and in each week the win
+    # probabilities of the two teams in a game add up to 1.
+    byes = numpy.isnan(predictions)
+    self.assertTrue((byes.sum(axis=1) == 1).all())
+    self.assertTrue(numpy.allclose(
+        numpy.nansum(predictions, axis=0), (~byes).sum(axis=0) / 2.0))
+
+  def testImportsNoSolvers(self):
+    loaded = startup_benchmark.ImportedModules('schedule')
+    for module in startup_benchmark.DEFERRED_MODULES:
+      self.assertNotIn(module, loaded)
+
     
 if __name__ == '__main__':
   unittest.main()
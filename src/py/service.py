@@ -0,0 +1,258 @@
+"""Long-running local service that answers prediction and pick queries.
+
+Keeps team strengths, prediction matrices and solved pick problems in memory,
+so repeated queries skip fetching, parsing, fitting and optimizing.  Cached
+answers only change when new results are ingested, via /ingest.
+
+Queries are HTTP requests to localhost, answered with JSON:
+  GET /strengths?year=2014&week=3
+      Output of teams.GetTeamStrengthsMLE().
+  GET /predictions?year=2014&week=3
+      {'first_week': 3, 'predictions': {'ARI': [p_1, ...], ...}}, with None
+      in bye weeks.
+  GET /sequence?year=2014&week=3&used=DEN,SEA
+      {'expected_wins': w, 'picks': [{'week': 3, 'team': 'NE'}, ...]}
+  GET /compare?year=2014&week=3&used=DEN,SEA
+      {'candidates': [['NE', v_1], ...]}, as in batch_picks.SolveEntry().
+  POST /ingest?year=2014
+      Reloads the games page for the year, from the request body if there is
+      one and otherwise from the network.  If any game results changed,
+      everything computed from the year is dropped.  Returns
+      {'changed': c, 'invalidated': n}.
+Queries are answered concurrently, one thread per connection.
+"""
+import argparse
+import BaseHTTPServer
+import collections
+import json
+import SocketServer
+import sys
+import threading
+import urlparse
+
+import batch_picks
+import schedule
+import table
+import teams
+import util
+
+# Number of values PicksService keeps by default.  Each is at most a few KB,
+# e.g. a prediction matrix or the picks for one set of used teams.
+CACHE_SIZE = 4096
+
+def _ReadArgs():
+  parser = argparse.ArgumentParser(description='Serve predictions and picks '
+                                   'over HTTP on localhost.')
+  parser.add_argument('--port', type=int, default=8123,
+                      help='Port to listen on')
+  parser.add_argument('--cache-size', type=int, default=CACHE_SIZE,
+                      help='Number of answers to keep in memory.  The least '
+                      'recently used ones are dropped first.')
+  parser.add_argument('--offline', action='store_true',
+                      help='Only use cached pages; never access the network.')
+  return vars(parser.parse_args())
+
+
+def _GameResults(games):
+  """Returns what identifies the results of a list of PastGame objects."""
+  return sorted((game.week, game.winning_team, game.losing_team,
+                 game.winning_points, game.losing_points) for game in games)
+
+
+class PicksService(object):
+  """Computes and caches answers to queries.
+
+  Every cached value is keyed by a tuple whose second entry is the year of the
+  season it was computed for.  Team strengths for a year also depend on the
+  previous season, so ingesting a year invalidates that year and the next.
+  Each key is computed at most once at a time; concurrent queries for the same
+  key wait for the first one instead of repeating its work.  At most
+  cache_size values are kept, dropping the least recently used first.
+  """
+
+  def __init__(self, cache_size=CACHE_SIZE):
+    self._lock = threading.Lock()
+    self._cache_size = cache_size
+    # Ordered from least to most recently used.
+    self._cache = collections.OrderedDict()
+    # Locks of the keys being computed.
+    self._key_locks = {}
+    # Incremented by every invalidation, so that values computed from stale
+    # data are not cached.
+    self._generation = 0
+
+  def _Lookup(self, key):
+    """Returns (True, value) if key is cached, else (False, None).
+
+    Must be called with self._lock held.
+    """
+    if key not in self._cache:
+      return False, None
+    # Re-inserting marks the key as the most recently used.
+    value = self._cache.pop(key)
+    self._cache[key] = value
+    return True, value
+
+  def _Cached(self, key, compute):
+    """Returns the cached value for key, computing it if needed."""
+    with self._lock:
+      found, value = self._Lookup(key)
+      if found:
+        return value
+      key_lock = self._key_locks.setdefault(key, threading.Lock())
+    with key_lock:
+      with self._lock:
+        found, value = self._Lookup(key)
+        if found:
+          return value
+        generation = self._generation
+      try:
+        value = compute()
+        with self._lock:
+          if generation == self._generation:
+            self._cache[key] = value
+            while len(self._cache) > self._cache_size:
+              self._cache.popitem(last=False)
+      finally:
+        # Queries already waiting hold on to key_lock; later ones find the
+        # value, or start over if it was not kept.
+        with self._lock:
+          if self._key_locks.get(key) is key_lock:
+            del self._key_locks[key]
+      return value
+
+  def Strengths(self, year, week):
+    """Returns teams.GetTeamStrengthsMLE(year, week)."""
+    return self._Cached(('strengths', year, week),
+                        lambda: teams.GetTeamStrengthsMLE(year, week))
+
+  def Predictions(self, year, week):
+    """Returns schedule.GetSchedulePredictionMatrix(year, week)."""
+    return self._Cached(
+        ('predictions', year, week),
+        lambda: schedule.GetSchedulePredictionMatrix(
+            year, week, self.Strengths(year, week)))
+
+  def Picks(self, year, week, used_teams):
+    """Returns batch_picks.SolveEntry() for the week and used teams."""
+    used_teams = sorted(set(used_teams))
+    return self._Cached(
+        ('picks', year, week, tuple(used_teams)),
+        lambda: batch_picks.SolveEntry(self.Predictions(year, week),
+                                       used_teams, week))
+
+  def Ingest(self, year, body=None):
+    """Reloads the games page for a year.
+
+    Args:
+      year: The season to reload.
+      body: The new page.  If None, downloads it.
+    Returns:
+      JSON-like dictionary structured like: {
+          'changed': Whether any game results changed,
+          'invalidated': The number of cached values dropped,
+      }
+    """
+    old_results = _GameResults(table.FetchPastGames(year))
+    if body is None:
+      table.RefreshPageForYear(year)
+    else:
+      table.StorePageForYear(year, body)
+    changed = old_results != _GameResults(table.FetchPastGames(year))
+    invalidated = 0
+    if changed:
+      with self._lock:
+        self._generation += 1
+        stale = [key for key in self._cache if key[1] in (year, year + 1)]
+        for key in stale:
+          del self._cache[key]
+        invalidated = len(stale)
+    return {'changed': changed, 'invalidated': invalidated}
+
+
+class _RequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  """Translates HTTP requests into calls on the server's PicksService."""
+
+  def _Reply(self, code, result):
+    body = json.dumps(result, sort_keys=True)
+    self.send_response(code)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def _Handle(self, handler):
+    url = urlparse.urlparse(self.path)
+    params = dict(urlparse.parse_qsl(url.query))
+    try:
+      result = handler(url.path, params)
+    except (KeyError, ValueError) as e:
+      self._Reply(400, {'error': 'Bad request: %s' % e})
+    except IOError as e:
+      self._Reply(503, {'error': str(e)})
+    else:
+      if result is None:
+        self._Reply(404, {'error': 'Unknown path %s' % url.path})
+      else:
+        self._Reply(200, result)
+
+  def _Get(self, path, params):
+    service = self.server.service
+    year = int(params['year'])
+    week = int(params['week'])
+    used_teams = [team for team in params.get('used', '').split(',') if team]
+    for team in used_teams:
+      util.GetTeamIndex(team)  # Raises ValueError for unknown teams
+    if path == '/strengths':
+      return service.Strengths(year, week)
+    elif path == '/predictions':
+      predictions = service.Predictions(year, week)
+      return {
+          'first_week': week,
+          'predictions': dict(
+              (team, [None if prob != prob else prob for prob in row])
+              for team, row in zip(util.TEAM_ABBREVIATIONS,
+                                   predictions.tolist()))
+      }
+    elif path == '/sequence':
+      picks = service.Picks(year, week, used_teams)
+      return {'expected_wins': picks['expected_wins'],
+              'picks': picks['picks']}
+    elif path == '/compare':
+      return {'candidates': service.Picks(year, week, used_teams)['candidates']}
+    return None
+
+  def _Post(self, path, params):
+    if path != '/ingest':
+      return None
+    length = int(self.headers.get('Content-Length') or 0)
+    body = self.rfile.read(length) if length else None
+    return self.server.service.Ingest(int(params['year']), body)
+
+  def do_GET(self):
+    self._Handle(self._Get)
+
+  def do_POST(self):
+    self._Handle(self._Post)
+
+  def log_message(self, format, *args):
+    # Hundreds of queries a minute would flood stderr.
+    pass
+
+
+class PicksServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+  """HTTP server on localhost that answers queries from a PicksService."""
+  daemon_threads = True
+
+  def __init__(self, port, service=None):
+    BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', port),
+                                       _RequestHandler)
+    self.service = service or PicksService()
+
+
+if __name__ == '__main__':
+  args = _ReadArgs()
+  table.OFFLINE = args.pop('offline')
+  server = PicksServer(args['port'], PicksService(args['cache_size']))
+  print >> sys.stderr, 'Serving on http://127.0.0.1:%d' % server.server_port
+  server.serve_forever()
@@ -0,0 +1,88 @@
+import json
+import mock
+import os
+import threading
+import unittest
+import urllib2
+
+import picks
+import service
+import table
+import test_utils
+import util
+
+class TestServiceFunctions(test_utils.BaseTest):
+
+  def setUp(self):
+    self._MockFetchPastGames()
+    self._MockFetchFutureGames()
+    patcher = mock.patch.object(table, 'StorePageForYear')
+    patcher.start()
+    self.addCleanup(patcher.stop)
+    self.service = service.PicksService()
+
+  def testCaching(self):
+    strengths = self.service.Strengths(2014, 1)
+    predictions = self.service.Predictions(2014, 1)
+    self.assertIs(strengths, self.service.Strengths(2014, 1))
+    self.assertIs(predictions, self.service.Predictions(2014, 1))
+    self.assertEqual(1, table.FetchFutureGames.call_count)
+    self.assertEqual({}, self.service._key_locks)
+
+  def testCacheSize(self):
+    small = service.PicksService(cache_size=2)
+    strengths = small.Strengths(2014, 1)
+    small.Strengths(2014, 2)
+    small.Strengths(2014, 1)  # Now more recently used than week 2.
+    small.Strengths(2014, 3)
+    self.assertIs(strengths, small.Strengths(2014, 1))
+    self.assertEqual([('strengths', 2014, 3), ('strengths', 2014, 1)],
+                     list(small._cache))
+    self.assertEqual({}, small._key_locks)
+
+  def testIngest(self):
+    last_season = table.FetchPastGames(2013)
+    games = {2012: last_season, 2013: last_season, 2014: last_season}
+    table.FetchPastGames.side_effect = lambda year: games.get(year, [])
+    self.service.Strengths(2013, 1)
+    self.service.Strengths(2014, 1)
+    self.service.Strengths(2015, 1)
+    # The same results again: nothing is invalidated.
+    self.assertEqual({'changed': False, 'invalidated': 0},
+                     self.service.Ingest(2014, 'page'))
+    # A new game result for 2014 invalidates 2014 and 2015, but not 2013.
+    table.StorePageForYear.side_effect = (
+        lambda year, body: games.update({year: last_season[:1]}))
+    self.assertEqual({'changed': True, 'invalidated': 2},
+                     self.service.Ingest(2014, 'page'))
+    table.StorePageForYear.assert_called_with(2014, 'page')
+
+  @unittest.skipUnless(os.path.exists(picks.LIBRARY_PATH),
+                       'Run make to build the pick optimizer')
+  def testServer(self):
+    server = service.PicksServer(0, self.service)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    self.addCleanup(thread.join)
+    self.addCleanup(server.shutdown)
+    url = 'http://127.0.0.1:%d' % server.server_port
+
+    def Get(path):
+      return json.load(urllib2.urlopen(url + path))
+
+    sequence = Get('/sequence?year=2014&week=1&used=DEN')
+    self.assertEqual(util.NUM_WEEKS_PER_SEASON, len(sequence['picks']))
+    self.assertNotIn('DEN', [pick['team'] for pick in sequence['picks']])
+    candidates = Get('/compare?year=2014&week=1&used=DEN')['candidates']
+    self.assertEqual(sequence['picks'][0]['team'], candidates[0][0])
+    predictions = Get('/predictions?year=2014&week=1')['predictions']
+    self.assertEqual(1, predictions['DEN'].count(None))
+    with self.assertRaises(urllib2.HTTPError) as context:
+      Get('/compare?year=2014&week=1&used=XYZ')
+    self.assertEqual(400, context.exception.code)
+    ingest = urllib2.urlopen(url + '/ingest?year=2014', 'page')
+    self.assertEqual({'changed': False, 'invalidated': 0}, json.load(ingest))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,308 @@
+"""Monte Carlo simulation of a suicide pool.
+
+choose-picks maximizes expected wins, but a pool is won by outlasting the other
+entries.  Here we simulate many seasons, each with a field of opponents whose
+picks follow a popularity model, and report how often each candidate pick
+sequence survives and how much of the pool it wins on average.  Candidates are
+read from a file, or built from each possible pick this week followed by the
+picks that maximize expected wins afterwards.
+"""
+import argparse
+import json
+import numpy
+import sys
+
+import picks
+import prediction_files
+import schedule
+import table
+import util
+
+# Random draws are 16-bit integers; a team wins if its draw is below
+# round(probability * PROBABILITY_SCALE).
+PROBABILITY_SCALE = 1 << 16
+
+# By default, opponents pick teams with probability proportional to
+# (win probability) ** POPULARITY_EXPONENT.
+POPULARITY_EXPONENT = 8.0
+
+# Number of seasons simulated at once.  Memory use is roughly
+# CHUNK_SIZE * util.NUM_TEAMS * (number of weeks) * 3 bytes, plus
+# CHUNK_SIZE * (number of opponents + candidates) * (number of weeks) bytes.
+CHUNK_SIZE = 20000
+
+def _ReadArgs():
+  parser = argparse.ArgumentParser(description='Simulate a suicide pool.  '
+                                   'Prints results to stdout.')
+  parser.add_argument('predictions',
+                      help='Predictions file, in either format of '
+                      'prediction_files.py')
+  parser.add_argument('candidates', nargs='?',
+                      help='File with one pick sequence per line, e.g. '
+                      '"DEN,SEA,NE", starting with the current week.')
+  parser.add_argument('--dp-candidates', action='store_true',
+                      help='Instead of a candidates file, simulate each team '
+                      'that can be picked this week, followed by the picks '
+                      'that maximize expected wins in the remaining weeks.')
+  parser.add_argument('--year', type=int,
+                      help='The current year.  If given, the schedule is '
+                      'fetched so that exactly one team wins each game.')
+  parser.add_argument('--week', type=int,
+                      help='With --year, the week of the first predictions.  '
+                      'Defaults to the week recorded in binary predictions '
+                      'files.')
+  parser.add_argument('--offline', action='store_true',
+                      help='Only use cached pages; never access the network.')
+  parser.add_argument('--num-seasons', type=int, default=100000,
+                      help='Number of seasons to simulate')
+  parser.add_argument('--num-opponents', type=int, default=100,
+                      help='Number of other entries in the pool')
+  parser.add_argument('--seed', type=int, default=0, help='Random seed')
+  if len(sys.argv) == 1:
+    parser.print_help()
+    sys.exit(1)
+  args = parser.parse_args()
+  if (args.candidates is None) == (not args.dp_candidates):
+    parser.error('Give exactly one of candidates and --dp-candidates')
+  return vars(args)
+
+
+def _ReadCandidatesFile(filename):
+  """Reads pick sequences, one per line, into an array of team indices."""
+  with open(filename) as f:
+    return numpy.array([[util.GetTeamIndex(team)
+                         for team in line.strip().split(',')]
+                        for line in f if line.strip()])
+
+
+def DpCandidates(predictions, teams_to_avoid=()):
+  """Builds one candidate pick sequence per team that can be picked now.
+
+  Each candidate picks its team in the first week, then the sequence that
+  maximizes expected wins in the remaining weeks without that team.
+
+  Args:
+    predictions: Prediction matrix, as from
+        schedule.GetSchedulePredictionMatrix().
+    teams_to_avoid: Abbreviations of teams that must not be picked.
+  Returns:
+    A (number of candidates) x (number of weeks) array of team indices, with
+    a candidate for each team that has a game in the first week.
+  """
+  matrix = picks.PicksMatrix(predictions, teams_to_avoid)
+  candidates = []
+  for team in range(util.NUM_TEAMS):
+    if not matrix[team, 0] > 0:
+      # The team was used, or has a bye.
+      continue
+    rest = matrix[:, 1:].copy()
+    rest[team] = -numpy.inf
+    sequence = picks.ChoosePicks(rest)[1] if rest.shape[1] else []
+    candidates.append([team] + list(sequence))
+  return numpy.array(candidates, dtype=numpy.intp).reshape(
+      -1, matrix.shape[1])
+
+
+def ScheduleOpponents(year, week, num_weeks):
+  """Returns schedule.OpponentMatrix() for the given weeks of a season.
+
+  Args:
+    year: The current year.
+    week: The first week.
+    num_weeks: Number of weeks, starting at week.
+  """
+  home, away, week_offsets = schedule.ScheduleToArrays(
+      table.FetchFutureGames(year, week), week)
+  keep = week_offsets < num_weeks
+  return schedule.OpponentMatrix(home[keep], away[keep], week_offsets[keep],
+                                 num_weeks)
+
+
+def DefaultPopularity(predictions):
+  """Returns how likely opponents are to pick each team in each week.
+
+  Args:
+    predictions: Prediction matrix, as from
+        schedule.GetSchedulePredictionMatrix().
+  Returns:
+    Array of the same shape, giving unnormalized pick weights.  Byes and any
+    other non-finite or negative predictions get weight 0.
+  """
+  predictions = numpy.array(predictions, dtype=float)
+  predictions[~(numpy.isfinite(predictions) & (predictions > 0))] = 0
+  return predictions ** POPULARITY_EXPONENT
+
+
+def SampleOpponentPicks(popularity, num_opponents, rng):
+  """Samples pick sequences for a field of opponents.
+
+  Each week, every opponent picks among the teams it has not used yet, with
+  probability proportional to popularity.
+
+  Args:
+    popularity: Output of DefaultPopularity(), or any array of the same shape.
+    num_opponents: Number of sequences to sample.
+    rng: A numpy.random.RandomState.
+  Returns:
+    A num_opponents x (number of weeks) array of team indices.
+  """
+  num_teams, num_weeks = popularity.shape
+  # Teams with zero weight are only picked if nothing else is left.
+  log_popularity = numpy.log(numpy.maximum(popularity, 1e-300))
+  used = numpy.zeros((num_opponents, num_teams), dtype=bool)
+  picks = numpy.empty((num_opponents, num_weeks), dtype=numpy.intp)
+  for week in range(num_weeks):
+    # Gumbel-max trick: the argmax of log weights plus Gumbel noise is a
+    # sample from the normalized weights.
+    keys = log_popularity[:, week] - numpy.log(
+        -numpy.log(rng.random_sample((num_opponents, num_teams))))
+    keys[used] = -numpy.inf
+    picks[:, week] = numpy.argmax(keys, axis=1)
+    used[numpy.arange(num_opponents), picks[:, week]] = True
+  return picks
+
+
+def SimulateWins(predictions, num_seasons, rng, opponents=None):
+  """Samples the outcome of every game in a number of seasons.
+
+  Args:
+    predictions: Prediction matrix, as from
+        schedule.GetSchedulePredictionMatrix().
+    num_seasons: Number of seasons to sample.
+    rng: A numpy.random.RandomState.
+    opponents: Optional array of the same shape as predictions, giving the
+        index of each team's opponent, or -1 in a bye week.  If given, exactly
+        one of the two teams in each game wins.  Otherwise, the outcomes of
+        different teams are sampled independently.
+  Returns:
+    A util.NUM_TEAMS x (number of weeks) x num_seasons boolean array, which is
+    True where a team won.  Teams never win in their bye week.  Seasons are
+    the last axis so that looking up one team in one week is contiguous.
+  """
+  thresholds = numpy.round(numpy.nan_to_num(predictions) *
+                           PROBABILITY_SCALE).astype(numpy.int32)
+  draws = rng.randint(0, PROBABILITY_SCALE,
+                      size=predictions.shape + (num_seasons,),
+                      dtype=numpy.uint16)
+  if opponents is not None:
+    # The team with the higher index reuses its opponent's draw, reflected, so
+    # it wins exactly when its opponent loses.
+    teams, weeks = numpy.nonzero(
+        opponents > numpy.arange(len(opponents))[:, None])
+    draws[opponents[teams, weeks], weeks] = (PROBABILITY_SCALE - 1 -
+                                             draws[teams, weeks])
+    thresholds[opponents[teams, weeks], weeks] = (PROBABILITY_SCALE -
+                                                  thresholds[teams, weeks])
+  return draws < thresholds[:, :, None]
+
+
+def WeeksSurvived(wins, sequences):
+  """Counts how many weeks each pick sequence survives in each season.
+
+  Args:
+    wins: Output of SimulateWins().
+    sequences: A (number of sequences) x (number of weeks) array of team
+        indices.
+  Returns:
+    A (number of sequences) x num_seasons array of the number of weeks before
+    each sequence's first loss.
+  """
+  num_sequences, num_weeks = sequences.shape
+  shape = (num_sequences, wins.shape[2])
+  alive = numpy.ones(shape, dtype=bool)
+  survived = numpy.zeros(shape, dtype=numpy.uint8)
+  for week in range(num_weeks):
+    alive &= wins[sequences[:, week], week]
+    survived += alive
+  return survived
+
+
+def SimulatePool(predictions, candidates, num_seasons, num_opponents,
+                 popularity=None, opponents=None, seed=0,
+                 chunk_size=CHUNK_SIZE):
+  """Estimates how each candidate pick sequence fares in a pool.
+
+  Seasons are simulated in chunks of chunk_size, so memory use does not grow
+  with num_seasons.  Each chunk gets a freshly sampled field of opponents.
+
+  In each season, the entry that survives the most weeks wins the pool.  Ties,
+  including several entries surviving the whole season, split the pool
+  evenly.
+
+  Args:
+    predictions: Prediction matrix, as from
+        schedule.GetSchedulePredictionMatrix().
+    candidates: A (number of candidates) x (number of weeks) array of team
+        indices.  Each candidate is evaluated separately against the field.
+    num_seasons: Number of seasons to simulate.
+    num_opponents: Number of other entries in the pool.
+    popularity: Pick weights for opponents.  Defaults to
+        DefaultPopularity(predictions).
+    opponents: Passed on to SimulateWins().
+    seed: Seed for the random number generator.
+    chunk_size: Number of seasons to simulate at once.
+  Returns:
+    JSON-like dictionary structured like: {
+        'survival': s, where s[i][j] is the probability that candidate i is
+            still alive after the j-th week,
+        'equity': e, where e[i] is the expected share of the pool won by
+            candidate i,
+    }
+  """
+  rng = numpy.random.RandomState(seed)
+  candidates = numpy.asarray(candidates)
+  num_candidates, num_weeks = candidates.shape
+  if popularity is None:
+    popularity = DefaultPopularity(predictions)
+  # alive_counts[i][w] counts seasons where candidate i survived > w weeks.
+  alive_counts = numpy.zeros((num_candidates, num_weeks))
+  equity = numpy.zeros(num_candidates)
+  for start in range(0, num_seasons, chunk_size):
+    size = min(chunk_size, num_seasons - start)
+    wins = SimulateWins(predictions, size, rng, opponents)
+    survived = WeeksSurvived(wins, candidates)
+    for week in range(num_weeks):
+      alive_counts[:, week] += numpy.count_nonzero(survived > week, axis=1)
+    if num_opponents:
+      field = WeeksSurvived(
+          wins, SampleOpponentPicks(popularity, num_opponents, rng))
+      best = field.max(axis=0)
+      num_best = numpy.count_nonzero(field == best, axis=0)
+      equity += numpy.count_nonzero(survived > best, axis=1)
+      equity += ((survived == best) / (1.0 + num_best)).sum(axis=1)
+    else:
+      equity += size
+  return {
+      'survival': (alive_counts / num_seasons).tolist(),
+      'equity': (equity / num_seasons).tolist()
+  }
+
+
+def _PrintSimulation(predictions, candidates, dp_candidates, year, week,
+                     num_seasons, num_opponents, seed):
+  """Prints the results of SimulatePool() as JSON to stdout."""
+  matrix, first_week = prediction_files.ReadPredictions(predictions)
+  if dp_candidates:
+    used_teams = []
+    if prediction_files.IsBinaryPredictionsFile(predictions):
+      used_teams = prediction_files.PredictionsFile(predictions).UsedTeams()
+    sequences = DpCandidates(matrix, used_teams)
+  else:
+    sequences = _ReadCandidatesFile(candidates)
+    matrix = matrix[:, :sequences.shape[1]]
+  opponents = None
+  if week is None:
+    week = first_week
+  if year is not None and week is not None:
+    opponents = ScheduleOpponents(year, week, matrix.shape[1])
+  results = SimulatePool(matrix, sequences, num_seasons, num_opponents,
+                         opponents=opponents, seed=seed)
+  results['candidates'] = [[util.TEAM_ABBREVIATIONS[team] for team in sequence]
+                           for sequence in sequences]
+  print json.dumps(results, indent=2)
+
+
+if __name__ == '__main__':
+  args = _ReadArgs()
+  table.OFFLINE = args.pop('offline')
+  _PrintSimulation(**args)
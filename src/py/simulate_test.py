@@ -0,0 +1,96 @@
+import numpy
+import os
+import unittest
+
+import picks
+import schedule
+import simulate
+import table
+import test_utils
+import util
+
+class TestSimulateFunctions(test_utils.BaseTest):
+
+  def setUp(self):
+    self._MockFetchPastGames()
+    self._MockFetchFutureGames()
+    future_games = table.FetchFutureGames(2014, 1)
+    home, away, week_offsets = schedule.ScheduleToArrays(future_games, 1)
+    self.num_weeks = util.NUM_WEEKS_PER_SEASON
+    self.opponents = schedule.OpponentMatrix(home, away, week_offsets,
+                                             self.num_weeks)
+    self.predictions = schedule.GetSchedulePredictionMatrix(2014, 1)
+    # Greedily pick the most likely winner each week, without reusing teams.
+    self.greedy = []
+    for week in range(self.num_weeks):
+      probs = numpy.nan_to_num(self.predictions[:, week])
+      probs[self.greedy] = -1
+      self.greedy.append(int(numpy.argmax(probs)))
+
+  def testSimulateWinsPairsGames(self):
+    rng = numpy.random.RandomState(0)
+    wins = simulate.SimulateWins(self.predictions, 1000, rng, self.opponents)
+    teams, weeks = numpy.nonzero(self.opponents >= 0)
+    self.assertTrue(
+        (wins[teams, weeks] != wins[self.opponents[teams, weeks],
+                                    weeks]).all())
+    self.assertFalse(wins[self.opponents < 0].any())
+    # Win frequencies should match the predictions.
+    self.assertTrue(numpy.allclose(wins.mean(axis=2)[teams, weeks],
+                                   self.predictions[teams, weeks], atol=0.06))
+
+  def testSimulatePool(self):
+    # A sequence that picks each team in its bye week never survives.
+    bye_weeks = numpy.argmax(self.opponents < 0, axis=1)
+    bad = [int(numpy.nonzero(bye_weeks == week)[0][0])
+           if (bye_weeks == week).any() else self.greedy[week]
+           for week in range(self.num_weeks)]
+    candidates = [self.greedy, bad]
+    results = simulate.SimulatePool(self.predictions, candidates, 5000, 20,
+                                    opponents=self.opponents, chunk_size=1500)
+    survival = numpy.array(results['survival'])
+    self.assertEqual((2, self.num_weeks), survival.shape)
+    self.assertAlmostEqual(self.predictions[self.greedy[0], 0], survival[0, 0],
+                           delta=0.03)
+    self.assertTrue((numpy.diff(survival, axis=1) <= 0).all())
+    self.assertEqual(0, survival[1, -1])
+    self.assertGreater(results['equity'][0], results['equity'][1])
+
+    # Seeded runs are reproducible.
+    self.assertEqual(results, simulate.SimulatePool(
+        self.predictions, candidates, 5000, 20, opponents=self.opponents,
+        chunk_size=1500))
+
+  @unittest.skipUnless(os.path.exists(picks.LIBRARY_PATH),
+                       'Run make to build the picks library')
+  def testDpCandidates(self):
+    predictions = self.predictions[:, :6]
+    candidates = simulate.DpCandidates(predictions, ['DEN'])
+    playing = [team for team in range(util.NUM_TEAMS)
+               if not numpy.isnan(predictions[team, 0]) and
+               team != util.GetTeamIndex('DEN')]
+    self.assertEqual(playing, list(candidates[:, 0]))
+    for sequence in candidates:
+      self.assertEqual(6, len(set(sequence)))
+      self.assertNotIn(util.GetTeamIndex('DEN'), sequence)
+    # The best candidate is the optimal pick sequence.
+    expected_wins, _ = picks.ChoosePicks(
+        picks.PicksMatrix(predictions, ['DEN']))
+    wins = numpy.nan_to_num(predictions)[candidates,
+                                         numpy.arange(6)].sum(axis=1)
+    self.assertAlmostEqual(expected_wins, wins.max(), places=5)
+
+  def testScheduleOpponents(self):
+    opponents = simulate.ScheduleOpponents(2014, 1, 3)
+    numpy.testing.assert_array_equal(self.opponents[:, :3], opponents)
+
+  def testDefaultPopularity(self):
+    predictions = numpy.array([[0.5, numpy.nan, -numpy.inf, -0.1, 1.0]])
+    popularity = simulate.DefaultPopularity(predictions)
+    self.assertEqual(0.5 ** simulate.POPULARITY_EXPONENT, popularity[0, 0])
+    self.assertEqual([0, 0, 0], list(popularity[0, 1:4]))
+    self.assertEqual(1, popularity[0, 4])
+
+
+if __name__ == '__main__':
+  unittest.main()
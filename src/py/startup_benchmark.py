@@ -0,0 +1,96 @@
+"""Measures how long the command line tools take to start.
+
+Each measurement runs a fresh Python interpreter, so it includes everything a
+user waits for: interpreter startup, imports and, for full runs, the work
+itself.  Full runs use --offline, so they measure a run where every page is
+already cached; run the tool once online first to fill the cache.
+
+Prints results to stdout as JSON, giving the median time in seconds.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Modules whose import time is measured, roughly from light to heavy.
+MODULES = ['numpy', 'scipy.special', 'scipy.sparse', 'table', 'teams',
+           'schedule', 'picks', 'make_picks', 'cvxpy', 'scipy.stats']
+
+# Modules that the scripts in SCRIPTS should never import, because they are
+# only needed by optional code paths.
+DEFERRED_MODULES = ['cvxpy', 'scipy.stats']
+
+# Scripts whose full, cached runs are measured.  Each takes a year and a week.
+SCRIPTS = ['schedule.py', 'teams.py', 'make_picks.py']
+
+_DIRECTORY = os.path.dirname(os.path.realpath(__file__))
+
+def _ReadArgs():
+  parser = argparse.ArgumentParser(description='Measure startup time of the '
+                                   'command line tools.  Prints results to '
+                                   'stdout.')
+  parser.add_argument('year', type=int, help='Year to run the tools for')
+  parser.add_argument('week', type=int, help='Week to run the tools for')
+  parser.add_argument('--repeat', type=int, default=5,
+                      help='Number of runs to take the median of')
+  if len(sys.argv) == 1:
+    parser.print_help()
+    sys.exit(1)
+  return vars(parser.parse_args())
+
+
+def _MedianRunTime(args, repeat):
+  """Runs a command repeatedly, returning the median wall time in seconds."""
+  times = []
+  with open(os.devnull, 'w') as devnull:
+    for _ in range(repeat):
+      start = time.time()
+      subprocess.check_call(args, cwd=_DIRECTORY, stdout=devnull)
+      times.append(time.time() - start)
+  return sorted(times)[len(times) // 2]
+
+
+def ImportedModules(module):
+  """Returns the set of modules loaded by importing module in a fresh process."""
+  output = subprocess.check_output(
+      [sys.executable, '-c',
+       'import sys, %s; print "\\n".join(sys.modules)' % module],
+      cwd=_DIRECTORY)
+  return set(output.split())
+
+
+def RunBenchmark(year, week, repeat):
+  """Measures import and run times of the tools.
+
+  Returns:
+    JSON-like dictionary structured like: {
+        'interpreter': t_0, the time to start python and do nothing,
+        'imports': {'numpy': t_1, ...},
+        'commands': {'schedule.py': t_2, ...},
+        'deferred': {'schedule.py': ['cvxpy', ...], ...}, any DEFERRED_MODULES
+            that the tools import anyway; should be empty,
+    }
+  """
+  results = {
+      'interpreter': _MedianRunTime([sys.executable, '-c', 'pass'], repeat),
+      'imports': {},
+      'commands': {},
+      'deferred': {}
+  }
+  for module in MODULES:
+    results['imports'][module] = _MedianRunTime(
+        [sys.executable, '-c', 'import %s' % module], repeat)
+  for script in SCRIPTS:
+    results['commands'][script] = _MedianRunTime(
+        [sys.executable, script, str(year), str(week), '--offline'], repeat)
+    loaded = ImportedModules(os.path.splitext(script)[0])
+    results['deferred'][script] = sorted(
+        module for module in DEFERRED_MODULES if module in loaded)
+  return results
+
+
+if __name__ == '__main__':
+  args = _ReadArgs()
+  print json.dumps(RunBenchmark(**args), indent=2, sort_keys=True)
@@ -0,0 +1,170 @@
+"""Generates synthetic leagues, seasons and predictions.
+
+Everything here is random but seeded, and shaped like the real data: season
+pages look like the games pages of pro-football-reference.com, so they go
+through the same parsing as downloaded pages.  Used for benchmarks and tests
+that need more, or differently shaped, data than the saved pages in
+testdata/.
+"""
+import numpy
+
+import util
+
+# Standard deviation of team strengths, and of the margin of victory around
+# the difference in strengths.
+STRENGTH_STDDEV = 6.0
+MARGIN_STDDEV = 13.45
+
+# Home field advantage, in points.
+HOME_FIELD = 2.5
+
+# The first week in which teams may have a bye.
+FIRST_BYE_WEEK = 4
+
+_PAGE_TEMPLATE = """<html><body>
+<table class="sortable  stats_table" id="games">
+<thead><tr><th>Week</th><th>Day</th><th>Date</th><th></th><th>Winner/tie</th>
+<th></th><th>Loser/tie</th><th>PtsW</th><th>PtsL</th></tr></thead>
+<tbody>
+%s
+</tbody></table>
+<table class="sortable  stats_table" id="games_left">
+<thead><tr><th>Week</th><th>Day</th><th>Date</th><th>VisTm</th><th></th>
+<th>HomeTm</th><th>Time</th></tr></thead>
+<tbody>
+%s
+</tbody></table>
+</body></html>
+"""
+
+_PAST_ROW = """<tr>
+   <td align="right" csk="%(week)d">%(week)d</td>
+   <td align="left">Sun</td>
+   <td align="left">September 7</td>
+   <td align="center"><a href="/boxscores/">boxscore</a></td>
+   <td align="left"><strong><a href="/teams/">%(winner)s</a></strong></td>
+   <td align="right">%(location)s</td>
+   <td align="left"><a href="/teams/">%(loser)s</a></td>
+   <td align="right"><strong>%(winning_points)d</strong></td>
+   <td align="right">%(losing_points)d</td>
+</tr>"""
+
+_FUTURE_ROW = """<tr>
+   <td align="right" csk="%(week)d">%(week)d</td>
+   <td align="left">Sun</td>
+   <td align="center"><a href="/boxscores/">September 7</a></td>
+   <td align="left"><a href="/teams/">%(away)s</a></td>
+   <td align="right">@</td>
+   <td align="left"><a href="/teams/">%(home)s</a></td>
+   <td align="right">1:00 PM</td>
+</tr>"""
+
+def TeamNames(num_teams=util.NUM_TEAMS):
+  """Returns a full name for each of the first num_teams teams.
+
+  Teams are in the order of util.TEAM_ABBREVIATIONS.
+  """
+  names = {}
+  for name, abbreviation in sorted(
+      util.TEAM_NAMES_TO_ABBREVIATIONS.iteritems()):
+    names.setdefault(abbreviation, name)
+  return [names[abbreviation]
+          for abbreviation in util.TEAM_ABBREVIATIONS[:num_teams]]
+
+
+def GenerateSchedule(num_teams, num_weeks, rng):
+  """Generates a regular season schedule.
+
+  Every team has one bye week, in week FIRST_BYE_WEEK or later if there are
+  enough weeks, and plays one game in every other week.
+
+  Args:
+    num_teams: Number of teams; must be even.
+    num_weeks: Number of weeks in the season.
+    rng: A numpy.random.RandomState.
+  Returns:
+    A list of (week, home, away) tuples, where home and away index into
+    TeamNames(num_teams).
+  """
+  first_bye_week = min(FIRST_BYE_WEEK, num_weeks)
+  # Teams have byes in pairs, so every week has an even number of teams left.
+  pairs = rng.permutation(num_teams).reshape(-1, 2)
+  bye_weeks = {}
+  for i, pair in enumerate(pairs):
+    for team in pair:
+      bye_weeks[team] = first_bye_week + i % (num_weeks - first_bye_week + 1)
+  games = []
+  for week in range(1, num_weeks + 1):
+    playing = [team for team in rng.permutation(num_teams)
+               if bye_weeks[team] != week]
+    for i in range(0, len(playing), 2):
+      games.append((week, playing[i], playing[i + 1]))
+  return games
+
+
+def GenerateStrengths(num_teams, rng):
+  """Generates true team strengths, in points."""
+  return rng.normal(0, STRENGTH_STDDEV, num_teams)
+
+
+def GenerateSeasonPage(num_teams, num_weeks, num_played_weeks, rng,
+                       strengths=None):
+  """Generates the games page of a season.
+
+  Args:
+    num_teams: Number of teams; must be even.
+    num_weeks: Number of weeks in the season.
+    num_played_weeks: Weeks whose games have been played; the rest are listed
+        as upcoming.
+    rng: A numpy.random.RandomState.
+    strengths: True team strengths that decide the results.  Defaults to
+        GenerateStrengths(num_teams, rng).
+  Returns:
+    HTML string that table.ParsePastGamesTable() and
+    table.ParseFutureGamesTable() understand.
+  """
+  if strengths is None:
+    strengths = GenerateStrengths(num_teams, rng)
+  names = TeamNames(num_teams)
+  past_rows = []
+  future_rows = []
+  for week, home, away in GenerateSchedule(num_teams, num_weeks, rng):
+    if week > num_played_weeks:
+      future_rows.append(_FUTURE_ROW % {
+          'week': week, 'home': names[home], 'away': names[away]})
+      continue
+    margin = int(round(rng.normal(strengths[home] - strengths[away] +
+                                  HOME_FIELD, MARGIN_STDDEV)))
+    margin = margin or 1  # No ties
+    losing_points = rng.randint(0, 28)
+    winner, loser = (home, away) if margin > 0 else (away, home)
+    past_rows.append(_PAST_ROW % {
+        'week': week, 'winner': names[winner], 'loser': names[loser],
+        'location': '' if margin > 0 else '@',
+        'winning_points': losing_points + abs(margin),
+        'losing_points': losing_points})
+  return _PAGE_TEMPLATE % ('\n'.join(past_rows), '\n'.join(future_rows))
+
+
+def GeneratePredictions(num_teams, num_weeks, rng):
+  """Generates a prediction matrix for the rest of a season.
+
+  Args:
+    num_teams: Number of teams with games; must be even.  Other teams in
+        util.TEAM_ABBREVIATIONS never win.
+    num_weeks: Number of weeks.
+    rng: A numpy.random.RandomState.
+  Returns:
+    A util.NUM_TEAMS x num_weeks array, like
+    schedule.GetSchedulePredictionMatrix().
+  """
+  strengths = GenerateStrengths(num_teams, rng)
+  predictions = numpy.zeros((util.NUM_TEAMS, num_weeks))
+  predictions[:num_teams] = numpy.nan  # Byes, unless a game is scheduled.
+  for week, home, away in GenerateSchedule(num_teams, num_weeks, rng):
+    z = (strengths[home] - strengths[away] + HOME_FIELD) / MARGIN_STDDEV
+    # Logistic approximation of the normal cdf, close enough for benchmarks.
+    home_prob = 1 / (1 + numpy.exp(-1.702 * z))
+    predictions[home, week - 1] = home_prob
+    predictions[away, week - 1] = 1 - home_prob
+  return predictions
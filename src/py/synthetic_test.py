@@ -0,0 +1,50 @@
+import collections
+import numpy
+import unittest
+
+import synthetic
+import table
+import util
+
+class TestSyntheticFunctions(unittest.TestCase):
+
+  def setUp(self):
+    self.rng = numpy.random.RandomState(0)
+
+  def testGenerateSchedule(self):
+    games = synthetic.GenerateSchedule(util.NUM_TEAMS, 18, self.rng)
+    self.assertEqual(util.NUM_TEAMS * 17 / 2, len(games))
+    weeks_played = collections.defaultdict(set)
+    for week, home, away in games:
+      self.assertNotEqual(home, away)
+      for team in (home, away):
+        self.assertNotIn(week, weeks_played[team])
+        weeks_played[team].add(week)
+    # Every team plays every week but one.
+    self.assertEqual([17] * util.NUM_TEAMS,
+                     [len(weeks_played[team]) for team in range(32)])
+
+  def testGenerateSeasonPage(self):
+    page = synthetic.GenerateSeasonPage(10, 17, 5, self.rng)
+    past_games = table.ParsePastGamesTable(page)
+    future_games = table.ParseFutureGamesTable(page)
+    self.assertEqual(10 * 16 / 2, len(past_games) + len(future_games))
+    self.assertTrue(all(int(game.week) <= 5 for game in past_games))
+    self.assertTrue(all(int(game.week) > 5 for game in future_games))
+    self.assertTrue(all(game.IsValid() for game in past_games))
+    self.assertEqual(set(util.TEAM_ABBREVIATIONS[:10]),
+                     set(game.winning_team for game in past_games) |
+                     set(game.losing_team for game in past_games))
+
+  def testGeneratePredictions(self):
+    predictions = synthetic.GeneratePredictions(8, 6, self.rng)
+    self.assertEqual((util.NUM_TEAMS, 6), predictions.shape)
+    self.assertTrue((numpy.isnan(predictions[:8]).sum(axis=1) == 1).all())
+    self.assertTrue(numpy.allclose(numpy.nansum(predictions[:8], axis=0),
+                                   (~numpy.isnan(predictions[:8])).sum(axis=0)
+                                   / 2.0))
+    self.assertFalse(predictions[8:].any())
+
+
+if __name__ == '__main__':
+  unittest.main()
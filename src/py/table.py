@@ -1,15 +1,44 @@
 """Module for parsing tables from pro-football-reference.com"""
+import datetime
+import hashlib
+import json
 from lxml import html as lxml_html
+import os
 import sys
-import urllib2
+import threading
+import time
 
+import fetch
+import profiling
 import util
 
+# Directory where downloaded season pages are cached on disk.
+CACHE_DIRECTORY = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                               os.pardir, os.pardir, 'cache')
+
+# How long, in seconds, a cached page for a season that is still in progress
+# is trusted before we download it again.  Finished seasons never expire.
+CURRENT_SEASON_TTL_SECONDS = 60 * 60
+
+# Minimum time, in seconds, between the starts of two downloads from the site.
+MIN_FETCH_INTERVAL_SECONDS = 0.1
+
+# If True, never touch the network: only cached pages are used, regardless of
+# their age, and a missing page is an error.
+OFFLINE = False
+
 # Enum for keeping track of home/away teams
 HOME_TEAM_WON = 0
 HOME_TEAM_LOST = 1
 NO_HOME_TEAM = 2  # Basically means this was the Super Bowl
 
+# IDs of the tables of finished and upcoming games on a season page.
+PAST_GAMES_TABLE_ID = 'games'
+FUTURE_GAMES_TABLE_ID = 'games_left'
+
+# Maximum number of documents whose parsed games are kept in memory.
+MAX_PARSED_DOCUMENTS = 64
+
 class Game(object):
   """Represents one NFL game."""
   @classmethod
@@ -93,6 +122,75 @@ def _ParseHomeOrAway(symbol):
     raise KeyError('Unrecognized home/away symbol "%s"' % symbol)
 
 
+def ExtractTables(html_body, table_ids):
+  """Extracts the rows of several tables in a single pass over a document.
+
+  Args:
+    html_body: The string contents of an HTML document.
+    table_ids: The ids of the tables to look for in the document.
+  Returns:
+    A dict mapping each table id to a list of rows.  Each row is a list
+    containing the text of all <td> elements in one <tr> of that table.
+  """
+  tables = dict((table_id, []) for table_id in table_ids)
+  root = lxml_html.fromstring(html_body)
+  for table in root.iter('table'):
+    rows = tables.get(table.get('id'))
+    if rows is None:
+      continue
+    for tr in table.iter('tr'):
+      rows.append([td.text_content() for td in tr.iter('td')])
+  return tables
+
+
+# Parsed documents, keyed by the SHA-1 of their contents.  Each value is a
+# dict holding the extracted table rows under 'rows', plus lists of parsed
+# games keyed by what kind of games they are.
+_parsed_memo = {}
+
+
+def _ParsedDocument(html_body):
+  """Returns the memo entry for a document, extracting its tables if needed."""
+  digest = hashlib.sha1(html_body).hexdigest()
+  doc = _parsed_memo.get(digest)
+  if doc is None:
+    if len(_parsed_memo) >= MAX_PARSED_DOCUMENTS:
+      _parsed_memo.clear()
+    with profiling.Stage('table.parse'):
+      doc = {'rows': ExtractTables(
+          html_body, [PAST_GAMES_TABLE_ID, FUTURE_GAMES_TABLE_ID])}
+    profiling.Count('table.rows_parsed',
+                    sum(len(rows) for rows in doc['rows'].itervalues()))
+    _parsed_memo[digest] = doc
+  return doc
+
+
+def MemoizeForDocument(html_body, key, compute):
+  """Memoizes a value derived from a document, alongside its parsed tables.
+
+  Args:
+    html_body: The string contents of an HTML document.
+    key: Identifies the value among those derived from the document.
+    compute: Function computing the value, called if it is not memoized yet.
+  Returns:
+    The value.
+  """
+  doc = _ParsedDocument(html_body)
+  if key not in doc:
+    doc[key] = compute()
+  return doc[key]
+
+
+def _GameRows(rows):
+  """Filters out rows that do not describe a game."""
+  for row in rows:
+    if not row or not row[0]:
+      # Empty row contained only <th> elements, ignore.
+      # If row[0] is empty, this row just says "Playoffs"
+      continue
+    yield row
+
+
 def TableRowsIter(html_body, table_id):
   """Iterates over rows in the table with the given ID.
   
@@ -103,49 +201,49 @@ def TableRowsIter(html_body, table_id):
     For each <tr> in the table, a list containing the text of all <td>
     elements in that <tr>.
   """
-  root = lxml_html.fromstring(html_body)
-  for table in root.iter('table'):
-    if table.get('id') == table_id:
-      for tr in table.iter('tr'):
-        row = []
-        for td in tr.iter('td'):
-          row.append(td.text_content())
-        yield(row)
+  if table_id in (PAST_GAMES_TABLE_ID, FUTURE_GAMES_TABLE_ID):
+    rows = _ParsedDocument(html_body)['rows'][table_id]
+  else:
+    rows = ExtractTables(html_body, [table_id])[table_id]
+  for row in rows:
+    yield list(row)
 
 
 def ParsePastGamesTable(html_body, future=False):
   """Parses the table of games that have been played.
 
+  Results are memoized per document, so parsing the same page again is free.
+
   Args:
     html_body: HTML string.
     future: If True, will convert games to FutureGame objects
   Returns: list of PastGame objects, or FutureGame objects if future == True
   """
-  games = []
-  for row in TableRowsIter(html_body, 'games'):
-    if not row or not row[0]:
-      # Empty row contained only <th> elements, ignore.
-      # If row[0] is empty, this row just says "Playoffs"
-      continue
-    game = PastGame.ParseFromList(row)
-    if future:
-      games.append(game.ToFutureGame())
-    elif game.IsValid():
-      # Only append valid games here
-      games.append(game)
-  return games
+  doc = _ParsedDocument(html_body)
+  key = 'past_as_future' if future else 'past'
+  if key not in doc:
+    games = []
+    for row in _GameRows(doc['rows'][PAST_GAMES_TABLE_ID]):
+      game = PastGame.ParseFromList(row)
+      if future:
+        games.append(game.ToFutureGame())
+      elif game.IsValid():
+        # Only append valid games here
+        games.append(game)
+    doc[key] = games
+  return list(doc[key])
     
 
 def ParseFutureGamesTable(html_body):
-  """Parses the table of upcoming games."""
-  games = []
-  for row in TableRowsIter(html_body, 'games_left'):
-    if not row or not row[0]:
-      # Empty row contained only <th> elements, ignore.
-      # If row[0] is empty, this row just says "Playoffs"
-      continue
-    games.append(FutureGame.ParseFromList(row))
-  return games
+  """Parses the table of upcoming games.
+
+  Results are memoized per document, so parsing the same page again is free.
+  """
+  doc = _ParsedDocument(html_body)
+  if 'future' not in doc:
+    doc['future'] = [FutureGame.ParseFromList(row)
+                     for row in _GameRows(doc['rows'][FUTURE_GAMES_TABLE_ID])]
+  return list(doc['future'])
 
 
 def MakeUrlForYear(year):
@@ -153,22 +251,190 @@ def MakeUrlForYear(year):
   return 'http://www.pro-football-reference.com/years/%d/games.htm' % year
 
 
+# In-process copies of pages, mapping year to a (fetch time, body) pair.
+_page_memo = {}
+
+
+def _IsSeasonFinished(year, now=None):
+  """Returns True if the season starting in the given year is over.
+
+  The Super Bowl is played in early February, so by March the page for the
+  season will never change again.
+  """
+  if now is None:
+    now = datetime.datetime.now()
+  return now >= datetime.datetime(year + 1, 3, 1)
+
+
+def _IsFresh(year, fetch_time):
+  """Returns True if a page fetched at fetch_time can still be used."""
+  if OFFLINE or _IsSeasonFinished(year):
+    return True
+  return time.time() - fetch_time < CURRENT_SEASON_TTL_SECONDS
+
+
+def _CachePathForYear(year):
+  """Returns the path of the on-disk cache file for the given year."""
+  return os.path.join(CACHE_DIRECTORY, '%d_games.htm' % year)
+
+
+def _ReadCachedPage(year):
+  """Reads the cached page for a year, or returns None if missing or stale."""
+  path = _CachePathForYear(year)
+  try:
+    fetch_time = os.path.getmtime(path)
+  except OSError:
+    return None
+  if not _IsFresh(year, fetch_time):
+    return None
+  with open(path, 'rb') as f:
+    body = f.read()
+  profiling.Count('table.bytes_read_from_cache', len(body))
+  return fetch_time, body
+
+
+def _ValidatorsPathForYear(year):
+  """Returns the path of the file holding the cached page's HTTP validators."""
+  return os.path.join(CACHE_DIRECTORY, '%d_games.json' % year)
+
+
+def _ReadValidators(year):
+  """Returns the ETag and Last-Modified headers of the cached page for a year.
+
+  Returns:
+    JSON-like dictionary structured like: {
+        'etag': etag or None,
+        'last_modified': last modified date or None,
+    }
+    Both are None if the page is not cached.
+  """
+  validators = {'etag': None, 'last_modified': None}
+  if os.path.exists(_CachePathForYear(year)):
+    try:
+      with open(_ValidatorsPathForYear(year)) as f:
+        validators.update(json.load(f))
+    except (IOError, ValueError):
+      pass
+  return validators
+
+
+def _WriteAtomically(path, data):
+  """Writes a file in the cache directory so readers never see part of it."""
+  try:
+    os.makedirs(CACHE_DIRECTORY)
+  except OSError:
+    # Another thread or process may have just created it.
+    if not os.path.isdir(CACHE_DIRECTORY):
+      raise
+  tmp_path = '%s.%d.%d.tmp' % (path, os.getpid(),
+                                threading.current_thread().ident)
+  with open(tmp_path, 'wb') as f:
+    f.write(data)
+  os.rename(tmp_path, path)
+
+
+def _WriteCachedPage(year, body, validators=None):
+  """Atomically writes a page, and its validators if any, to the disk cache."""
+  _WriteAtomically(_CachePathForYear(year), body)
+  if validators and any(validators.itervalues()):
+    _WriteAtomically(_ValidatorsPathForYear(year), json.dumps(validators))
+  elif os.path.exists(_ValidatorsPathForYear(year)):
+    # The old validators describe a different page.
+    os.remove(_ValidatorsPathForYear(year))
+
+
+def FetchPageForYear(year):
+  """Returns the HTML of the games page for the given year.
+
+  Pages are looked up in memory, then on disk, and only downloaded if neither
+  copy is usable.  See CURRENT_SEASON_TTL_SECONDS and OFFLINE.
+
+  Raises:
+    IOError: if OFFLINE is set and the page has never been cached.
+  """
+  if year in _page_memo and _IsFresh(year, _page_memo[year][0]):
+    return _page_memo[year][1]
+  cached = _ReadCachedPage(year)
+  if cached is None:
+    if OFFLINE:
+      raise IOError('No cached page for %d in %s, and running offline' %
+                    (year, CACHE_DIRECTORY))
+    return RefreshPageForYear(year)
+  _page_memo[year] = cached
+  return cached[1]
+
+
+def StorePageForYear(year, body, validators=None):
+  """Replaces the cached page for a year, in memory and on disk.
+
+  Args:
+    year: The season of the page.
+    body: The page.
+    validators: The 'etag' and 'last_modified' headers the page was served
+        with, if it was downloaded, so that later downloads can be skipped
+        when it has not changed.
+  """
+  _WriteCachedPage(year, body, validators)
+  _page_memo[year] = (time.time(), body)
+
+
+# Shared by every download, so connections and rate limits are per process.
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def _GetFetcher():
+  global _fetcher
+  with _fetcher_lock:
+    if _fetcher is None:
+      _fetcher = fetch.Fetcher(min_interval=MIN_FETCH_INTERVAL_SECONDS)
+    return _fetcher
+
+
+def RefreshPageForYear(year):
+  """Downloads the games page for a year, even if a fresh copy is cached.
+
+  If a copy is cached, the download is conditional: when the server says the
+  page has not changed, the cached copy is marked fresh and nothing is
+  downloaded.  Safe to call from several threads for different years.
+
+  Raises:
+    IOError: if OFFLINE is set, or the page could not be downloaded.
+  """
+  if OFFLINE:
+    raise IOError('Cannot download the page for %d while running offline' %
+                  year)
+  validators = _ReadValidators(year)
+  with profiling.Stage('table.download'):
+    page = _GetFetcher().Fetch(MakeUrlForYear(year), **validators)
+  if not page.IsModified():
+    path = _CachePathForYear(year)
+    os.utime(path, None)
+    with open(path, 'rb') as f:
+      body = f.read()
+    profiling.Count('table.pages_not_modified')
+    _page_memo[year] = (time.time(), body)
+    return body
+  profiling.Count('table.bytes_fetched', len(page.body))
+  StorePageForYear(year, page.body, {'etag': page.etag,
+                                     'last_modified': page.last_modified})
+  return page.body
+
+
 def FetchPastGames(year):
   """Fetches past games from the given year."""
-  return ParsePastGamesTable(urllib2.urlopen(MakeUrlForYear(year)).read())
+  return ParsePastGamesTable(FetchPageForYear(year))
 
 
 def FetchPastGamesAsFuture(year):
   """Fetches FutureGame objects for all past games of the given year."""
-  return ParsePastGamesTable(urllib2.urlopen(MakeUrlForYear(year)).read(),
-                             future=True)
+  return ParsePastGamesTable(FetchPageForYear(year), future=True)
 
 
 def FetchFutureGames(year, week):
   """Fetches future games from the given year, starting at the given week."""
   # Get games that are literally in the future
-  future_games = ParseFutureGamesTable(
-      urllib2.urlopen(MakeUrlForYear(year)).read())
+  future_games = ParseFutureGamesTable(FetchPageForYear(year))
   # We may augment this with games from the past 
   past_games = [game for game in FetchPastGamesAsFuture(year)
                 if game.week.isdigit() and int(game.week) >= week]
@@ -1,3 +1,8 @@
+import mock
+import os
+import shutil
+import tempfile
+import time
 import unittest
 
 import table
@@ -33,6 +38,93 @@ class TestTableFunctions(unittest.TestCase):
     self.assertEqual('GB', games[0].away_team)
     self.assertEqual(util.NUM_REGULAR_SEASON_GAMES, len(games))
 
+  def testExtractTables(self):
+    tables = table.ExtractTables(self.past_html, ['games', 'games_left'])
+    self.assertEqual(list(table.TableRowsIter(self.past_html, 'games')),
+                     tables['games'])
+    self.assertEqual([], tables['games_left'])
+
+  def testParseIsMemoized(self):
+    with mock.patch.dict(table._parsed_memo, clear=True):
+      with mock.patch.object(table.lxml_html, 'fromstring',
+                             wraps=table.lxml_html.fromstring) as fromstring:
+        games = table.ParsePastGamesTable(self.past_html)
+        future_games = table.ParsePastGamesTable(self.past_html, future=True)
+        games_again = table.ParsePastGamesTable(self.past_html)
+        self.assertEqual([], table.ParseFutureGamesTable(self.past_html))
+        self.assertEqual(1, fromstring.call_count)
+    self.assertEqual(games, games_again)
+    self.assertIsNot(games, games_again)
+    self.assertEqual(len(games), len(future_games))
+
+
+class TestPageCache(unittest.TestCase):
+
+  def setUp(self):
+    self.cache_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.cache_dir)
+    self.html = test_utils.ReadTestdataFile('2013_past_season.html')
+    for patcher in [mock.patch.object(table, 'CACHE_DIRECTORY', self.cache_dir),
+                    mock.patch.object(table, 'OFFLINE', False),
+                    mock.patch.dict(table._page_memo, clear=True)]:
+      patcher.start()
+      self.addCleanup(patcher.stop)
+    patcher = mock.patch.object(table.fetch.Fetcher, 'Fetch')
+    self.mock_fetch = patcher.start()
+    self.mock_fetch.return_value = table.fetch.Page('url', self.html, '"v1"')
+    self.addCleanup(patcher.stop)
+
+  def testFetchesEachPageOnce(self):
+    table.FetchPastGames(2013)
+    table.FetchFutureGames(2013, 1)
+    self.assertEqual(1, self.mock_fetch.call_count)
+
+    # A new process should be served from disk.
+    table._page_memo.clear()
+    self.assertEqual(self.html, table.FetchPageForYear(2013))
+    self.assertEqual(1, self.mock_fetch.call_count)
+
+  def testCurrentSeasonExpires(self):
+    this_year = time.localtime().tm_year
+    table.FetchPageForYear(this_year)
+    table._page_memo.clear()
+    stale_time = time.time() - table.CURRENT_SEASON_TTL_SECONDS - 1
+    path = os.path.join(self.cache_dir, '%d_games.htm' % this_year)
+    os.utime(path, (stale_time, stale_time))
+    table.FetchPageForYear(this_year)
+    self.assertEqual(2, self.mock_fetch.call_count)
+
+  def testUnchangedPageIsNotDownloadedAgain(self):
+    this_year = time.localtime().tm_year
+    table.FetchPageForYear(this_year)
+    self.mock_fetch.assert_called_once_with(table.MakeUrlForYear(this_year),
+                                            etag=None, last_modified=None)
+    table._page_memo.clear()
+    stale_time = time.time() - table.CURRENT_SEASON_TTL_SECONDS - 1
+    path = os.path.join(self.cache_dir, '%d_games.htm' % this_year)
+    os.utime(path, (stale_time, stale_time))
+
+    self.mock_fetch.return_value = table.fetch.Page('url', None, '"v1"')
+    self.assertEqual(self.html, table.FetchPageForYear(this_year))
+    self.mock_fetch.assert_called_with(table.MakeUrlForYear(this_year),
+                                       etag='"v1"', last_modified=None)
+    # The cached copy is fresh again.
+    table._page_memo.clear()
+    table.FetchPageForYear(this_year)
+    self.assertEqual(2, self.mock_fetch.call_count)
+
+  def testStoredPageForgetsValidators(self):
+    table.RefreshPageForYear(2013)
+    table.StorePageForYear(2013, 'new page')
+    table.RefreshPageForYear(2013)
+    self.mock_fetch.assert_called_with(table.MakeUrlForYear(2013), etag=None,
+                                       last_modified=None)
+
+  def testOffline(self):
+    table.OFFLINE = True
+    self.assertRaises(IOError, table.FetchPageForYear, 2013)
+    self.assertFalse(self.mock_fetch.called)
+
     
 if __name__ == '__main__':
   unittest.main()
@@ -1,12 +1,16 @@
 """Module for computing strengths of teams."""
 import argparse
 import collections
-import cvxpy
 import itertools
 import json
 import math
+import numpy
+import os
+from scipy import sparse
 import sys
 
+import game_store
+import profiling
 import table
 import util
 
@@ -22,6 +26,24 @@ GAME_VARIANCE = 13.45 ** 2
 # Variance of the prior distribution of team strengths
 PRIOR_VARIANCE = 7.0 ** 2
 
+# Number of seasons, including the current one, that GetTeamStrengthsDecayed
+# fits on by default.
+DECAY_NUM_SEASONS = 5
+
+# Age, in weeks, at which a game counts half as much as one played this week
+# in GetTeamStrengthsDecayed.  A game from a year ago then counts about as much
+# as LAST_SEASON_WEIGHT.
+DECAY_HALF_LIFE_WEEKS = 26.0
+
+# Calendar weeks per year, for measuring the age of games across seasons.
+WEEKS_PER_YEAR = 52
+
+# Backends that GetTeamStrengthsMLE can use to solve its least squares problem.
+SOLVER_CVXPY = 'cvxpy'  # Generic convex solver; slow, but a useful reference.
+SOLVER_NUMPY = 'numpy'  # Solves the normal equations directly.
+SOLVERS = [SOLVER_CVXPY, SOLVER_NUMPY]
+DEFAULT_SOLVER = SOLVER_NUMPY
+
 def _ReadArgs():
   parser = argparse.ArgumentParser(description='Compute strengths of teams.  '
                                    'Prints results to stdout.')
@@ -29,6 +51,25 @@ def _ReadArgs():
   parser.add_argument('week', type=int,
                       help='The current week.  Represents the week about to be '
                       'played, e.g. week 1 means the season hasn\'t started.')
+  parser.add_argument('--solver', choices=SOLVERS, default=DEFAULT_SOLVER,
+                      help='Backend used to fit the team strengths.')
+  parser.add_argument('--seasons', type=int,
+                      help='Fit on this many seasons, with weights decaying '
+                      'exponentially with the age of each game, instead of '
+                      'on two seasons.  See GetTeamStrengthsDecayed().')
+  parser.add_argument('--half-life', type=float,
+                      default=DECAY_HALF_LIFE_WEEKS,
+                      help='With --seasons, the age in weeks at which a game '
+                      'counts half as much as a new one.')
+  parser.add_argument('--state',
+                      help='File holding the model between runs.  If given, '
+                      'only games finished since the last run are processed, '
+                      'unless the last run was in another season.')
+  parser.add_argument('--offline', action='store_true',
+                      help='Only use cached pages; never access the network.')
+  parser.add_argument('--profile', action='store_true',
+                      help='Print time spent per stage and other counters to '
+                      'stderr, as JSON.')
   if len(sys.argv) == 1:
     parser.print_help()
     sys.exit(1)
@@ -63,46 +104,37 @@ def GetTeamStrengthsSimple(year, week):
         }
     }
   """
-  last_season_games = table.FetchPastGames(
-      year - 1)[:util.NUM_REGULAR_SEASON_GAMES]  # Only use regular season 
-  cur_season_games = [g for g in table.FetchPastGames(year) if
-                      g.week.isdigit() and int(g.week) < week]
-  total_point_diff = collections.defaultdict(int)
-  total_weighted_games = collections.defaultdict(int)
-
-  for game in last_season_games:
-    differential = game.GetPointDifferential()
-    total_point_diff[game.winning_team] += LAST_SEASON_WEIGHT * differential
-    total_weighted_games[game.winning_team] += LAST_SEASON_WEIGHT
-    total_point_diff[game.losing_team] -= LAST_SEASON_WEIGHT * differential
-    total_weighted_games[game.losing_team] += LAST_SEASON_WEIGHT
-  for game in cur_season_games:
-    if not game.week.isdigit() or int(game.week) >= week:
-      # Game is from post-season or is from current week or after
-      continue
-    differential = game.GetPointDifferential()
-    total_point_diff[game.winning_team] += differential
-    total_weighted_games[game.winning_team] += 1
-    total_point_diff[game.losing_team] -= differential
-    total_weighted_games[game.losing_team] += 1
-  scores = {}
-  for team in total_point_diff:
-    scores[team] = float(total_point_diff[team]) / total_weighted_games[team]
+  last_season_games = game_store.FetchGameStore(year - 1).RegularSeason()
+  cur_season_games = game_store.FetchGameStore(year).Weeks(1, week)
+  games = game_store.Concatenate([last_season_games, cur_season_games])
+  weights = numpy.concatenate([
+      numpy.full(len(last_season_games), LAST_SEASON_WEIGHT),
+      numpy.ones(len(cur_season_games))])
+  differentials = games.PointDifferentials()
+  total_point_diff = (
+      numpy.bincount(games.winning_team, weights * differentials,
+                     minlength=util.NUM_TEAMS) -
+      numpy.bincount(games.losing_team, weights * differentials,
+                     minlength=util.NUM_TEAMS))
+  total_weighted_games = (
+      numpy.bincount(games.winning_team, weights, minlength=util.NUM_TEAMS) +
+      numpy.bincount(games.losing_team, weights, minlength=util.NUM_TEAMS))
+  played = total_weighted_games > 0
+  team_scores = numpy.zeros(util.NUM_TEAMS)
+  team_scores[played] = total_point_diff[played] / total_weighted_games[played]
+  scores = dict((util.TEAM_ABBREVIATIONS[i], float(team_scores[i]))
+                for i in numpy.flatnonzero(played))
 
   # Compute sample variance
   # This is not weighted, as we don't expect this to change season to season.
   # Still use only regular season, to avoid any postseason bias.
-  total_sq_error = 0
-  for game in last_season_games + cur_season_games:
-    differential = game.GetPointDifferential()
-    estimated_score = scores[game.winning_team] - scores[game.losing_team]
-    total_sq_error += (differential - estimated_score)**2
-  num_games = len(last_season_games) + len(cur_season_games)
-  variance = float(total_sq_error) / (num_games - 1)
+  errors = differentials - (team_scores[games.winning_team] -
+                            team_scores[games.losing_team])
+  variance = float(numpy.dot(errors, errors)) / (len(games) - 1)
   return {'variance': variance, 'scores': scores}
 
 
-def GetTeamStrengthsMLE(year, week):
+def GetTeamStrengthsMLE(year, week, solver=DEFAULT_SOLVER):
   """Computes estimates of team strengths, based on past performance.
 
   Uses games from both the current season and the last season.  Last season's
@@ -157,6 +189,7 @@ def GetTeamStrengthsMLE(year, week):
   Args:
     year: The current year.
     week: Only use games before this week of the current year.
+    solver: Which backend to solve with, one of SOLVERS.
   Returns:
     JSON-like dictionary structured like: {
         'variance': var,
@@ -169,28 +202,110 @@ def GetTeamStrengthsMLE(year, week):
         }
     }
   """
+  last_season_games = game_store.FetchGameStore(year - 1)
+  cur_season_games = game_store.FetchGameStore(year).Weeks(1, week)
+  games = game_store.Concatenate([last_season_games, cur_season_games])
+  weights = numpy.concatenate([
+      numpy.full(len(last_season_games), LAST_SEASON_WEIGHT),
+      numpy.ones(len(cur_season_games))])
+  profiling.Count('teams.games_fit', len(games))
+  with profiling.Stage('teams.solve'):
+    if solver == SOLVER_CVXPY:
+      scores, home_field = _SolveLeastSquaresCvxpy(games, weights)
+    elif solver == SOLVER_NUMPY:
+      scores, home_field = _SolveLeastSquaresNumpy(games, weights)
+    else:
+      raise ValueError('Unrecognized solver "%s"' % solver)
+  return _MakeTeamStrengths(scores, home_field)
+
+
+def DecayWeights(games, year, week, half_life_weeks=DECAY_HALF_LIFE_WEEKS):
+  """Weights games by their age, as of the given week of the given year.
+
+  Ages are counted in calendar weeks, treating each season's week w as the
+  w-th week of its year, so postseason games count as a few weeks older than
+  the end of the regular season.
+
+  Args:
+    games: A game_store.GameStore.
+    year: The current year.
+    week: The current week.
+    half_life_weeks: Age at which a game's weight is 1/2.
+  Returns:
+    Array with the weight of each game: 1 for a game played this week, halving
+    every half_life_weeks.
+  """
+  ages = (WEEKS_PER_YEAR * (year - games.season.astype(float)) +
+          (week - games.week.astype(float)))
+  return 0.5 ** (ages / half_life_weeks)
+
+
+def GetTeamStrengthsDecayed(year, week, num_seasons=DECAY_NUM_SEASONS,
+                            half_life_weeks=DECAY_HALF_LIFE_WEEKS):
+  """Computes estimates of team strengths from several seasons of games.
+
+  Uses the same model as GetTeamStrengthsMLE(), but fits on all games of the
+  last num_seasons - 1 seasons, plus those of the current season before week,
+  and weights each game by DecayWeights() instead of by season.
+
+  The least squares problem is assembled from a sparse games x teams design
+  matrix, so time grows linearly with the number of games, and solved via its
+  (util.NUM_TEAMS + 1)-dimensional normal equations.
+
+  Args:
+    year: The current year.
+    week: Only use games before this week of the current year.
+    num_seasons: Number of seasons to use, including the current one.
+    half_life_weeks: Age at which a game counts half as much as a new one.
+  Returns:
+    Team strengths, structured like GetTeamStrengthsMLE().
+  """
+  games = game_store.Concatenate([
+      game_store.FetchGameHistory(year - num_seasons + 1, year - 1),
+      game_store.FetchGameStore(year).Weeks(1, week)])
+  weights = DecayWeights(games, year, week, half_life_weeks)
+  profiling.Count('teams.games_fit', len(games))
+  with profiling.Stage('teams.solve'):
+    scores, home_field = _SolveLeastSquaresNumpy(games, weights)
+  return _MakeTeamStrengths(scores, home_field)
+
+
+def _MakeTeamStrengths(scores, home_field, variance=GAME_VARIANCE):
+  """Packs a solution into the dict returned by GetTeamStrengthsMLE()."""
+  # To really make it JSON-like, convert numpy values to float
+  return {
+      'variance': variance,
+      'home_field': float(home_field), 
+      'scores': collections.OrderedDict(
+          itertools.izip(util.TEAM_ABBREVIATIONS, (float(x) for x in scores)))
+  }
+
+
+def _SolveLeastSquaresCvxpy(games, weights):
+  """Solves the problem in GetTeamStrengthsMLE() with cvxpy.
+
+  Args:
+    games: A game_store.GameStore.
+    weights: The weight of each game.
+  Returns:
+    A (scores, home_field) pair, where scores[i] is the strength of the i-th
+    team in util.TEAM_ABBREVIATIONS.
+  """
+  # cvxpy takes longer to import than a whole cached run of the numpy solver,
+  # so only load it when it is actually used.
+  import cvxpy
+
   # Set up the variables for the least squares problem.
   s = cvxpy.Variable(util.NUM_TEAMS)
   k = cvxpy.Variable()
 
   # Set up the least squares objective
   obj_fn = 0
-  last_season_games = table.FetchPastGames(year - 1)
-  cur_season_games = [g for g in table.FetchPastGames(year) if
-                      g.week.isdigit() and int(g.week) < week]
-  all_games = itertools.chain(last_season_games, cur_season_games)
-  weights = ([ LAST_SEASON_WEIGHT ] * len(last_season_games) + 
-             [ 1 ] * len(cur_season_games))
-  for game, weight in itertools.izip(all_games, weights):
-    winning_index = util.GetTeamIndex(game.winning_team)
-    losing_index = util.GetTeamIndex(game.losing_team)
-    point_diff = game.GetPointDifferential()  # Absolute margin of victory
-    if game.home_or_away == table.HOME_TEAM_WON:
-      error = s[winning_index] - s[losing_index] + k - point_diff
-    elif game.home_or_away == table.HOME_TEAM_LOST:
-      error = s[losing_index] - s[winning_index] + k + point_diff
-    else:  # Super Bowl, no home team
-      error = s[winning_index] - s[losing_index] - point_diff
+  columns = games.HomeAwayArrays() + (numpy.asarray(weights),)
+  for home, away, has_home, differential, weight in itertools.izip(
+      *(column.tolist() for column in columns)):
+    # No home field advantage at a neutral site, e.g. the Super Bowl
+    error = s[home] - s[away] + has_home * k - differential
     obj_fn += weight * cvxpy.square(error)
 
   # Add L2 Regularization
@@ -203,24 +318,242 @@ def GetTeamStrengthsMLE(year, week):
 
   # Solve the least squares problem
   problem = cvxpy.Problem(objective)
-  opt_squared_error = problem.solve()
+  with profiling.Stage('teams.cvxpy_solve'):
+    problem.solve()
+  profiling.Set('teams.solver_status', problem.status)
+  if getattr(problem, 'solver_stats', None) is not None:
+    profiling.Set('teams.solver_iterations', problem.solver_stats.num_iters)
+  return numpy.asarray(s.value).ravel(), k.value
 
-  # Return JSON-like object
-  # To really make it JSON-like, convert numpy arrays returned by cvxpy to float
-  return {
-      'variance': GAME_VARIANCE,
-      'home_field': float(k.value), 
-      'scores': collections.OrderedDict(
-          itertools.izip(util.TEAM_ABBREVIATIONS, (float(x) for x in s.value)))
-  }
+
+def BuildDesignMatrix(games):
+  """Builds the least squares design matrix for a list of games.
+
+  Row i of the matrix has a +1 in the column of the home team of game i, a -1
+  in the column of the away team, and a 1 in the last column (the home field
+  advantage k) unless the game was played at a neutral site.
+
+  Args:
+    games: A game_store.GameStore.
+  Returns:
+    A (design, differentials) pair.  design is a sparse matrix with one row per
+    game and util.NUM_TEAMS + 1 columns, and differentials[i] is the home
+    team's margin of victory in game i.
+  """
+  home, away, has_home, differentials = games.HomeAwayArrays()
+  num_games = len(games)
+  rows = numpy.arange(num_games)
+  design = sparse.csr_matrix(
+      (numpy.concatenate([numpy.ones(num_games), -numpy.ones(num_games),
+                          has_home]),
+       (numpy.concatenate([rows, rows, rows]),
+        numpy.concatenate([home, away,
+                           numpy.repeat(util.NUM_TEAMS, num_games)]))),
+      shape=(num_games, util.NUM_TEAMS + 1))
+  return design, differentials
+
+
+def SolveNormalEquations(normal_matrix, normal_rhs,
+                         regularization=GAME_VARIANCE / PRIOR_VARIANCE):
+  """Solves the regularized normal equations of the least squares problem.
+
+  Args:
+    normal_matrix: X^T W X, where X is the design matrix from
+        BuildDesignMatrix() and W is the diagonal matrix of game weights.
+    normal_rhs: X^T W d, where d is the vector of point differentials.
+    regularization: Weight of the L2 penalty on the team strengths, relative
+        to a game of weight 1.
+  Returns:
+    A (scores, home_field) pair, as in _SolveLeastSquaresCvxpy().
+  """
+  penalty = numpy.full(util.NUM_TEAMS + 1, regularization)
+  penalty[util.NUM_TEAMS] = 0  # Don't regularize home field advantage.
+  solution = numpy.linalg.solve(normal_matrix + numpy.diag(penalty),
+                                normal_rhs)
+  return solution[:util.NUM_TEAMS], solution[util.NUM_TEAMS]
+
+
+def NormalEquations(games, weights):
+  """Computes the normal equations of the least squares problem for games.
+
+  Args:
+    games: A game_store.GameStore.
+    weights: The weight of each game.
+  Returns:
+    A (normal_matrix, normal_rhs) pair, as taken by SolveNormalEquations().
+  """
+  design, differentials = BuildDesignMatrix(games)
+  weighted_design = design.T.multiply(numpy.asarray(weights, dtype=float))
+  normal_matrix = weighted_design.dot(design).toarray()
+  normal_rhs = numpy.asarray(weighted_design.dot(differentials)).ravel()
+  return normal_matrix, normal_rhs
+
+
+def _SolveLeastSquaresNumpy(games, weights):
+  """Solves the problem in GetTeamStrengthsMLE() via its normal equations.
+
+  Args:
+    games: A game_store.GameStore.
+    weights: The weight of each game.
+  Returns:
+    A (scores, home_field) pair, as in _SolveLeastSquaresCvxpy().
+  """
+  # A direct solve, so there are no iterations to report.
+  profiling.Set('teams.solver_status', 'optimal')
+  return SolveNormalEquations(*NormalEquations(games, weights))
+
+
+class TeamStrengthModel(object):
+  """Running state of the least squares problem in GetTeamStrengthsMLE().
+
+  Instead of the games themselves, we keep the weighted normal equations
+  X^T W X and X^T W d.  Absorbing a batch of new games is then a low-rank
+  update of these, and re-solving only involves a small
+  (util.NUM_TEAMS + 1) x (util.NUM_TEAMS + 1) linear system.
+
+  Attributes:
+    year: The current year.
+    week: All games of the current year before this week have been absorbed.
+    normal_matrix: Accumulated X^T W X.
+    normal_rhs: Accumulated X^T W d.
+  """
+
+  def __init__(self, year, week, normal_matrix=None, normal_rhs=None):
+    self.year = year
+    self.week = week
+    if normal_matrix is None:
+      normal_matrix = numpy.zeros((util.NUM_TEAMS + 1, util.NUM_TEAMS + 1))
+    if normal_rhs is None:
+      normal_rhs = numpy.zeros(util.NUM_TEAMS + 1)
+    self.normal_matrix = normal_matrix
+    self.normal_rhs = normal_rhs
+
+  def AddGames(self, games, weight=1.0):
+    """Absorbs a game_store.GameStore of finished games, all of one weight."""
+    if not len(games):
+      return
+    normal_matrix, normal_rhs = NormalEquations(
+        games, numpy.full(len(games), weight))
+    self.normal_matrix += normal_matrix
+    self.normal_rhs += normal_rhs
+
+  def ScaleGames(self, factor):
+    """Re-weights all games absorbed so far by the given factor."""
+    self.normal_matrix *= factor
+    self.normal_rhs *= factor
+
+  def Solve(self):
+    """Returns the team strengths, structured like GetTeamStrengthsMLE()."""
+    return _MakeTeamStrengths(
+        *SolveNormalEquations(self.normal_matrix, self.normal_rhs))
+
+  def Save(self, filename):
+    """Writes the model to a file."""
+    with open(filename, 'wb') as f:
+      numpy.savez(f, year=self.year, week=self.week,
+                  normal_matrix=self.normal_matrix, normal_rhs=self.normal_rhs)
+
+  @classmethod
+  def Load(cls, filename):
+    """Reads a model written by Save()."""
+    with open(filename, 'rb') as f:
+      data = numpy.load(f)
+      return cls(int(data['year']), int(data['week']), data['normal_matrix'],
+                 data['normal_rhs'])
+
+
+def NewTeamStrengthModel(year, week):
+  """Builds a model from scratch, using the same games as GetTeamStrengthsMLE.
+
+  Args:
+    year: The current year.
+    week: Only use games before this week of the current year.
+  Returns:
+    A TeamStrengthModel.
+  """
+  model = TeamStrengthModel(year - 1, 1)
+  StartNewSeason(model)
+  UpdateTeamStrengthModel(model, week)
+  return model
+
+
+def StartNewSeason(model, last_season_weight=LAST_SEASON_WEIGHT):
+  """Moves a model on to week 1 of the next season.
+
+  Any games of the current season that have not been absorbed yet, including
+  the postseason, are absorbed first.  Then everything is down-weighted by
+  last_season_weight.  Note that unlike GetTeamStrengthsMLE(), which only
+  looks at one previous season, older seasons are kept around with
+  geometrically decaying weights.
+  """
+  model.AddGames(
+      game_store.FetchGameStore(model.year).NotWeeks(1, model.week))
+  model.ScaleGames(last_season_weight)
+  model.year += 1
+  model.week = 1
+
+
+def UpdateTeamStrengthModel(model, week):
+  """Absorbs the games of the model's year finished since its last update.
+
+  Args:
+    model: A TeamStrengthModel.
+    week: Absorb games before this week of the model's year.
+  """
+  if week < model.week:
+    raise ValueError('Model already contains games up to week %d, cannot '
+                     'go back to week %d' % (model.week, week))
+  if week > model.week:
+    model.AddGames(
+        game_store.FetchGameStore(model.year).Weeks(model.week, week))
+    model.week = week
+
+
+def UpdateTeamStrengthsMLE(filename, year, week):
+  """Computes the same team strengths as GetTeamStrengthsMLE incrementally.
+
+  The model saved in filename is updated with any games finished since it was
+  saved, and saved again.  If the file does not exist or is from another
+  season, a new model is built from scratch: rolling last season's model over
+  with StartNewSeason() would keep the season before it too, which
+  GetTeamStrengthsMLE() does not use.
+
+  Args:
+    filename: Where the TeamStrengthModel is kept between runs.
+    year: The current year.
+    week: Only use games before this week of the current year.
+  Returns:
+    Team strengths, structured like GetTeamStrengthsMLE().
+  """
+  model = None
+  if os.path.exists(filename):
+    model = TeamStrengthModel.Load(filename)
+    if model.year != year or model.week > week:
+      model = None
+  if model is None:
+    model = NewTeamStrengthModel(year, week)
+  else:
+    UpdateTeamStrengthModel(model, week)
+  model.Save(filename)
+  return model.Solve()
 
 
-def _PrintTeamStrengths(year, week):
+def _PrintTeamStrengths(year, week, solver, seasons, half_life, state):
   """Prints out team strengths to stdout"""
-  team_strengths = GetTeamStrengthsMLE(year, week)
+  if seasons:
+    team_strengths = GetTeamStrengthsDecayed(year, week, seasons, half_life)
+  elif state:
+    team_strengths = UpdateTeamStrengthsMLE(state, year, week)
+  else:
+    team_strengths = GetTeamStrengthsMLE(year, week, solver=solver)
   print json.dumps(team_strengths, indent=2)
 
 
 if __name__ == '__main__':
   args = _ReadArgs()
+  table.OFFLINE = args.pop('offline')
+  if args.pop('profile'):
+    profiling.Enable()
   _PrintTeamStrengths(**args)
+  if profiling.IsEnabled():
+    profiling.PrintReport()
@@ -1,7 +1,12 @@
 import math
 import mock
+import numpy
+import os
+import shutil
+import tempfile
 import unittest
 
+import game_store
 import table
 import teams
 import test_utils
@@ -44,5 +49,77 @@ class TestTeamsFunctions(test_utils.BaseTest):
     # Expect MLE variance to be lower than simple
     self.assertLess(strengths_mle['variance'], strengths_simple['variance'])
 
+  def testTeamStrengthsMLESolversAgree(self):
+    strengths_cvxpy = teams.GetTeamStrengthsMLE(2014, 1,
+                                                solver=teams.SOLVER_CVXPY)
+    strengths_numpy = teams.GetTeamStrengthsMLE(2014, 1,
+                                                solver=teams.SOLVER_NUMPY)
+    self.assertAlmostEqual(strengths_cvxpy['home_field'],
+                           strengths_numpy['home_field'], places=3)
+    for team in util.TEAM_ABBREVIATIONS:
+      self.assertAlmostEqual(strengths_cvxpy['scores'][team],
+                             strengths_numpy['scores'][team], places=3)
+    self.assertEqual(util.TEAM_ABBREVIATIONS,
+                     list(strengths_numpy['scores'].keys()))
+
+  def testDecayWeights(self):
+    games = game_store.GameStore(season=[2014, 2014, 2013], week=[3, 1, 3])
+    weights = teams.DecayWeights(games, 2014, 3, half_life_weeks=2)
+    numpy.testing.assert_allclose([1, 0.5, 0.5 ** 26], weights)
+    year_old = teams.DecayWeights(games, 2014, 3)[2]
+    self.assertAlmostEqual(teams.LAST_SEASON_WEIGHT, year_old)
+
+  def testTeamStrengthsDecayed(self):
+    self._MockFetchPastGames(current_season_filename='2013_past_season.html')
+    strengths = teams.GetTeamStrengthsDecayed(2014, 9, num_seasons=2)
+    self.assertEqual(['home_field', 'scores', 'variance'], sorted(strengths))
+    self.assertEqual(util.TEAM_ABBREVIATIONS, list(strengths['scores'].keys()))
+
+    # Same answer as the reference solver with the same weights.
+    games = game_store.Concatenate([
+        game_store.FetchGameStore(2013),
+        game_store.FetchGameStore(2014).Weeks(1, 9)])
+    scores, home_field = teams._SolveLeastSquaresCvxpy(
+        games, teams.DecayWeights(games, 2014, 9))
+    self.assertAlmostEqual(home_field, strengths['home_field'], places=3)
+    for team, score in zip(util.TEAM_ABBREVIATIONS, scores):
+      self.assertAlmostEqual(score, strengths['scores'][team], places=3)
+
+  def testTeamStrengthModel(self):
+    """Incremental updates give the same answer as solving from scratch."""
+    self._MockFetchPastGames(current_season_filename='2013_past_season.html')
+    temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, temp_dir)
+    filename = os.path.join(temp_dir, 'model.npz')
+    for week in [1, 2, 2, 9, 18]:
+      strengths_update = teams.UpdateTeamStrengthsMLE(filename, 2014, week)
+      strengths_mle = teams.GetTeamStrengthsMLE(2014, week)
+      self.assertAlmostEqual(strengths_mle['home_field'],
+                             strengths_update['home_field'])
+      for team in util.TEAM_ABBREVIATIONS:
+        self.assertAlmostEqual(strengths_mle['scores'][team],
+                               strengths_update['scores'][team])
+    self.assertEqual(18, teams.TeamStrengthModel.Load(filename).week)
+    self.assertRaises(ValueError, teams.UpdateTeamStrengthModel,
+                      teams.TeamStrengthModel.Load(filename), 17)
+
+  def testTeamStrengthModelNewSeason(self):
+    """A model from last season does not keep the season before it."""
+    self._MockFetchPastGames(current_season_filename='2013_past_season.html')
+    temp_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, temp_dir)
+    filename = os.path.join(temp_dir, 'model.npz')
+    # Stands in for games of 2013 and before.
+    teams.TeamStrengthModel(
+        2013, 18, numpy.eye(util.NUM_TEAMS + 1),
+        numpy.ones(util.NUM_TEAMS + 1)).Save(filename)
+    strengths_update = teams.UpdateTeamStrengthsMLE(filename, 2014, 9)
+    strengths_mle = teams.GetTeamStrengthsMLE(2014, 9)
+    self.assertAlmostEqual(strengths_mle['home_field'],
+                           strengths_update['home_field'])
+    for team in util.TEAM_ABBREVIATIONS:
+      self.assertAlmostEqual(strengths_mle['scores'][team],
+                             strengths_update['scores'][team])
+
 if __name__ == '__main__':
   unittest.main()
@@ -1,8 +1,14 @@
 """Utilities for testing."""
+import BaseHTTPServer
+import collections
+import hashlib
 import mock
 import os
+import SocketServer
+import threading
 import unittest
 
+import game_store
 import table
 
 FILE_DIRECTORY = os.path.dirname(os.path.realpath(__file__))
@@ -16,14 +22,24 @@ def ReadTestdataFile(filename):
 class BaseTest(unittest.TestCase):
   """Provides a couple helpful methods that are used commonly."""
 
-  def _MockFetchPastGames(self, filename='2013_past_season.html'):
+  def _MockFetchPastGames(self, filename='2013_past_season.html',
+                          current_season_filename=None):
     past_html = ReadTestdataFile(filename)
     past_games = table.ParsePastGamesTable(past_html)
+    current_games = []
+    if current_season_filename:
+      current_games = table.ParsePastGamesTable(
+          ReadTestdataFile(current_season_filename))
     patcher = mock.patch.object(table, 'FetchPastGames')
     mock_games = patcher.start()
-    games_dict = {2013: past_games, 2014: []} 
+    games_dict = {2013: past_games, 2014: current_games} 
     mock_games.side_effect = lambda x: games_dict[x]
     self.addCleanup(patcher.stop)
+    # Columnar copies follow whatever the mock above returns.
+    patcher = mock.patch.object(game_store, 'FetchGameStore')
+    patcher.start().side_effect = lambda year: (
+        game_store.GameStore.FromPastGames(year, table.FetchPastGames(year)))
+    self.addCleanup(patcher.stop)
 
   def _MockFetchFutureGames(self, filename='2014_future_season.html'):
     future_html = ReadTestdataFile(filename)
@@ -32,3 +48,81 @@ class BaseTest(unittest.TestCase):
     mock_games = patcher.start()
     mock_games.return_value = future_games
     self.addCleanup(patcher.stop)
+
+
+class _StandInHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  """Serves the pages of a StandInServer."""
+  protocol_version = 'HTTP/1.1'  # Keeps connections alive
+
+  def _Reply(self, code, body='', headers=()):
+    self.send_response(code)
+    for name, value in headers:
+      self.send_header(name, value)
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def do_GET(self):
+    server = self.server
+    with server.lock:
+      server.requests[self.path] += 1
+      failures = server.failures.get(self.path, 0)
+      if failures:
+        server.failures[self.path] = failures - 1
+    if failures:
+      self._Reply(503)
+    elif self.path in server.redirects:
+      self._Reply(301, headers=[('Location', server.redirects[self.path])])
+    elif self.path not in server.pages:
+      self._Reply(404)
+    else:
+      body = server.pages[self.path]
+      etag = '"%s"' % hashlib.sha1(body).hexdigest()
+      if self.headers.get('If-None-Match') == etag:
+        self._Reply(304, headers=[('ETag', etag)])
+      else:
+        self._Reply(200, body, [('ETag', etag)])
+
+  def log_message(self, format, *args):
+    pass
+
+
+class StandInServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+  """Local HTTP server that stands in for a website in tests.
+
+  Serves the bodies in pages, keyed by path, with ETags, and answers
+  conditional requests for unchanged pages with 304 Not Modified.
+
+  Attributes:
+    pages: Maps path to body.
+    redirects: Maps path to the URL it redirects to.
+    failures: Maps path to the number of times to answer 503 before serving it.
+    requests: Maps path to the number of requests made for it.
+    connections: The number of connections accepted.
+  """
+  daemon_threads = True
+
+  def __init__(self, pages=None):
+    BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0),
+                                       _StandInHandler)
+    self.lock = threading.Lock()
+    self.pages = dict(pages or {})
+    self.redirects = {}
+    self.failures = {}
+    self.requests = collections.defaultdict(int)
+    self.connections = 0
+    self._thread = threading.Thread(target=self.serve_forever, args=(0.01,))
+    self._thread.daemon = True
+    self._thread.start()
+
+  def process_request(self, request, client_address):
+    with self.lock:
+      self.connections += 1
+    SocketServer.ThreadingMixIn.process_request(self, request, client_address)
+
+  def Url(self, path):
+    return 'http://127.0.0.1:%d%s' % (self.server_port, path)
+
+  def Stop(self):
+    self.shutdown()
+    self.server_close()
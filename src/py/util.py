@@ -1,6 +1,9 @@
 """General utilities and constants."""
 # Numeric Constants
 NUM_TEAMS = 32
+
+# Shape of a season from 2002 to 2020.  Use the functions below, which take the
+# year, for anything that should also work for later seasons.
 NUM_WEEKS_PER_SEASON = 17
 NUM_GAMES_PER_TEAM = 16
 NUM_REGULAR_SEASON_GAMES = NUM_TEAMS * NUM_GAMES_PER_TEAM / 2
@@ -8,6 +11,37 @@ NUM_PLAYOFF_TEAMS = 12
 NUM_PLAYOFF_GAMES = NUM_PLAYOFF_TEAMS - 1
 NUM_TOTAL_GAMES = NUM_REGULAR_SEASON_GAMES + NUM_PLAYOFF_GAMES
 
+# First season with 18 weeks and 17 games per team.
+FIRST_18_WEEK_SEASON = 2021
+
+# First season with 14 playoff teams.
+FIRST_14_PLAYOFF_TEAM_SEASON = 2020
+
+def NumWeeksPerSeason(year):
+  """Returns the number of weeks in the regular season of the given year."""
+  return 18 if year >= FIRST_18_WEEK_SEASON else NUM_WEEKS_PER_SEASON
+
+
+def NumGamesPerTeam(year):
+  """Returns the number of regular season games each team plays."""
+  return NumWeeksPerSeason(year) - 1  # Every team has one bye week.
+
+
+def NumRegularSeasonGames(year):
+  """Returns the number of games in the regular season of the given year."""
+  return NUM_TEAMS * NumGamesPerTeam(year) / 2
+
+
+def NumPlayoffTeams(year):
+  """Returns the number of teams in the playoffs of the given year."""
+  return 14 if year >= FIRST_14_PLAYOFF_TEAM_SEASON else NUM_PLAYOFF_TEAMS
+
+
+def NumTotalGames(year):
+  """Returns the number of regular season and playoff games in a year."""
+  return NumRegularSeasonGames(year) + NumPlayoffTeams(year) - 1
+
+
 # Map from team names to abbreviations
 TEAM_NAMES_TO_ABBREVIATIONS = {
   'Arizona Cardinals': 'ARI',
@@ -41,13 +75,29 @@ TEAM_NAMES_TO_ABBREVIATIONS = {
   'St. Louis Rams': 'STL',
   'Tampa Bay Buccaneers': 'TB',
   'Tennessee Titans': 'TEN',
-  'Washington Redskins': 'WAS'
+  'Washington Redskins': 'WAS',
+  # Franchises that have moved or been renamed keep their old abbreviation, so
+  # that their games link up across seasons.
+  'Las Vegas Raiders': 'OAK',
+  'Los Angeles Chargers': 'SD',
+  'Los Angeles Rams': 'STL',
+  'Washington Football Team': 'WAS',
+  'Washington Commanders': 'WAS'
 }
 
 # List of team abbreviations, sorted alphabetically
-TEAM_ABBREVIATIONS = sorted([TEAM_NAMES_TO_ABBREVIATIONS[k]
-                             for k in TEAM_NAMES_TO_ABBREVIATIONS])
+TEAM_ABBREVIATIONS = sorted(set(TEAM_NAMES_TO_ABBREVIATIONS.values()))
+
+# Map from team abbreviation to its index in TEAM_ABBREVIATIONS
+TEAM_INDICES = dict((team, i) for i, team in enumerate(TEAM_ABBREVIATIONS))
 
 def GetTeamIndex(team):
-  """Returns the index of the team abbreviation in TEAM_ABBREVIATIONS."""
-  return TEAM_ABBREVIATIONS.index(team)
+  """Returns the index of the team abbreviation in TEAM_ABBREVIATIONS.
+
+  Raises:
+    ValueError: if team is not a known abbreviation.
+  """
+  try:
+    return TEAM_INDICES[team]
+  except KeyError:
+    raise ValueError('Unknown team "%s"' % team)
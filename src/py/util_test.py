@@ -0,0 +1,26 @@
+import unittest
+
+import util
+
+class TestUtilFunctions(unittest.TestCase):
+
+  def testSeasonShape(self):
+    self.assertEqual(util.NUM_WEEKS_PER_SEASON, util.NumWeeksPerSeason(2014))
+    self.assertEqual(util.NUM_TOTAL_GAMES, util.NumTotalGames(2014))
+    self.assertEqual(18, util.NumWeeksPerSeason(2023))
+    self.assertEqual(272, util.NumRegularSeasonGames(2023))
+    self.assertEqual(285, util.NumTotalGames(2023))
+
+  def testRenamedTeams(self):
+    self.assertEqual(util.NUM_TEAMS, len(util.TEAM_ABBREVIATIONS))
+    self.assertEqual('OAK',
+                     util.TEAM_NAMES_TO_ABBREVIATIONS['Las Vegas Raiders'])
+
+  def testGetTeamIndex(self):
+    for i, team in enumerate(util.TEAM_ABBREVIATIONS):
+      self.assertEqual(i, util.GetTeamIndex(team))
+    self.assertRaises(ValueError, util.GetTeamIndex, 'XYZ')
+
+
+if __name__ == '__main__':
+  unittest.main()